@@ -1,33 +1,264 @@
 import streamlit as st
 import pandas as pd
+import hashlib
 import sys
 from pathlib import Path
-import tempfile
-import os
 import zipfile
 import io
+import json
 import shutil
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 # Add the current directory to sys.path to make imports work
 # This allows running `streamlit run data-analysis-pipeline/app.py` from the root
 sys.path.append(str(Path(__file__).parent))
 
 from src.processing.data_loader import get_prepared_data
-from src.analysis.global_analysis import run_global_analysis
-from src.analysis.global_status_analysis import run_global_status_analysis
-from src.analysis.branch_analysis import run_branch_analysis
-from src.analysis.branch_status_analysis import run_branch_status_analysis
-from src.analysis.filiere_analysis import run_filiere_analysis
-from src.processing.post_processing import (
-    aggregate_company_size,
-    aggregate_employment_regions,
-    convert_all_to_percentages,
+from src.analysis.cube import EXPLORE_DIMENSIONS, STATUS_LABELS, CountCube, build_count_cube
+from src.analysis.partials import build_partial
+from src.analysis.remuneration import SalaryCube
+from src.processing.post_processing import convert_all_to_percentages
+from src.pipeline.artifacts import output_artifacts
+from src.pipeline.jobs import Job, JobRunner
+from src.pipeline.steps import BRANCH_KINDS, branch_partitions_for, run_analysis, save_all_steps_to_zip
+from src.utils.choices import ANALYSIS_KINDS, EXCEL_BACKENDS, kinds_for
+from src.utils.instrumentation import MANIFEST_SUFFIX, RunRecorder, recording, stage
+from config.settings import (
+    APP_CACHE_ENTRIES,
+    APP_JOB_TTL_SECONDS,
+    APP_JOB_WORKERS,
+    EXCEL_BACKEND,
+    EXTENDED_SALARY_STATS,
+    REQUIRED_COLUMNS,
+    SUMMARY_COLUMNS,
 )
-from src.io.data_writer import save_to_excel_singlesheet
-from config.settings import SUMMARY_COLUMNS
 
 st.set_page_config(page_title="Pipeline d'Analyse de Données", layout="wide")
 
+# Seconds between two refreshes of a running job's progress
+JOB_POLL_SECONDS = 0.5
+
+
+# --- Cached stages ---
+# Keyed by the SHA-256 of the uploaded file (arguments starting with "_" are not
+# hashed by Streamlit), so changing the aggregate / percent options or the
+# analysis type reuses the prepared frame and the counts already computed.
+
+@st.cache_data(max_entries=APP_CACHE_ENTRIES, show_spinner=False)
+def load_upload(digest: str, _upload: io.BytesIO) -> pd.DataFrame:
+    """Prepared frame of an uploaded workbook, parsed straight from the upload buffer."""
+    return get_prepared_data(source=_upload, use_cache=False, columns=REQUIRED_COLUMNS, categorical=True)
+
+
+@st.cache_data(max_entries=APP_CACHE_ENTRIES, show_spinner=False)
+def upload_cube(digest: str, _df: pd.DataFrame) -> CountCube:
+    """Count cube shared by every analysis of an upload."""
+    return build_count_cube(_df, SUMMARY_COLUMNS)
+
+
+@st.cache_data(max_entries=APP_CACHE_ENTRIES, show_spinner=False)
+def upload_partitions(digest: str, _df: pd.DataFrame) -> Optional[Dict[str, pd.DataFrame]]:
+    """Branch partition shared by the branch-level analyses of an upload."""
+    return branch_partitions_for(list(BRANCH_KINDS), _df)
+
+
+@st.cache_data(max_entries=APP_CACHE_ENTRIES * len(ANALYSIS_KINDS) * 2, show_spinner=False)
+def upload_counts(
+    digest: str,
+    kind: str,
+    salary_stats: bool,
+    _df: pd.DataFrame,
+    _cube: CountCube,
+    _partitions: Optional[Dict[str, pd.DataFrame]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Count sheets of one analysis kind for an upload."""
+    return run_analysis(kind, _df, partitions=_partitions, cube=_cube, salary_stats=salary_stats)
+
+
+@st.cache_data(max_entries=APP_CACHE_ENTRIES, show_spinner=False)
+def explorer_cubes(digest: str, _df: pd.DataFrame) -> Tuple[CountCube, SalaryCube]:
+    """Count and salary cubes of an upload, indexed for the explorer."""
+    return build_partial(_df, SUMMARY_COLUMNS).to_cubes()
+
+
+def upload_digest(uploaded_file) -> str:
+    """SHA-256 of an upload, hashed once per file and kept in the session for later reruns."""
+    file_id, digest = st.session_state.get("upload_digest", (None, None))
+    if file_id != uploaded_file.file_id:
+        digest = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+        st.session_state["upload_digest"] = (uploaded_file.file_id, digest)
+    return digest
+
+
+# --- Background jobs ---
+# One runner for the whole server: the jobs of every session share its threads,
+# so several users' reports are computed side by side while each page only polls.
+
+@st.cache_resource
+def job_runner() -> JobRunner:
+    return JobRunner(APP_JOB_WORKERS, ttl_seconds=APP_JOB_TTL_SECONDS)
+
+
+def report_job(
+    job: Job,
+    digest: str,
+    upload: io.BytesIO,
+    kinds: List[str],
+    aggregate: bool,
+    percent: bool,
+    salary_stats: bool,
+    excel_backend: str,
+) -> Tuple[io.BytesIO, Dict[str, Dict[str, pd.DataFrame]], Dict[str, Any]]:
+    """Load, analyse and write the reports of an upload; returns the ZIP, the counts and the run manifest."""
+    recorder = RunRecorder()
+    with recording(recorder):
+        # Loading, cleaning and filtering are cached per upload content; the upload
+        # is parsed in memory and nothing is written to disk
+        job.step("Chargement des données")
+        with stage("load_upload") as record:
+            df = load_upload(digest, upload)
+            record["rows"] = len(df)
+        job.step("Cube de comptage")
+        with stage("count_cube"):
+            cube = upload_cube(digest, df)
+        partitions = None
+        if any(kind in BRANCH_KINDS for kind in kinds):
+            with stage("partitions"):
+                partitions = upload_partitions(digest, df)
+
+        # Counts are cached per upload, kind and salary option; only the
+        # post-processing and the writes below run every time
+        counts = {}
+        for kind in kinds:
+            job.step(f"Analyse : {kind}")
+            with stage(f"analysis:{kind}") as record:
+                counts[kind] = upload_counts(digest, kind, salary_stats, df, cube, partitions)
+                record["sheets"] = len(counts[kind])
+
+        # Each workbook is written straight into its entry of the ZIP
+        # (named report_<kind>_<step>.xlsx, as with "all"), next to the run manifest
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for kind in kinds:
+                with stage(f"kind:{kind}"):
+                    save_all_steps_to_zip(
+                        zip_file,
+                        kind,
+                        counts[kind],
+                        aggregate=aggregate,
+                        percent=percent,
+                        excel_backend=excel_backend,
+                        on_entry=lambda name: job.step(f"Écriture : {name}"),
+                    )
+            manifest = recorder.manifest(
+                status="done",
+                digest=digest,
+                options={
+                    "kinds": kinds,
+                    "aggregate": aggregate,
+                    "percent": percent,
+                    "salary_stats": salary_stats,
+                    "excel_backend": excel_backend,
+                },
+            )
+            zip_file.writestr(f"report{MANIFEST_SUFFIX}", json.dumps(manifest, indent=2, default=str))
+    zip_buffer.seek(0)
+    return zip_buffer, counts, manifest
+
+
+def report_job_stages(kinds: List[str], aggregate: bool, percent: bool) -> int:
+    # Load, cube, one analysis per kind and one write per workbook
+    return 2 + len(kinds) * (1 + len(output_artifacts(aggregate, percent)))
+
+
+def show_job(job: Job) -> None:
+    """Progress of a running job, or its outcome."""
+    if not job.finished:
+        st.progress(job.fraction, text=job.stage or "En attente...")
+        if st.button("Annuler"):
+            job.cancel()
+        return
+
+    if job.status == "cancelled":
+        st.warning("Analyse annulée.")
+        return
+    if job.status == "failed":
+        st.error(f"Une erreur est survenue : {job.error}")
+        return
+
+    zip_buffer, counts, manifest = job.result
+    st.success("Analyse terminée avec succès !")
+
+    # The buffer itself is handed over, not a copy of its bytes
+    zip_buffer.seek(0)
+    st.download_button(
+        label="Télécharger tous les rapports (ZIP)",
+        data=zip_buffer,
+        file_name="rapports_analyse.zip",
+        mime="application/zip"
+    )
+
+    with st.expander(f"Durée par étape ({manifest['wall_s']:.1f} s au total)"):
+        stages = pd.DataFrame(manifest["stages"], columns=["name", "wall_s", "cpu_s", "rows", "sheets"])
+        st.dataframe(stages.set_index("name"))
+
+    # Optional: Display preview of some data
+    st.subheader("Aperçu des résultats")
+    if counts:
+        preview_kind = next(iter(counts))
+        st.write(f"Aperçu pour {preview_kind} (première feuille) :")
+        # Display the first sheet of the first analysis
+        sheets_counts = counts[preview_kind]
+        if sheets_counts:
+             first_sheet_name = list(sheets_counts.keys())[0]
+             st.write(f"Feuille : {first_sheet_name}")
+             st.dataframe(sheets_counts[first_sheet_name].head())
+
+
+def show_explorer(digest: str, upload: io.BytesIO) -> None:
+    """Drill-down into the counts of an upload: every table is a slice of the cached cubes."""
+    st.subheader("Explorateur")
+    with st.spinner("Indexation des données..."):
+        cube, salaries = explorer_cubes(digest, load_upload(digest, upload))
+
+    columns = [col for col in SUMMARY_COLUMNS if col in cube.counts]
+    if not columns:
+        st.warning("Aucune colonne de synthèse dans ce fichier.")
+        return
+    left, middle, right = st.columns(3)
+    col = left.selectbox("Colonne", columns)
+    by = middle.selectbox("Ventiler par", [None, *EXPLORE_DIMENSIONS], format_func=lambda dim: dim or "Aucune")
+    percent = right.radio("Valeurs", ["Effectifs", "Pourcentages"], horizontal=True) == "Pourcentages"
+
+    # An empty filter keeps every value, missing ones included
+    filters = st.columns(5)
+    selection = {
+        "branches": filters[0].multiselect("Branches", cube.branches),
+        "filieres": filters[1].multiselect("Filières", list(cube.filiere_labels)),
+        "statuses": filters[2].multiselect("Statut", list(STATUS_LABELS)),
+        "years": filters[3].multiselect("Années", list(cube.year_labels)),
+        "genders": filters[4].multiselect("Genre", list(cube.gender_labels)),
+    }
+    selection = {key: values or None for key, values in selection.items()}
+
+    table = cube.explore(col, by, **selection)
+    if table.empty:
+        st.info("Aucune ligne ne correspond à cette sélection.")
+        return
+    if percent:
+        table = convert_all_to_percentages({col: table})[col].round(1)
+    st.dataframe(table)
+
+    if salaries.salary_columns:
+        masks = cube.selection(**selection)
+        means = pd.DataFrame({"Tous": salaries.means(masks)})
+        if salaries.has_region:
+            means["France"] = salaries.means(masks, france=True)
+        st.write("Salaire moyen de la sélection :")
+        st.dataframe(means.round(0))
+
+
 st.title("Rapports d'analyse des données d'insertion professionnelle")
 
 st.markdown("""
@@ -44,7 +275,7 @@ uploaded_file = st.sidebar.file_uploader("Choisir un fichier Excel", type=["xlsx
 
 analysis_type = st.sidebar.selectbox(
     "Type d'analyse",
-    ["global", "global_status", "branch", "branch_status", "filiere", "all"],
+    [*ANALYSIS_KINDS, "all"],
     index=5,
     help="Choisissez le niveau d'analyse souhaité."
 )
@@ -61,115 +292,57 @@ do_percent = st.sidebar.checkbox(
     help="Générer des fichiers avec des pourcentages."
 )
 
+do_salary_stats = st.sidebar.checkbox(
+    "Statistiques de salaire détaillées",
+    value=EXTENDED_SALARY_STATS,
+    help="Ajouter effectif, médiane, quartiles et écart-type des salaires."
+)
+
+excel_backend = st.sidebar.selectbox(
+    "Moteur d'écriture Excel",
+    EXCEL_BACKENDS,
+    index=EXCEL_BACKENDS.index(EXCEL_BACKEND),
+    help="xlsxwriter écrit les lignes au fil de l'eau (mémoire constante), plus rapide sur les gros classeurs."
+)
+
 # --- Main Logic ---
 
-def run_analysis_logic(kind: str, df: pd.DataFrame) -> dict[str, pd.DataFrame]:
-    if kind == "global":
-        return run_global_analysis(df, SUMMARY_COLUMNS)
-    if kind == "global_status":
-        return run_global_status_analysis(df, SUMMARY_COLUMNS)
-    if kind == "branch":
-        return run_branch_analysis(df, SUMMARY_COLUMNS)
-    if kind == "branch_status":
-        return run_branch_status_analysis(df, SUMMARY_COLUMNS)
-    if kind == "filiere":
-        return run_filiere_analysis(df, SUMMARY_COLUMNS)
-    raise ValueError(f"Unknown analysis kind: {kind}")
+runner = job_runner()
+job = runner.get(st.session_state.get("job_id"))
 
 if uploaded_file is not None:
     st.info(f"Fichier chargé : {uploaded_file.name}")
-    
-    if st.button("Lancer l'analyse"):
-        with st.spinner('Traitement en cours...'):
-            try:
-                # Create a temporary directory for processing
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    temp_path = Path(temp_dir)
-                    input_path = temp_path / uploaded_file.name
-                    
-                    # Save uploaded file
-                    with open(input_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-                    
-                    # Load data
-                    # We pass the temp directory and filename to get_prepared_data
-                    # It handles loading, cleaning, and filtering
-                    df = get_prepared_data(input_dir=temp_path, input_file_name=uploaded_file.name)
-                    
-                    outputs = {}
-                    kinds = [analysis_type] if analysis_type != "all" else ["global", "global_status", "branch", "branch_status", "filiere"]
-                    
-                    generated_files = []
-
-                    for kind in kinds:
-                        st.text(f"Exécution de l'analyse : {kind}...")
-                        
-                        # 1. Counts
-                        sheets_counts = run_analysis_logic(kind, df)
-                        
-                        # Save counts
-                        out_counts_name = f"report_{kind}_counts.xlsx"
-                        out_counts_path = temp_path / out_counts_name
-                        save_to_excel_singlesheet(sheets_counts, out_counts_path)
-                        generated_files.append(out_counts_path)
-                        
-                        sheets_agg = None
-                        # 2. Aggregated
-                        if do_aggregate:
-                            sheets_agg = aggregate_employment_regions(dict(sheets_counts))
-                            sheets_agg = aggregate_company_size(sheets_agg)
-                            
-                            out_agg_name = f"report_{kind}_aggregated.xlsx"
-                            out_agg_path = temp_path / out_agg_name
-                            save_to_excel_singlesheet(sheets_agg, out_agg_path)
-                            generated_files.append(out_agg_path)
-                        
-                        # 3. Percent
-                        if do_percent:
-                            source_for_percent = sheets_agg if sheets_agg is not None else sheets_counts
-                            sheets_pct = convert_all_to_percentages(source_for_percent)
-                            
-                            out_pct_name = f"report_{kind}_percent.xlsx"
-                            out_pct_path = temp_path / out_pct_name
-                            save_to_excel_singlesheet(sheets_pct, out_pct_path)
-                            generated_files.append(out_pct_path)
-
-                    st.success("Analyse terminée avec succès !")
-
-                    # Create a zip file containing all generated reports
-                    zip_buffer = io.BytesIO()
-                    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                        for file_path in generated_files:
-                            zip_file.write(file_path, arcname=file_path.name)
-                    
-                    st.download_button(
-                        label="Télécharger tous les rapports (ZIP)",
-                        data=zip_buffer.getvalue(),
-                        file_name="rapports_analyse.zip",
-                        mime="application/zip"
-                    )
-                    
-                    # Optional: Display preview of some data
-                    st.subheader("Aperçu des résultats")
-                    if kinds:
-                        preview_kind = kinds[0]
-                        st.write(f"Aperçu pour {preview_kind} (première feuille) :")
-                        # Display the first sheet of the first analysis
-                        # We need to re-read or just use the variable we have.
-                        # Since we iterated, let's just grab the last computed sheets_counts or similar
-                        # But better to just show the last processed one from the loop
-                        if 'sheets_counts' in locals():
-                             first_sheet_name = list(sheets_counts.keys())[0]
-                             st.write(f"Feuille : {first_sheet_name}")
-                             st.dataframe(sheets_counts[first_sheet_name].head())
-
-
-            except Exception as e:
-                st.error(f"Une erreur est survenue : {e}")
-                # Print traceback to console for debugging
-                import traceback
-                traceback.print_exc()
+    digest = upload_digest(uploaded_file)
+
+    running = job is not None and not job.finished
+    if st.button("Lancer l'analyse", disabled=running):
+        # A new run replaces this session's previous job and its result
+        runner.discard(st.session_state.get("job_id"))
+        kinds = kinds_for(analysis_type)
+        job = runner.submit(
+            report_job,
+            digest,
+            uploaded_file,
+            kinds,
+            do_aggregate,
+            do_percent,
+            do_salary_stats,
+            excel_backend,
+            total_stages=report_job_stages(kinds, do_aggregate, do_percent),
+        )
+        st.session_state["job_id"] = job.id
+
+    if job is not None:
+        show_job(job)
+
+    if st.checkbox("Explorer les données", help="Tableaux croisés à la demande, sans générer les rapports."):
+        # Own stream over the upload, so a running job's reads are not disturbed
+        show_explorer(digest, io.BytesIO(uploaded_file.getbuffer()))
+
+    # Refresh the progress until the job ends, once the rest of the page is drawn
+    if job is not None and not job.finished:
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
 
 else:
     st.info("Veuillez charger un fichier Excel pour commencer.")
-
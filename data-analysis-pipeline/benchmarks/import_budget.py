@@ -0,0 +1,108 @@
+"""Startup-time budget of the command line.
+
+Runs main.py in fresh interpreters for the commands that should return
+without any analysis work: --help and a rerun whose outputs are up to date.
+Fails (exit 1) when one of them takes longer than --budget-ms or imports
+pandas, numpy, openpyxl, pyarrow, xlsxwriter or the analysis modules:
+
+    python benchmarks/import_budget.py --budget-ms 250
+
+To find what got imported: python -X importtime main.py --help
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+# Packages (with their submodules) that only analysis work may import
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow", "xlsxwriter", "src.analysis")
+DEFAULT_BUDGET_MS: float = 250.0
+
+# Runs main.py as `python main.py ...` would, then reports what it imported
+PROBE = """
+import json, runpy, sys, time
+start = time.perf_counter()
+sys.argv = ["main.py", *sys.argv[1:]]
+try:
+    runpy.run_path("main.py", run_name="__main__")
+    code = 0
+except SystemExit as exc:
+    code = exc.code or 0
+print(json.dumps({{
+    "code": code,
+    "in_process_ms": (time.perf_counter() - start) * 1000,
+    "heavy": sorted(name for name in sys.modules if name in {heavy!r} or name.startswith({packages!r})),
+}}))
+"""
+
+
+def probe(argv: List[str], repeat: int) -> Dict[str, object]:
+    """Best wall time of a fresh `python main.py argv` over repeat runs, and the heavy modules it imported."""
+    best = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES, packages=tuple(name + "." for name in HEAVY_MODULES)), *argv],
+            cwd=ROOT, capture_output=True, text=True, check=False,
+        )
+        wall_ms = (time.perf_counter() - start) * 1000
+        lines = completed.stdout.strip().splitlines()
+        if completed.returncode != 0 or not lines:
+            raise RuntimeError(f"main.py {' '.join(argv)} failed:\n{completed.stdout}{completed.stderr}")
+        result = {**json.loads(lines[-1]), "wall_ms": wall_ms}
+        if result["code"] != 0:
+            raise RuntimeError(f"main.py {' '.join(argv)} exited with {result['code']}:\n{completed.stdout}")
+        if best is None or wall_ms < best["wall_ms"]:
+            best = result
+    return best
+
+
+def up_to_date_args(workdir: Path) -> List[str]:
+    """Arguments of a run whose outputs are already written, so main.py only checks the fingerprint."""
+    from src.utils.synthetic import synthetic_survey, write_synthetic_workbook
+
+    workbook = write_synthetic_workbook(synthetic_survey(200), workdir / "survey.xlsx")
+    # An absolute --input-file is used as is (DATA_DIR / absolute path)
+    argv = ["--analysis", "global", "--input-file", str(workbook), "--output", str(workdir / "report"), "--no-cache"]
+    subprocess.run([sys.executable, "main.py", *argv], cwd=ROOT, capture_output=True, check=True)
+    return argv
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check the startup time and imports of main.py")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Allowed wall time per command")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command (the fastest one is kept)")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix="startup-") as tmp:
+        commands = {"--help": ["--help"], "up-to-date run": up_to_date_args(Path(tmp))}
+        print(f"{'command':<16} {'wall (ms)':>10} {'main.py (ms)':>13}  heavy imports")
+        for name, command in commands.items():
+            result = probe(command, args.repeat)
+            heavy = ", ".join(result["heavy"]) or "-"
+            print(f"{name:<16} {result['wall_ms']:>10.0f} {result['in_process_ms']:>13.0f}  {heavy}")
+            if result["heavy"]:
+                failures += 1
+                print(f"FAIL {name}: imports {heavy}")
+            if result["wall_ms"] > args.budget_ms:
+                failures += 1
+                print(f"FAIL {name}: {result['wall_ms']:.0f} ms > {args.budget_ms:.0f} ms budget")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
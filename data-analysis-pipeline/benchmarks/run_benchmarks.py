@@ -0,0 +1,230 @@
+"""End-to-end benchmarks of the pipeline's hot paths on synthetic surveys.
+
+Times (wall and CPU, best of --repeat) and memory-profiles (tracemalloc peak,
+one extra run) get_prepared_data, each run_* analysis, the post-processing
+steps and each data_writer export, at every --rows size:
+
+    python benchmarks/run_benchmarks.py --rows 10000 100000 1000000 --json bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json   # exit 1 on regressions
+
+Workbooks are only read for sizes up to --max-load-rows (parsing a 1M-row
+workbook takes minutes); larger frames are prepared in memory instead.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Run from anywhere: the pipeline package is the parent directory
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from config.settings import CATEGORICAL_COLUMNS, REQUIRED_COLUMNS, SUMMARY_COLUMNS, YEAR_COL, YEAR_INTERVAL
+from src.analysis.cube import build_count_cube
+from src.io.data_writer import (
+    save_to_excel_multisheet,
+    save_to_excel_single_report,
+    save_to_excel_singlesheet,
+    save_to_pickle,
+)
+from src.io.report_store import save_report_store
+from src.pipeline.steps import run_analysis
+from src.processing.data_loader import encode_categoricals, filter_by_year_interval, get_prepared_data
+from src.processing.post_processing import aggregate_categories, convert_all_to_percentages
+from src.utils.choices import ANALYSIS_KINDS, EXCEL_BACKENDS
+from src.utils.logging_config import setup_logging
+from src.utils.synthetic import synthetic_survey, write_synthetic_workbook
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROWS: List[int] = [10_000, 100_000, 1_000_000]
+
+
+def measure(stage: str, rows: int, func: Callable[[], object], repeat: int) -> Dict[str, object]:
+    """Best wall / CPU time of func over repeat runs, then its tracemalloc peak on one more run."""
+    wall, cpu = [], []
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        func()
+        wall.append(time.perf_counter() - start_wall)
+        cpu.append(time.process_time() - start_cpu)
+
+    # Separate run: tracing allocations slows the timed code down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    result = {
+        "rows": rows,
+        "stage": stage,
+        "wall_s": min(wall),
+        "cpu_s": min(cpu),
+        "peak_mb": peak / 2**20,
+    }
+    print(f"{rows:>10,} {stage:<44} {result['wall_s']:>9.3f} {result['cpu_s']:>9.3f} {result['peak_mb']:>10.1f}", flush=True)
+    return result
+
+
+def prepare_in_memory(frame: pd.DataFrame) -> pd.DataFrame:
+    """What get_prepared_data does after parsing: year filter and categorical encoding."""
+    return encode_categoricals(filter_by_year_interval(frame, YEAR_COL, YEAR_INTERVAL), CATEGORICAL_COLUMNS)
+
+
+def bench_size(args: argparse.Namespace, rows: int, workdir: Path) -> List[Dict[str, object]]:
+    results = []
+    frame = synthetic_survey(rows, seed=args.seed, extra_columns=args.extra_columns)
+
+    if rows <= args.max_load_rows:
+        workbook = workdir / f"synthetic_{rows}_{args.seed}.xlsx"
+        if not workbook.exists():
+            write_synthetic_workbook(frame, workbook)
+
+        def load() -> pd.DataFrame:
+            return get_prepared_data(source=workbook, use_cache=False, columns=REQUIRED_COLUMNS, categorical=True)
+
+        results.append(measure("load:get_prepared_data", rows, load, args.load_repeat))
+        df = load()
+    else:
+        results.append(measure("load:prepare_in_memory", rows, partial(prepare_in_memory, frame), args.repeat))
+        df = prepare_in_memory(frame)
+    del frame
+
+    results.append(measure("analysis:build_count_cube", rows, lambda: build_count_cube(df, SUMMARY_COLUMNS), args.repeat))
+    counts = {}
+    for kind in ANALYSIS_KINDS:
+        results.append(measure(f"analysis:run_{kind}", rows, lambda: run_analysis(kind, df), args.repeat))
+        counts[kind] = run_analysis(kind, df)
+
+    # Post-processing and writes run on every kind's sheets, as --analysis all does
+    sheets = {f"{kind}/{name}": table for kind, kind_sheets in counts.items() for name, table in kind_sheets.items()}
+    results.append(measure("post:aggregate_categories", rows, lambda: aggregate_categories(sheets), args.repeat))
+    results.append(measure("post:convert_all_to_percentages", rows, lambda: convert_all_to_percentages(sheets), args.repeat))
+
+    out = workdir / "out"
+    global_sheets = counts["global"]
+
+    def save_singlesheets(backend: str) -> None:
+        # One combined workbook per kind, as save_all_steps writes them
+        for kind, kind_sheets in counts.items():
+            save_to_excel_singlesheet(kind_sheets, out / f"single_{kind}.xlsx", backend=backend)
+
+    for backend in args.backends:
+        results.append(measure(
+            f"write:save_to_excel_multisheet[{backend}]", rows,
+            lambda: save_to_excel_multisheet(global_sheets, out / "multi.xlsx", backend=backend), args.repeat,
+        ))
+        results.append(measure(
+            f"write:save_to_excel_single_report[{backend}]", rows,
+            lambda: save_to_excel_single_report(global_sheets, out / "report.xlsx", backend=backend), args.repeat,
+        ))
+        results.append(measure(
+            f"write:save_to_excel_singlesheet[{backend}]", rows,
+            lambda: save_singlesheets(backend), args.repeat,
+        ))
+    results.append(measure("write:save_to_pickle", rows, lambda: save_to_pickle(sheets, out / "all.pkl"), args.repeat))
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.warning("pyarrow is not installed; skipping the report store benchmark")
+    else:
+        results.append(measure(
+            "write:save_report_store", rows, lambda: save_report_store(sheets, out / "all.report"), args.repeat
+        ))
+    return results
+
+
+def compare(results: List[Dict[str, object]], baseline_path: Path, tolerance: float) -> int:
+    """Print the stages slower than the baseline by more than tolerance; return how many."""
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = {(r["rows"], r["stage"]): r for r in json.load(handle)["results"]}
+    regressions = 0
+    for result in results:
+        before = baseline.get((result["rows"], result["stage"]))
+        if before is None or before["wall_s"] <= 0:
+            continue
+        ratio = result["wall_s"] / before["wall_s"]
+        if ratio > 1 + tolerance:
+            regressions += 1
+            print(f"REGRESSION {result['rows']:,} {result['stage']}: {before['wall_s']:.3f}s -> {result['wall_s']:.3f}s (x{ratio:.2f})")
+    return regressions
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic surveys")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Row counts to benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic surveys")
+    parser.add_argument("--extra-columns", type=int, default=10, help="Unused free-text columns per workbook")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (the best one is kept)")
+    parser.add_argument("--load-repeat", type=int, default=1, help="Timed runs of the workbook load")
+    parser.add_argument(
+        "--max-load-rows", type=int, default=100_000,
+        help="Largest size read from a workbook; larger frames are prepared in memory",
+    )
+    parser.add_argument("--backends", nargs="+", choices=EXCEL_BACKENDS, default=list(EXCEL_BACKENDS))
+    parser.add_argument(
+        "--workdir", type=Path, default=None,
+        help="Keep the synthetic workbooks and outputs here (reused across runs); default: a temporary directory",
+    )
+    parser.add_argument("--json", type=Path, default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, default=None, help="Baseline JSON: exit 1 if a stage got slower")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against --compare")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's INFO logs")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    setup_logging(logging.INFO if args.verbose else logging.WARNING)
+
+    results: List[Dict[str, object]] = []
+    print(f"{'rows':>10} {'stage':<44} {'wall (s)':>9} {'cpu (s)':>9} {'peak (MB)':>10}")
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        workdir = args.workdir or Path(tmp)
+        for rows in args.rows:
+            results.extend(bench_size(args, rows, workdir))
+    max_rss = None
+    if resource is not None:
+        # ru_maxrss is in kB on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+        print(f"Peak RSS of the run: {max_rss:.0f} MB")
+
+    if args.json is not None:
+        report = {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "seed": args.seed,
+            "max_rss_mb": max_rss,
+            "results": results,
+        }
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.compare is not None and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ from pathlib import Path
 PROJECT_ROOT: Path = Path(__file__).resolve().parents[1]
 DATA_DIR: Path = PROJECT_ROOT / "data"
 REPORTS_DIR: Path = PROJECT_ROOT / "reports"
+CACHE_DIR: Path = PROJECT_ROOT / ".cache"
+SHARDS_DIR: Path = PROJECT_ROOT / "shards"
 
 # Input file name (place your Excel file in data/)
 INPUT_FILE_NAME: str = "Enq2025_Calculs TCD Branches Initial.xlsx"
@@ -19,6 +21,20 @@ STATUS_INITIAL_VAL: str = "En formation initiale (hors alternance)"
 
 # Parameters
 YEAR_INTERVAL: int = 2  # inclusive interval: [max_year - YEAR_INTERVAL, max_year]
+USE_DATA_CACHE: bool = True  # cache the cleaned input frame in CACHE_DIR (keyed by file content)
+CACHE_MAX_ENTRIES: int = 16  # cleaned frames kept in CACHE_DIR; the least recently used are deleted (0 = no limit)
+ANALYSIS_WORKERS: int = 1  # worker processes for --analysis all (1 = run in the main process)
+BATCH_WORKERS: int = 4  # input workbooks "main.py batch" processes at once (--jobs; 1 = one after the other)
+WATCH_POLL_SECONDS: float = 5.0  # seconds between two scans of the directory watched by "main.py watch"
+WATCH_SETTLE_SECONDS: float = 10.0  # a watched workbook is processed once unchanged (size, mtime) for this long
+EXCEL_BACKEND: str = "openpyxl"  # workbook writer: "openpyxl" or "xlsxwriter" (constant-memory streaming)
+REPORT_FORMAT: str = "arrow"  # machine-readable copy of each workbook: "arrow" (report store) or "pickle"
+AUTOFIT_SAMPLE_ROWS: int = 0  # rows measured per column when auto-fitting widths (0 = every row)
+PARTIAL_CHUNK_ROWS: int = 0  # rows per chunk when aggregating out of core (0 = load the whole frame)
+RUN_MANIFEST: bool = True  # write <output>.manifest.json with the time and memory of every stage of a run
+APP_CACHE_ENTRIES: int = 4  # uploads whose prepared frame and counts the Streamlit app keeps cached
+APP_JOB_WORKERS: int = 2  # report jobs the Streamlit app runs at once (threads shared by every user)
+APP_JOB_TTL_SECONDS: int = 3600  # finished app jobs (and their ZIP) are dropped after this long, even if never downloaded
 
 # List of summary columns to pivot on in analyses
 # Adjust this list to include all the categorical columns you want to summarize.
@@ -43,5 +59,30 @@ REGION_FOREIGN_COL: str = "EmploiLieuRegionEtranger"
 # Output sheet names for remuneration summaries
 REMUNERATION_SHEET_NAME: str = "Remuneration"
 REMUNERATION_FR_SHEET_NAME: str = "Remuneration (France)"
+# Extended salary statistics sheets (count, mean, median, p25, p75, std per salary column)
+REMUNERATION_STATS_SHEET_NAME: str = "Remuneration stats"
+REMUNERATION_STATS_FR_SHEET_NAME: str = "Remuneration stats (France)"
+EXTENDED_SALARY_STATS: bool = False  # also write the extended salary statistics sheets
 
 
+# Columns needed by the analyses; with column projection only these are read from the input
+REQUIRED_COLUMNS: list[str] = list(
+    dict.fromkeys(
+        [
+            YEAR_COL,
+            GENDER_COL,
+            BRANCH_COL,
+            FILIER_COL,
+            STATUS_COL,
+            *SUMMARY_COLUMNS,
+            SALARY_AP_COL,
+            SALARY_HP_COL,
+            REGION_FOREIGN_COL,
+        ]
+    )
+)
+
+# Columns dictionary-encoded as pandas categoricals when categorical loading is enabled
+CATEGORICAL_COLUMNS: list[str] = list(
+    dict.fromkeys([GENDER_COL, BRANCH_COL, FILIER_COL, STATUS_COL, *SUMMARY_COLUMNS])
+)
@@ -1,48 +1,58 @@
 from __future__ import annotations
 
 import argparse
+import glob
+import json
 import logging
+import sys
+import time
 from pathlib import Path
-
-import pandas as pd
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
 
 from config.settings import (
+    ANALYSIS_WORKERS,
+    BATCH_WORKERS,
     DATA_DIR,
+    EXCEL_BACKEND,
+    REPORT_FORMAT,
+    EXTENDED_SALARY_STATS,
     REPORTS_DIR,
     INPUT_FILE_NAME,
-    SUMMARY_COLUMNS,
+    PARTIAL_CHUNK_ROWS,
+    REQUIRED_COLUMNS,
+    RUN_MANIFEST,
+    SHARDS_DIR,
+    WATCH_POLL_SECONDS,
+    WATCH_SETTLE_SECONDS,
 )
 from src.utils.logging_config import setup_logging
-from src.processing.data_loader import get_prepared_data
-from src.analysis.global_analysis import run_global_analysis
-from src.analysis.global_status_analysis import run_global_status_analysis
-from src.analysis.branch_analysis import run_branch_analysis
-from src.analysis.branch_status_analysis import run_branch_status_analysis
-from src.analysis.filiere_analysis import run_filiere_analysis
-from src.processing.post_processing import (
-    aggregate_company_size,
-    aggregate_employment_regions,
-    convert_all_to_percentages,
-)
-from src.io.data_writer import (
-    save_to_pickle,
-    save_to_excel_singlesheet,
-)
+from src.utils.choices import ANALYSIS_KINDS, EXCEL_BACKENDS, REPORT_FORMATS, kinds_for
+from src.pipeline.fingerprint import clear_fingerprint, is_up_to_date, record_fingerprint, run_fingerprint
+from src.utils.instrumentation import RunRecorder, manifest_path, recording, stage
 
+# pandas, openpyxl and the analyses are imported by the commands that use them:
+# --help, argument errors and up-to-date runs then return without loading them
+if TYPE_CHECKING:
+    from src.analysis.partials import PartialAggregate
 
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Data Analysis Pipeline")
+
+def _add_output_args(
+    parser: argparse.ArgumentParser, default_analysis: str | None = None, output: bool = True
+) -> None:
+    """Arguments selecting the analyses and their outputs, shared by the run, merge and batch commands."""
     parser.add_argument(
         "--analysis",
-        required=True,
-        choices=["global", "global_status", "branch", "branch_status", "filiere", "all"],
+        required=default_analysis is None,
+        default=default_analysis,
+        choices=[*ANALYSIS_KINDS, "all"],
         help="Which analysis to run",
     )
-    parser.add_argument(
-        "--output",
-        required=True,
-        help="Base output path (without extension). e.g., reports/run_2025",
-    )
+    if output:
+        parser.add_argument(
+            "--output",
+            required=True,
+            help="Base output path (without extension). e.g., reports/run_2025",
+        )
     parser.add_argument(
         "--aggregate",
         action="store_true",
@@ -56,111 +66,624 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--no-pickle",
         action="store_true",
-        help="Skip saving pickle outputs",
+        help="Skip saving the machine-readable report outputs (report store or pickle)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=ANALYSIS_WORKERS,
+        help="Worker processes used to run and save the analyses in parallel (with --analysis all)",
+    )
+    parser.add_argument(
+        "--excel-backend",
+        choices=EXCEL_BACKENDS,
+        default=EXCEL_BACKEND,
+        help="Workbook writer: openpyxl, or xlsxwriter to stream rows in constant memory",
+    )
+    parser.add_argument(
+        "--report-format",
+        choices=REPORT_FORMATS,
+        default=REPORT_FORMAT,
+        help="Machine-readable copy of each workbook: arrow (.report store, one file per sheet) or pickle (.pkl)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rerun even when the inputs, settings and options match the last run's fingerprint",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="Do not write <output>.manifest.json (per-stage wall / CPU time and memory of the run)",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Add the tracemalloc peak of every stage to the run manifest (slower)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        default=None,
+        help="Run stages under cProfile and write one .prof file per stage to DIR",
+    )
+    parser.add_argument(
+        "--profile-stages",
+        metavar="PATTERN",
+        default="*",
+        help="With --profile, only profile the outermost stages matching this pattern (e.g. 'kind:*')",
     )
+
+
+def _add_input_args(parser: argparse.ArgumentParser) -> None:
+    """Arguments controlling how an input workbook is read, shared by the run and batch commands."""
     parser.add_argument(
         "--single-sheet",
         action="store_true",
         help="For global analysis: write all pivots on a single sheet",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-read the input workbook instead of using the cleaned-data cache",
+    )
+    parser.add_argument(
+        "--project-columns",
+        action="store_true",
+        help="Only read the columns used by the analyses (REQUIRED_COLUMNS in settings)",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Stream the workbook row by row and drop rows outside YEAR_INTERVAL while reading",
+    )
+    parser.add_argument(
+        "--categorical",
+        action="store_true",
+        help="Encode the categorical survey columns (CATEGORICAL_COLUMNS) as pandas categoricals",
+    )
+    parser.add_argument(
+        "--salary-stats",
+        action="store_true",
+        default=EXTENDED_SALARY_STATS,
+        help="Add salary count / median / quartile / std sheets next to the mean remuneration sheets",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=PARTIAL_CHUNK_ROWS,
+        help="Aggregate the input N rows at a time instead of loading it whole (0 = off)",
+    )
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Data Analysis Pipeline",
+        epilog="Sharded runs: 'main.py shard --help' and 'main.py merge --help'. "
+        "Many workbooks: 'main.py batch --help' and 'main.py watch --help'. "
+        "Empty the data cache: 'main.py clear-cache'.",
+    )
+    _add_output_args(parser)
     parser.add_argument(
         "--input-file",
         default=INPUT_FILE_NAME,
         help="Input Excel file name in data/ directory",
     )
-    return parser.parse_args()
+    _add_input_args(parser)
+    return parser.parse_args(argv)
+
+
+def parse_shard_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py shard",
+        description="Write one partial-aggregate artifact (.npz) per input workbook",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Input Excel files (paths, or names in the data/ directory)",
+    )
+    parser.add_argument(
+        "--out-dir",
+        default=str(SHARDS_DIR),
+        help="Directory receiving one <input name>.npz shard per input",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=PARTIAL_CHUNK_ROWS,
+        help="Read each input N rows at a time (0 = load it whole, through the data cache)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-read the input workbooks instead of using the cleaned-data cache",
+    )
+    parser.add_argument(
+        "--project-columns",
+        action="store_true",
+        help="Only read the columns used by the analyses (REQUIRED_COLUMNS in settings)",
+    )
+    return parser.parse_args(argv)
 
 
-def maybe_post_process(sheets: dict[str, pd.DataFrame], do_agg: bool, to_percent: bool) -> dict[str, pd.DataFrame]:
-    if do_agg:
-        sheets = aggregate_employment_regions(sheets)
-        sheets = aggregate_company_size(sheets)
-    if to_percent:
-        sheets = convert_all_to_percentages(sheets)
-    return sheets
+def parse_merge_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py merge",
+        description="Merge shards written by 'main.py shard' into the report workbooks",
+    )
+    parser.add_argument(
+        "shards",
+        nargs="+",
+        help="Shard files, or directories whose *.npz files are all merged",
+    )
+    _add_output_args(parser, default_analysis="all")
+    return parser.parse_args(argv)
 
 
-def run_analysis(kind: str, df: pd.DataFrame) -> dict[str, pd.DataFrame]:
-    if kind == "global":
-        return run_global_analysis(df, SUMMARY_COLUMNS)
-    if kind == "global_status":
-        return run_global_status_analysis(df, SUMMARY_COLUMNS)
-    if kind == "branch":
-        return run_branch_analysis(df, SUMMARY_COLUMNS)
-    if kind == "branch_status":
-        return run_branch_status_analysis(df, SUMMARY_COLUMNS)
-    if kind == "filiere":
-        return run_filiere_analysis(df, SUMMARY_COLUMNS)
-    raise ValueError(f"Unknown analysis kind: {kind}")
+def _add_batch_args(parser: argparse.ArgumentParser) -> None:
+    """Arguments of the commands running many inputs (batch and watch), each as a run would."""
+    parser.add_argument(
+        "--out-dir",
+        default=str(REPORTS_DIR),
+        help="Directory receiving one <input name>/ directory of reports per input",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=BATCH_WORKERS,
+        help="Input workbooks processed at once, each in its own process (times --workers processes per input)",
+    )
+    _add_output_args(parser, default_analysis="all", output=False)
+    _add_input_args(parser)
 
 
-def main() -> None:
-    setup_logging()
-    args = parse_args()
+def parse_batch_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="Write the reports of many input workbooks, each in its own output directory",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Input Excel files (paths, or names in the data/ directory), directories "
+        "(every workbook in them) or glob patterns such as 'exports/*.xlsx'",
+    )
+    _add_batch_args(parser)
+    return parser.parse_args(argv)
+
+
+def parse_watch_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py watch",
+        description="Refresh the reports of every workbook of a directory as new or changed ones land in it",
+    )
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default=str(DATA_DIR),
+        help="Directory to watch (default: the data/ directory)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=WATCH_POLL_SECONDS,
+        help="Seconds between two scans of the directory",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=WATCH_SETTLE_SECONDS,
+        help="Seconds a workbook's size and modification time must stay unchanged before it is processed "
+        "(files still being copied are left alone)",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Exit once every workbook present has been processed, instead of watching forever",
+    )
+    _add_batch_args(parser)
+    return parser.parse_args(argv)
+
+
+def _input_path(name: str) -> Path:
+    """An input given as an existing path, otherwise a file name in DATA_DIR."""
+    path = Path(name)
+    return path if path.exists() else DATA_DIR / name
+
+
+def _shard_paths(names: List[str]) -> List[Path]:
+    paths: List[Path] = []
+    for name in names:
+        path = Path(name)
+        paths.extend(sorted(path.glob("*.npz")) if path.is_dir() else [path])
+    return paths
+
+
+# Workbooks picked up from directories given to the batch command
+BATCH_SUFFIXES = (".xlsx", ".xls")
+BATCH_SUMMARY_NAME = "batch_summary.json"
+# Arguments of the batch and watch commands that are not run options
+BATCH_ONLY_OPTIONS = ("inputs", "out_dir", "jobs", "directory", "interval", "settle", "once")
+
+
+def _batch_paths(names: List[str]) -> List[Path]:
+    """Workbooks named by files, directories and glob patterns, without duplicates or Excel lock files."""
+    paths: List[Path] = []
+    for name in names:
+        path = Path(name)
+        if path.is_dir():
+            matches = sorted(p for suffix in BATCH_SUFFIXES for p in path.glob(f"*{suffix}"))
+        elif glob.has_magic(name):
+            matches = sorted(Path(match) for match in glob.glob(name))
+        else:
+            matches = [_input_path(name)]
+        paths.extend(p for p in matches if not p.name.startswith("~$"))
+    return list(dict.fromkeys(path.resolve() for path in paths))
+
+
+def _stem_clashes(paths: List[Path]) -> List[Path]:
+    """Inputs whose outputs would land in the same <out-dir>/<name>/ directory."""
+    stems: Dict[str, List[Path]] = {}
+    for path in paths:
+        stems.setdefault(path.stem, []).append(path)
+    return [path for same in stems.values() if len(same) > 1 for path in same]
+
+
+# Options that change how a run executes, not what it writes
+RUN_ONLY_OPTIONS = ("workers", "no_cache", "force", "no_manifest", "trace_memory", "profile", "profile_stages")
+
+
+def run_unless_up_to_date(
+    args: argparse.Namespace, inputs: List[Path], run: Callable[[], Dict[str, List[Path]]]
+) -> bool:
+    """Call run() unless the outputs at --output come from identical inputs, settings and options.
+
+    The fingerprint is recorded next to the outputs (<output>.fingerprint.json)
+    after a successful run; --force always reruns. Every stage of the run is
+    timed, and the run manifest (<output>.manifest.json) is written even when
+    the run fails; a skipped run leaves the previous manifest in place.
+    Returns whether run() was called.
+    """
+    base = Path(args.output)
+    options = {key: value for key, value in vars(args).items() if key not in RUN_ONLY_OPTIONS}
+    recorder = RunRecorder(args.trace_memory, args.profile, args.profile_stages)
+    with recording(recorder):
+        with stage("fingerprint"):
+            fingerprint = run_fingerprint(inputs, options)
+            up_to_date = not args.force and is_up_to_date(base, fingerprint)
+    if up_to_date:
+        logging.info("Outputs at %s are up to date; skipping (use --force to rerun)", base)
+        return False
+
+    outputs: List[Path] = []
+    status = "failed"
+    try:
+        clear_fingerprint(base)
+        with recording(recorder):
+            written = run()
+            outputs = [path for paths in written.values() for path in paths]
+            record_fingerprint(base, fingerprint, outputs)
+        status = "done"
+    finally:
+        if RUN_MANIFEST and not args.no_manifest:
+            recorder.write(
+                manifest_path(base),
+                status=status,
+                fingerprint=fingerprint,
+                inputs=[str(path) for path in inputs],
+                options=options,
+                workers=args.workers,
+                outputs=[str(path) for path in outputs],
+            )
+    return True
+
+
+def run_from_partial(
+    args: argparse.Namespace, kinds: List[str], partial: PartialAggregate
+) -> Dict[str, List[Path]]:
+    """Write the reports of merged partial aggregates, without any rows in memory."""
+    from src.pipeline.executor import run_kinds
+
+    with stage("to_cubes"):
+        cube, salaries = partial.to_cubes()
+    return run_kinds(
+        kinds,
+        None,
+        Path(args.output),
+        args.analysis,
+        workers=args.workers,
+        aggregate=args.aggregate,
+        percent=args.percent,
+        write_pickle=not args.no_pickle,
+        cube=cube,
+        salaries=salaries,
+        excel_backend=args.excel_backend,
+        report_format=args.report_format,
+    )
+
+
+def run_chunked(args: argparse.Namespace, kinds: List[str]) -> Dict[str, List[Path]]:
+    """Out-of-core run: merge per-chunk partial aggregates, then write from the cubes."""
+    from src.analysis.partials import partial_from_file
+
+    if args.salary_stats:
+        logging.warning("Extended salary statistics need the full rows; only means are written with --chunk-rows")
+    logging.info("Aggregating %s in chunks of %d rows...", args.input_file, args.chunk_rows)
+    with stage("aggregate_chunks"):
+        partial = partial_from_file(
+            DATA_DIR / args.input_file,
+            args.chunk_rows,
+            columns=REQUIRED_COLUMNS if args.project_columns else None,
+        )
+    return run_from_partial(args, kinds, partial)
+
+
+def run_loaded(args: argparse.Namespace, kinds: List[str]) -> Dict[str, List[Path]]:
+    """Load the input workbook and write the reports of every analysis kind."""
+    from src.pipeline.executor import run_kinds
+    from src.processing.data_loader import get_prepared_data
+
     logging.info("Loading and preparing data...")
-    df = get_prepared_data(input_dir=DATA_DIR, input_file_name=args.input_file)
-
-    outputs: dict[str, dict[str, pd.DataFrame]] = {}
-    kinds = [args.analysis] if args.analysis != "all" else ["global", "global_status", "branch", "branch_status", "filiere"]
-    for kind in kinds:
-        
-        logging.info("Running %s analysis", kind)
-        # Step 1: counts (raw pivots)
-        sheets_counts = run_analysis(kind, df)
-        outputs[kind] = sheets_counts
-
-    base_out = Path(args.output)
-    def save_all_steps(kind: str, base: Path, sheets_counts: dict[str, pd.DataFrame]) -> None:
-        # Base name per kind
-        base_for_kind = base if args.analysis != "all" else base.with_name(f"{base.name}_{kind}")
-
-        # 1) Counts (TCD only numbers)
-        out_counts_xlsx = base_for_kind.with_name(f"{base_for_kind.name}_counts").with_suffix(".xlsx")
-        save_to_excel_singlesheet(sheets_counts, out_counts_xlsx)
-        if not args.no_pickle:
-            save_to_pickle(sheets_counts, out_counts_xlsx.with_suffix(".pkl"))
-
-        # 2) Aggregated (optional)
-        if args.aggregate:
-            sheets_agg = aggregate_employment_regions(dict(sheets_counts))
-            sheets_agg = aggregate_company_size(sheets_agg)
-            out_agg_xlsx = base_for_kind.with_name(f"{base_for_kind.name}_aggregated").with_suffix(".xlsx")
-            save_to_excel_singlesheet(sheets_agg, out_agg_xlsx)
-            if not args.no_pickle:
-                save_to_pickle(sheets_agg, out_agg_xlsx.with_suffix(".pkl"))
+    df = get_prepared_data(
+        input_dir=DATA_DIR,
+        input_file_name=args.input_file,
+        use_cache=not args.no_cache,
+        columns=REQUIRED_COLUMNS if args.project_columns else None,
+        streaming=args.streaming,
+        categorical=args.categorical,
+    )
+
+    # Partitions and the count cube are built once and shared by every analysis
+    return run_kinds(
+        kinds,
+        df,
+        Path(args.output),
+        args.analysis,
+        workers=args.workers,
+        aggregate=args.aggregate,
+        percent=args.percent,
+        write_pickle=not args.no_pickle,
+        salary_stats=args.salary_stats,
+        excel_backend=args.excel_backend,
+        report_format=args.report_format,
+    )
+
+
+def clear_cache_command(argv: List[str]) -> None:
+    """'clear-cache' command: delete every cleaned frame cached in CACHE_DIR (or --cache-dir)."""
+    parser = argparse.ArgumentParser(
+        prog="main.py clear-cache",
+        description="Delete the cleaned-data cache (runs also prune it to CACHE_MAX_ENTRIES entries)",
+    )
+    parser.add_argument("--cache-dir", default=None, help="Cache directory (default: CACHE_DIR in settings)")
+    args = parser.parse_args(argv)
+    from src.processing.data_loader import clear_cache
+
+    clear_cache(Path(args.cache_dir) if args.cache_dir else None)
+
+
+def run_input(args: argparse.Namespace) -> bool:
+    """Write the reports of args.input_file unless they are up to date; returns whether it ran."""
+    kinds = kinds_for(args.analysis)
+    run = run_chunked if args.chunk_rows > 0 else run_loaded
+    return run_unless_up_to_date(args, [DATA_DIR / args.input_file], lambda: run(args, kinds))
+
+
+def shard(argv: List[str]) -> None:
+    """'shard' command: one partial aggregate per input workbook, e.g. one per school."""
+    from src.analysis.partials import build_partial, partial_from_file, save_partial
+    from src.processing.data_loader import load_clean_data
+
+    args = parse_shard_args(argv)
+    columns = REQUIRED_COLUMNS if args.project_columns else None
+    out_dir = Path(args.out_dir)
+    for name in args.inputs:
+        file_path = _input_path(name)
+        logging.info("Aggregating %s...", file_path)
+        if args.chunk_rows > 0:
+            partial = partial_from_file(file_path, args.chunk_rows, columns=columns)
         else:
-            sheets_agg = None
-
-        # 3) Percent (optional)
-        if args.percent:
-            source_for_percent = sheets_agg if sheets_agg is not None else sheets_counts
-            sheets_pct = convert_all_to_percentages(source_for_percent)
-            out_pct_xlsx = base_for_kind.with_name(f"{base_for_kind.name}_percent").with_suffix(".xlsx")
-            save_to_excel_singlesheet(sheets_pct, out_pct_xlsx)
-            if not args.no_pickle:
-                save_to_pickle(sheets_pct, out_pct_xlsx.with_suffix(".pkl"))
-
-        # Final consolidated (keep existing behavior for the main output path without suffix)
-        # Only produce if not running 'all' to avoid duplication
-        if args.analysis != "all":
-            out_main_xlsx = base.with_suffix(".xlsx")
-            main_sheets = sheets_counts
-            if args.aggregate:
-                main_sheets = sheets_agg or main_sheets
-            if args.percent:
-                main_sheets = convert_all_to_percentages(main_sheets)
-            save_to_excel_singlesheet(main_sheets, out_main_xlsx)
-            if not args.no_pickle:
-                save_to_pickle(main_sheets, out_main_xlsx.with_suffix(".pkl"))
-
-    if args.analysis == "all":
-        for kind, sheets_counts in outputs.items():
-            save_all_steps(kind, base_out, sheets_counts)
+            # Rows are kept unfiltered: the year interval depends on every shard
+            # and is applied at merge time
+            partial = build_partial(load_clean_data(file_path, use_cache=not args.no_cache, columns=columns))
+        save_partial(partial, out_dir / f"{file_path.stem}.npz")
+
+
+def merge(argv: List[str]) -> None:
+    """'merge' command: combine shards into the counts / aggregated / percent workbooks."""
+    args = parse_merge_args(argv)
+    paths = _shard_paths(args.shards)
+    if not paths:
+        raise SystemExit("No shard files found")
+
+    def run() -> Dict[str, List[Path]]:
+        from src.analysis.partials import load_partial, merge_partials
+
+        logging.info("Merging %d shards...", len(paths))
+        with stage("merge_partials", shards=len(paths)):
+            partial = merge_partials(load_partial(path) for path in paths)
+        return run_from_partial(args, kinds_for(args.analysis), partial)
+
+    run_unless_up_to_date(args, paths, run)
+
+
+def _batch_input(args: argparse.Namespace) -> Dict[str, Any]:
+    """Batch task: the reports of one input; a failure is reported, not raised, so the batch goes on."""
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"input": args.input_file, "output": args.output}
+    try:
+        result["status"] = "done" if run_input(args) else "up to date"
+    except Exception as exc:
+        logging.exception("Batch input %s failed", args.input_file)
+        result.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _batch_tasks(args: argparse.Namespace, paths: List[Path]) -> List[argparse.Namespace]:
+    """The run arguments of every input: those of args, with its output at <out-dir>/<name>/<name>."""
+    out_dir = Path(args.out_dir)
+    options = {key: value for key, value in vars(args).items() if key not in BATCH_ONLY_OPTIONS}
+    tasks = []
+    for path in paths:
+        task = argparse.Namespace(**options, input_file=str(path), output=str(out_dir / path.stem / path.stem))
+        if args.profile:
+            # One directory per input, so profile file names cannot collide
+            task.profile = str(Path(args.profile) / path.stem)
+        tasks.append(task)
+    return tasks
+
+
+def _run_batch(tasks: List[argparse.Namespace], jobs: int) -> List[Dict[str, Any]]:
+    """Run the tasks, jobs at a time in worker processes; returns their outcomes in task order."""
+    jobs = max(1, min(jobs, len(tasks)))
+    logging.info("Batch of %d inputs, %d at a time", len(tasks), jobs)
+    results: List[Dict[str, Any]] = []
+
+    def report(result: Dict[str, Any]) -> None:
+        results.append(result)
+        logging.info(
+            "[%d/%d] %s: %s (%.1fs)", len(results), len(tasks), Path(result["input"]).name, result["status"], result["seconds"]
+        )
+
+    if jobs == 1:
+        for task in tasks:
+            report(_batch_input(task))
     else:
-        save_all_steps(kinds[0], base_out, outputs[kinds[0]])
+        import multiprocessing as mp
+        from concurrent.futures import ProcessPoolExecutor, as_completed
 
+        # Imported once here, so forked workers inherit pandas and the analyses
+        import src.pipeline.executor  # noqa: F401
+        import src.processing.data_loader  # noqa: F401
 
-if __name__ == "__main__":
-    main()
+        context = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=setup_logging) as pool:
+            for future in as_completed([pool.submit(_batch_input, task) for task in tasks]):
+                report(future.result())
+
+    order = {task.input_file: i for i, task in enumerate(tasks)}
+    results.sort(key=lambda result: order[result["input"]])
+    for result in results:
+        if result["status"] == "failed":
+            logging.error("Failed: %s: %s", result["input"], result["error"])
+    return results
 
 
+def batch(argv: List[str]) -> None:
+    """'batch' command: the reports of every input, written to <out-dir>/<input name>/<input name>_*.
+
+    Inputs run in a pool of --jobs processes, each exactly as 'main.py
+    --input-file <input> --output <out-dir>/<name>/<name>' would (same
+    fingerprint, so unchanged inputs are skipped). A failed input does not stop
+    the others; <out-dir>/batch_summary.json lists every outcome and the
+    command exits with an error if any input failed.
+    """
+    args = parse_batch_args(argv)
+    paths = _batch_paths(args.inputs)
+    if not paths:
+        raise SystemExit("No input workbooks found")
+    clashes = _stem_clashes(paths)
+    if clashes:
+        raise SystemExit(f"Inputs would share an output directory: {', '.join(map(str, clashes))}")
+
+    results = _run_batch(_batch_tasks(args, paths), args.jobs)
+    failed = [result for result in results if result["status"] == "failed"]
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = out_dir / BATCH_SUMMARY_NAME
+    with open(summary_path, "w", encoding="utf-8") as handle:
+        json.dump({"inputs": len(results), "failed": len(failed), "results": results}, handle, indent=2)
+    logging.info(
+        "Batch finished: %d done, %d up to date, %d failed (summary: %s)",
+        sum(result["status"] == "done" for result in results),
+        sum(result["status"] == "up to date" for result in results),
+        len(failed),
+        summary_path,
+    )
+    if failed:
+        raise SystemExit(f"{len(failed)} of {len(results)} inputs failed")
+
+
+def _scan(directory: Path) -> Dict[Path, Tuple[int, int]]:
+    """Size and modification time of every workbook in directory."""
+    signatures = {}
+    for path in _batch_paths([str(directory)]):
+        try:
+            info = path.stat()
+        except FileNotFoundError:  # removed since the listing
+            continue
+        signatures[path] = (info.st_size, info.st_mtime_ns)
+    return signatures
+
+
+def watch(argv: List[str]) -> None:
+    """'watch' command: run the batch of a directory's new and changed workbooks as they land.
+
+    The directory is polled every --interval seconds (stdlib only, and it
+    works on network shares where inotify does not). A workbook is processed
+    once its size and modification time have not changed for --settle
+    seconds, so files still being copied are left alone; it is processed
+    again only when it changes. Each one runs as in 'main.py batch', so a
+    workbook whose content did not change (e.g. copied again) is skipped by
+    its fingerprint and the cleaned-data cache spares re-reading known content.
+    A failed workbook is retried when it changes; Ctrl+C stops watching.
+    """
+    args = parse_watch_args(argv)
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        raise SystemExit(f"Not a directory: {directory}")
+    logging.info("Watching %s (every %gs, settle %gs)", directory, args.interval, args.settle)
+
+    # Signature seen at the last scan and when it last changed, and signature processed
+    seen: Dict[Path, Tuple[int, int]] = {}
+    changed_at: Dict[Path, float] = {}
+    processed: Dict[Path, Tuple[int, int]] = {}
+    try:
+        while True:
+            now = time.monotonic()
+            current = _scan(directory)
+            for path, signature in current.items():
+                if seen.get(path) != signature:
+                    changed_at[path] = now
+            for path in set(seen) - set(current):
+                logging.info("Removed: %s (its reports are kept)", path.name)
+                changed_at.pop(path, None)
+                processed.pop(path, None)
+            seen = current
+
+            pending = [path for path, signature in current.items() if processed.get(path) != signature]
+            ready = [path for path in pending if now - changed_at[path] >= args.settle]
+            clashes = set(_stem_clashes(list(current)))
+            for path in sorted(clashes.intersection(ready)):
+                # Handled until it changes again: reported once, and --once can finish
+                logging.error("Skipped: %s shares its output directory with another workbook", path)
+                processed[path] = current[path]
+            ready = [path for path in ready if path not in clashes]
+            if ready:
+                _run_batch(_batch_tasks(args, ready), args.jobs)
+                for path in ready:
+                    processed[path] = current[path]
+            elif args.once and not pending:
+                return
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        logging.info("Stopped watching %s", directory)
+
+
+COMMANDS = {"shard": shard, "merge": merge, "batch": batch, "watch": watch, "clear-cache": clear_cache_command}
+
+
+def main(argv: List[str] | None = None) -> None:
+    setup_logging()
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+        return
+
+    run_input(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
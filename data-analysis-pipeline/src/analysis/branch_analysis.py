@@ -1,54 +1,53 @@
+from __future__ import annotations
+
 import logging
 from collections import defaultdict
 from typing import Dict, List
 
 import pandas as pd
 
-from config.settings import YEAR_COL, GENDER_COL, BRANCH_COL
+from config.settings import GENDER_COL, BRANCH_COL
 from src.utils.sheet_utils import safe_sheet_name
-from src.analysis.remuneration import build_remuneration_sheets
+from src.analysis.cube import CountCube, build_count_cube
+from src.analysis.partitions import build_partitions
+from src.analysis.remuneration import SalaryCube, remuneration_sheets
 
 
 logger = logging.getLogger(__name__)
 
 
-def _pivot(df: pd.DataFrame, index_col: str) -> pd.DataFrame:
-    return pd.pivot_table(
-        df,
-        index=index_col,
-        columns=[YEAR_COL, GENDER_COL],
-        aggfunc="size",
-        fill_value=0,
-    )
-
-
-def run_branch_analysis(df: pd.DataFrame, summary_cols: List[str]) -> Dict[str, pd.DataFrame]:
+def run_branch_analysis(
+    df: pd.DataFrame | None,
+    summary_cols: List[str],
+    partitions: Dict[str, pd.DataFrame] | None = None,
+    cube: CountCube | None = None,
+    salary_stats: bool = False,
+    salaries: SalaryCube | None = None,
+) -> Dict[str, pd.DataFrame]:
     sheets: Dict[str, pd.DataFrame] = {}
     per_column_tables: Dict[str, Dict[str, pd.DataFrame]] = defaultdict(dict)
     per_remuneration_tables: Dict[str, Dict[str, pd.DataFrame]] = defaultdict(dict)
-    if BRANCH_COL not in df.columns:
+    if cube is None:
+        cube = build_count_cube(df, summary_cols)
+    if BRANCH_COL not in cube.source_columns:
         logger.warning("Branch column %s not found; skipping branch analysis", BRANCH_COL)
         return sheets
 
-    for branch in sorted(pd.Series(df[BRANCH_COL].dropna().unique()).astype(str)):
-        df_branch = df[df[BRANCH_COL].astype(str) == branch]
+    # Callers running several branch-level analyses pass one shared partition;
+    # branch rows are not needed when remuneration comes from salary aggregates
+    if salaries is not None:
+        partitions = dict.fromkeys(cube.branches)
+    elif partitions is None:
+        partitions = build_partitions(df, BRANCH_COL)
+    for branch, df_branch in partitions.items():
         for col in summary_cols:
-            if col not in df_branch.columns:
+            if col not in cube.counts:
                 logger.warning("Skipping missing column in branch analysis: %s", col)
                 continue
-            pivot = _pivot(df_branch, col)
-            # Add per-year total across genders to match global analysis behavior
-            try:
-                years = pivot.columns.get_level_values(0).unique()
-                for y in years:
-                    pivot[(y, "Total")] = pivot.loc[:, y].sum(axis=1)
-                pivot = pivot.sort_index(axis=1, level=[0, 1])
-            except Exception:
-                logger.debug("Could not add per-year totals for branch %s, col %s", branch, col, exc_info=True)
-
-            per_column_tables[str(col)][branch] = pivot
+            # Per-year totals across genders match global analysis behavior
+            per_column_tables[str(col)][branch] = cube.table(col, GENDER_COL, branch=branch)
         # Add remuneration sheets for this branch
-        branch_rem = build_remuneration_sheets(df_branch, pivot_col=GENDER_COL)
+        branch_rem = remuneration_sheets(df_branch, GENDER_COL, salary_stats, salaries, branch=branch)
         for name, rem_df in branch_rem.items():
             per_remuneration_tables[str(name)][branch] = rem_df
 
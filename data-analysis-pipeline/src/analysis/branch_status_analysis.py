@@ -1,28 +1,29 @@
+from __future__ import annotations
+
 import logging
 from collections import defaultdict
 from typing import Dict, List
 
 import pandas as pd
 
-from config.settings import YEAR_COL, GENDER_COL, BRANCH_COL, STATUS_COL, STATUS_INITIAL_VAL
+from config.settings import GENDER_COL, BRANCH_COL, STATUS_COL, STATUS_INITIAL_VAL
 from src.utils.sheet_utils import safe_sheet_name
-from src.analysis.remuneration import build_remuneration_sheets
+from src.analysis.cube import STATUS_LABELS, CountCube, build_count_cube
+from src.analysis.partitions import build_partitions
+from src.analysis.remuneration import SalaryCube, remuneration_sheets
 
 
 logger = logging.getLogger(__name__)
 
 
-def _pivot(df: pd.DataFrame, index_col: str) -> pd.DataFrame:
-    return pd.pivot_table(
-        df,
-        index=index_col,
-        columns=[YEAR_COL, GENDER_COL],
-        aggfunc="size",
-        fill_value=0,
-    )
-
-
-def run_branch_status_analysis(df: pd.DataFrame, summary_cols: List[str]) -> Dict[str, pd.DataFrame]:
+def run_branch_status_analysis(
+    df: pd.DataFrame | None,
+    summary_cols: List[str],
+    partitions: Dict[str, pd.DataFrame] | None = None,
+    cube: CountCube | None = None,
+    salary_stats: bool = False,
+    salaries: SalaryCube | None = None,
+) -> Dict[str, pd.DataFrame]:
     """
     Create pivots by Branch, then by Status (Initial vs Autre),
     then by year and gender.
@@ -31,11 +32,13 @@ def run_branch_status_analysis(df: pd.DataFrame, summary_cols: List[str]) -> Dic
     per_column_tables: Dict[str, Dict[str, pd.DataFrame]] = defaultdict(dict)
     per_remuneration_tables: Dict[str, Dict[str, pd.DataFrame]] = defaultdict(dict)
 
-    if BRANCH_COL not in df.columns:
+    if cube is None:
+        cube = build_count_cube(df, summary_cols)
+    if BRANCH_COL not in cube.source_columns:
         logger.warning("Branch column %s not found; skipping branch status analysis", BRANCH_COL)
         return sheets
     
-    if STATUS_COL not in df.columns:
+    if STATUS_COL not in cube.source_columns:
         logger.warning("Status column %s not found; skipping branch status analysis", STATUS_COL)
         return sheets
 
@@ -52,35 +55,32 @@ def run_branch_status_analysis(df: pd.DataFrame, summary_cols: List[str]) -> Dic
         table_copy.columns = pd.MultiIndex.from_tuples(tuples, names=new_names)
         return table_copy
 
-    for branch in sorted(pd.Series(df[BRANCH_COL].dropna().unique()).astype(str)):
-        df_branch = df[df[BRANCH_COL].astype(str) == branch]
+    # Callers running several branch-level analyses pass one shared partition;
+    # branch rows are not needed when remuneration comes from salary aggregates
+    if salaries is not None:
+        partitions = dict.fromkeys(cube.branches)
+    elif partitions is None:
+        partitions = build_partitions(df, BRANCH_COL)
+    for branch, df_branch in partitions.items():
         
         # Split by status within this branch
-        mask_initial = df_branch[STATUS_COL] == STATUS_INITIAL_VAL
-        groups = {
-            "Initial": df_branch[mask_initial],
-            "Autre": df_branch[~mask_initial]
-        }
+        groups: Dict[str, pd.DataFrame | None] = dict.fromkeys(STATUS_LABELS)
+        if df_branch is not None:
+            mask_initial = df_branch[STATUS_COL] == STATUS_INITIAL_VAL
+            groups = {
+                "Initial": df_branch[mask_initial],
+                "Autre": df_branch[~mask_initial]
+            }
         
         # Process Summary Columns
         for col in summary_cols:
             status_frames = []
             # Use specific order if desired, or just iterate groups
             for status_label in ["Initial", "Autre"]:
-                df_status = groups[status_label]
-                if df_status.empty or col not in df_status.columns:
+                if not cube.has_rows(branch, status_label) or col not in cube.counts:
                     continue
-                
-                pivot = _pivot(df_status, col)
-                # Add per-year total
-                try:
-                    years = pivot.columns.get_level_values(0).unique()
-                    for y in years:
-                        pivot[(y, "Total")] = pivot.loc[:, y].sum(axis=1)
-                    pivot = pivot.sort_index(axis=1, level=[0, 1])
-                except Exception:
-                    pass
-                
+                # Pivot with per-year totals
+                pivot = cube.table(col, GENDER_COL, branch=branch, status=status_label)
                 status_frames.append(_with_status_level(pivot, status_label))
             
             if status_frames:
@@ -91,10 +91,11 @@ def run_branch_status_analysis(df: pd.DataFrame, summary_cols: List[str]) -> Dic
         # Process Remuneration
         status_rem_frames: Dict[str, List[pd.DataFrame]] = defaultdict(list)
         for status_label in ["Initial", "Autre"]:
-            df_status = groups[status_label]
-            if df_status.empty:
+            if not cube.has_rows(branch, status_label):
                 continue
-            branch_rem = build_remuneration_sheets(df_status, pivot_col=GENDER_COL)
+            branch_rem = remuneration_sheets(
+                groups[status_label], GENDER_COL, salary_stats, salaries, branch=branch, status=status_label
+            )
             for name, rem_df in branch_rem.items():
                 status_rem_frames[str(name)].append(_with_status_level(rem_df, status_label))
         
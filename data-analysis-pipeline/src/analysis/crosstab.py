@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+def factorize_column(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Return integer codes (-1 for missing) and the sorted labels they point to.
+
+    Categorical columns reuse their codes; other columns are factorized with the
+    same label ordering that pivot_table uses. Labels of object columns get the
+    dtype pivot_table infers for its axes (e.g. int64 for years stored as
+    Python ints next to missing values).
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(dtype=np.intp), values.cat.categories
+    codes, labels = pd.factorize(values, sort=True)
+    if labels.dtype == object:
+        labels = labels.infer_objects()
+    return codes, labels
+
+
+def counts_to_table(
+    counts: np.ndarray,
+    row_labels: pd.Index,
+    year_labels: pd.Index,
+    sub_labels: pd.Index,
+    index_name: str,
+    column_names: Tuple[str, str],
+    add_totals: bool = True,
+) -> pd.DataFrame:
+    """Turn a (modality, year, sub-column) count array into a pivot-shaped table.
+
+    Only observed rows and (year, sub-column) pairs are kept, like
+    pd.pivot_table(..., aggfunc="size", fill_value=0). With add_totals, a
+    (year, "Total") column summing the sub-columns is added for every observed
+    year and columns are sorted by (year, sub-column).
+    """
+    n_rows, n_years, n_subs = counts.shape
+    flat = counts.reshape(n_rows, n_years * n_subs)
+    row_mask = flat.any(axis=1)
+    col_mask = flat.any(axis=0)
+    if not row_mask.any():
+        return pd.DataFrame(
+            index=row_labels[:0].rename(index_name),
+            columns=pd.MultiIndex.from_arrays([year_labels[:0], sub_labels[:0]], names=list(column_names)),
+        )
+
+    rows = np.flatnonzero(row_mask)
+    cols = np.flatnonzero(col_mask)
+    values = flat[np.ix_(rows, cols)]
+    year_codes = cols // n_subs
+    columns = pd.MultiIndex.from_arrays(
+        [year_labels.take(year_codes), sub_labels.take(cols % n_subs)],
+        names=list(column_names),
+    )
+    table = pd.DataFrame(values, index=row_labels.take(rows).rename(index_name), columns=columns)
+    if not add_totals:
+        return table
+
+    years = np.unique(year_codes)
+    totals = counts[rows][:, years, :].sum(axis=2)
+    total_columns = pd.MultiIndex.from_arrays(
+        [year_labels.take(years), ["Total"] * len(years)],
+        names=list(column_names),
+    )
+    table = pd.concat(
+        [table, pd.DataFrame(totals, index=table.index, columns=total_columns)],
+        axis=1,
+    )
+    try:
+        table = table.sort_index(axis=1, level=[0, 1])
+    except TypeError:
+        logger.debug("Could not sort per-year totals for %s", index_name, exc_info=True)
+    return table
+
+
+def crosstab_counts(
+    df: pd.DataFrame,
+    summary_cols: Iterable[str],
+    column_cols: Tuple[str, str],
+    add_totals: bool = True,
+) -> Dict[str, pd.DataFrame]:
+    """Count every summary column by (year, sub-column) in a single pass each.
+
+    Equivalent to one pd.pivot_table(index=col, columns=column_cols,
+    aggfunc="size", fill_value=0) per summary column, plus per-year totals,
+    but the column keys are factorized once and each table is a single
+    np.bincount over combined integer codes. Missing summary columns are skipped.
+    """
+    year_col, sub_col = column_cols
+    year_codes, year_labels = factorize_column(df[year_col])
+    sub_codes, sub_labels = factorize_column(df[sub_col])
+    n_years, n_subs = len(year_labels), len(sub_labels)
+    key_valid = (year_codes >= 0) & (sub_codes >= 0)
+    key_codes = year_codes * n_subs + sub_codes
+
+    tables: Dict[str, pd.DataFrame] = {}
+    for col in summary_cols:
+        if col not in df.columns:
+            continue
+        row_codes, row_labels = factorize_column(df[col])
+        valid = key_valid & (row_codes >= 0)
+        n_rows = len(row_labels)
+        combined = row_codes[valid] * (n_years * n_subs) + key_codes[valid]
+        counts = np.bincount(combined, minlength=n_rows * n_years * n_subs).astype(np.int64)
+        tables[col] = counts_to_table(
+            counts.reshape(n_rows, n_years, n_subs),
+            row_labels,
+            year_labels,
+            sub_labels,
+            index_name=col,
+            column_names=(year_col, sub_col),
+            add_totals=add_totals,
+        )
+    return tables
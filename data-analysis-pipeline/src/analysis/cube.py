@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import (
+    YEAR_COL,
+    GENDER_COL,
+    BRANCH_COL,
+    FILIER_COL,
+    STATUS_COL,
+    STATUS_INITIAL_VAL,
+)
+from src.analysis.crosstab import counts_to_table, factorize_column
+
+
+logger = logging.getLogger(__name__)
+
+# Status split used by the *_status analyses; anything not initial is "Autre"
+STATUS_LABELS: Tuple[str, str] = ("Initial", "Autre")
+# Dimensions an explorer table can break its counts down by
+EXPLORE_DIMENSIONS: Tuple[str, ...] = (YEAR_COL, GENDER_COL, STATUS_COL, BRANCH_COL, FILIER_COL)
+# Column of an explorer table holding every selected row
+EXPLORE_TOTAL: str = "Total"
+
+
+def _dimension(df: pd.DataFrame, col: str) -> Tuple[np.ndarray, pd.Index]:
+    """Codes for one cube axis, with missing values mapped to a trailing slot."""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=np.intp), pd.Index([], dtype=object)
+    codes, labels = factorize_column(df[col])
+    codes = np.where(codes < 0, len(labels), codes)
+    return codes, labels
+
+
+def _label_mask(labels: pd.Index, selected: Sequence | None) -> np.ndarray:
+    """Mask over labels plus the missing slot; None keeps everything, missing values included."""
+    if selected is None:
+        return np.ones(len(labels) + 1, dtype=bool)
+    wanted = {str(value) for value in selected}
+    return np.append(np.array([str(label) in wanted for label in labels], dtype=bool), False)
+
+
+class CountCube:
+    """Row counts over (branch, filiere, status, year, gender, modality).
+
+    Every summary column has one dense array of shape
+    (units, status, years + 1, genders + 1, modalities + 1), where a unit is an
+    observed (branch, filiere) pair and the trailing slot of each axis holds
+    rows whose value is missing. Branch and filiere are stored as units
+    because filieres are nested in branches, which keeps the cube small.
+    All analyses are slices and roll-ups of these arrays.
+    """
+
+    def __init__(
+        self,
+        branch_labels: pd.Index,
+        filiere_labels: pd.Index,
+        year_labels: pd.Index,
+        gender_labels: pd.Index,
+        unit_branch: np.ndarray,
+        unit_filiere: np.ndarray,
+        row_counts: np.ndarray,
+        counts: Dict[str, np.ndarray],
+        modalities: Dict[str, pd.Index],
+        source_columns: Iterable[str] = (),
+    ) -> None:
+        self.branch_labels = branch_labels
+        self.filiere_labels = filiere_labels
+        self.year_labels = year_labels
+        self.gender_labels = gender_labels
+        self.unit_branch = unit_branch
+        self.unit_filiere = unit_filiere
+        self.row_counts = row_counts
+        self.counts = counts
+        self.modalities = modalities
+        # Columns of the counted rows, for the analyses' column checks
+        self.source_columns = frozenset(source_columns)
+
+        # Branch keys as the branch analyses name them: str labels, sorted
+        branch_units: Dict[str, List[int]] = {}
+        for unit, code in enumerate(unit_branch):
+            if code < len(branch_labels):
+                branch_units.setdefault(str(branch_labels[code]), []).append(unit)
+        self._branch_units = {key: np.asarray(branch_units[key]) for key in sorted(branch_units)}
+
+    @property
+    def branches(self) -> List[str]:
+        return list(self._branch_units)
+
+    def _units(self, branch: str | None) -> np.ndarray | slice:
+        if branch is None:
+            return slice(None)
+        return self._branch_units[branch]
+
+    def has_rows(self, branch: str | None = None, status: str | None = None) -> bool:
+        """Whether any prepared row falls in this branch / status cell."""
+        rows = self.row_counts[self._units(branch)]
+        if status is not None:
+            rows = rows[:, STATUS_LABELS.index(status)]
+        return bool(rows.sum() > 0)
+
+    def filiere_onehot(self, branch: str | None = None) -> np.ndarray:
+        """(units, filieres + 1) indicator of each unit's filiere, for filiere roll-ups."""
+        unit_filiere = self.unit_filiere[self._units(branch)]
+        onehot = np.zeros((len(unit_filiere), len(self.filiere_labels) + 1), dtype=np.int64)
+        onehot[np.arange(len(unit_filiere)), unit_filiere] = 1
+        return onehot
+
+    def selection(
+        self,
+        branches: Sequence | None = None,
+        filieres: Sequence | None = None,
+        statuses: Sequence | None = None,
+        years: Sequence | None = None,
+        genders: Sequence | None = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Boolean masks over the (unit, status, year + 1, gender + 1) axes.
+
+        Values are matched on their str form; None keeps a whole axis.
+        """
+        units = (
+            _label_mask(self.branch_labels, branches)[self.unit_branch]
+            & _label_mask(self.filiere_labels, filieres)[self.unit_filiere]
+        )
+        status_mask = _label_mask(pd.Index(STATUS_LABELS), statuses)[:-1]
+        return units, status_mask, _label_mask(self.year_labels, years), _label_mask(self.gender_labels, genders)
+
+    def explore(
+        self,
+        col: str,
+        by: str | None = None,
+        branches: Sequence | None = None,
+        filieres: Sequence | None = None,
+        statuses: Sequence | None = None,
+        years: Sequence | None = None,
+        genders: Sequence | None = None,
+    ) -> pd.DataFrame:
+        """Counts of col's modalities over a selection, optionally broken down by one dimension.
+
+        Only sums the cube, so any selection is answered without the rows.
+        Columns are the observed values of by (one of EXPLORE_DIMENSIONS) and
+        EXPLORE_TOTAL, which also counts rows whose by value is missing.
+        Rows with a missing col value are left out, as in the report tables.
+        """
+        units, statuses_mask, years_mask, genders_mask = self.selection(branches, filieres, statuses, years, genders)
+        unit_idx = np.flatnonzero(units)
+        counts = self.counts[col][np.ix_(unit_idx, *map(np.flatnonzero, (statuses_mask, years_mask, genders_mask)))]
+        # counts: (units, status, years, genders, modalities + 1)
+
+        # grouped: (by values + missing slot, modalities + 1)
+        if by is None:
+            labels = pd.Index([])
+            grouped = np.zeros((1, counts.shape[-1]), dtype=np.int64)
+        elif by in (YEAR_COL, GENDER_COL, STATUS_COL):
+            labels, mask, axes = {
+                YEAR_COL: (self.year_labels, years_mask, (0, 1, 3)),
+                GENDER_COL: (self.gender_labels, genders_mask, (0, 1, 2)),
+                STATUS_COL: (pd.Index(STATUS_LABELS), np.append(statuses_mask, False), (0, 2, 3)),
+            }[by]
+            grouped = np.zeros((len(labels) + 1, counts.shape[-1]), dtype=np.int64)
+            grouped[mask] = counts.sum(axis=axes)
+        elif by in (BRANCH_COL, FILIER_COL):
+            unit_codes, labels = (
+                (self.unit_branch, self.branch_labels) if by == BRANCH_COL else (self.unit_filiere, self.filiere_labels)
+            )
+            grouped = np.zeros((len(labels) + 1, counts.shape[-1]), dtype=np.int64)
+            np.add.at(grouped, unit_codes[unit_idx], counts.sum(axis=(1, 2, 3)))
+        else:
+            raise ValueError(f"Unsupported explorer dimension: {by}")
+
+        total = counts.reshape(-1, counts.shape[-1]).sum(axis=0)[:-1]
+        # Only observed by values; the missing slot counts in the total alone
+        keep = np.flatnonzero(grouped[:-1, :-1].any(axis=1))
+        values = np.column_stack([grouped[keep, :-1].T, total])
+        rows = np.flatnonzero(total)
+        return pd.DataFrame(
+            values[rows],
+            index=self.modalities[col].take(rows).rename(col),
+            columns=pd.Index([*labels.take(keep), EXPLORE_TOTAL], name=by),
+        )
+
+    def table(
+        self,
+        col: str,
+        sub_col: str = GENDER_COL,
+        branch: str | None = None,
+        status: str | None = None,
+        add_totals: bool = True,
+    ) -> pd.DataFrame:
+        """Pivot of col by (year, sub_col) for one branch and/or status, or overall.
+
+        Matches pd.pivot_table(index=col, columns=[YEAR_COL, sub_col],
+        aggfunc="size", fill_value=0) on the same row subset, with optional
+        per-year totals. sub_col is GENDER_COL or FILIER_COL.
+        """
+        counts = self.counts[col][self._units(branch)]
+        if status is not None:
+            counts = counts[:, STATUS_LABELS.index(status)]
+        else:
+            counts = counts.sum(axis=1)
+        # counts: (units, years + 1, genders + 1, modalities + 1)
+
+        if sub_col == GENDER_COL:
+            reduced = counts.sum(axis=0)[:-1, :-1, :-1].transpose(2, 0, 1)
+            sub_labels = self.gender_labels
+        elif sub_col == FILIER_COL:
+            # Missing genders still count in the filiere view
+            per_unit = counts.sum(axis=2)
+            onehot = self.filiere_onehot(branch)
+            reduced = np.tensordot(onehot.T, per_unit, axes=1)[:-1, :-1, :-1].transpose(2, 1, 0)
+            sub_labels = self.filiere_labels
+        else:
+            raise ValueError(f"Unsupported cube sub-column: {sub_col}")
+
+        return counts_to_table(
+            np.ascontiguousarray(reduced),
+            self.modalities[col],
+            self.year_labels,
+            sub_labels,
+            index_name=col,
+            column_names=(YEAR_COL, sub_col),
+            add_totals=add_totals,
+        )
+
+
+def build_count_cube(df: pd.DataFrame, summary_cols: Iterable[str]) -> CountCube:
+    """Count the prepared frame once per summary column into a CountCube."""
+    branch_codes, branch_labels = _dimension(df, BRANCH_COL)
+    filiere_codes, filiere_labels = _dimension(df, FILIER_COL)
+    year_codes, year_labels = _dimension(df, YEAR_COL)
+    gender_codes, gender_labels = _dimension(df, GENDER_COL)
+
+    unit_keys = branch_codes * (len(filiere_labels) + 1) + filiere_codes
+    units, unit_codes = np.unique(unit_keys, return_inverse=True)
+    unit_codes = unit_codes.reshape(-1)
+    unit_branch = units // (len(filiere_labels) + 1)
+    unit_filiere = units % (len(filiere_labels) + 1)
+
+    if STATUS_COL in df.columns:
+        status_codes = np.where((df[STATUS_COL] == STATUS_INITIAL_VAL).to_numpy(dtype=bool), 0, 1)
+    else:
+        status_codes = np.ones(len(df), dtype=np.intp)
+
+    n_units = len(units)
+    cell = unit_codes * len(STATUS_LABELS) + status_codes
+    row_counts = np.bincount(cell, minlength=n_units * len(STATUS_LABELS)).reshape(n_units, len(STATUS_LABELS))
+
+    n_years, n_genders = len(year_labels) + 1, len(gender_labels) + 1
+    key = (cell * n_years + year_codes) * n_genders + gender_codes
+
+    counts: Dict[str, np.ndarray] = {}
+    modalities: Dict[str, pd.Index] = {}
+    for col in summary_cols:
+        if col not in df.columns:
+            continue
+        mod_codes, mod_labels = _dimension(df, col)
+        n_mods = len(mod_labels) + 1
+        flat = np.bincount(key * n_mods + mod_codes, minlength=n_units * len(STATUS_LABELS) * n_years * n_genders * n_mods)
+        counts[col] = flat.astype(np.int64).reshape(n_units, len(STATUS_LABELS), n_years, n_genders, n_mods)
+        modalities[col] = mod_labels
+
+    logger.debug("Built count cube: %d units, %d columns", n_units, len(counts))
+    return CountCube(
+        branch_labels,
+        filiere_labels,
+        year_labels,
+        gender_labels,
+        unit_branch,
+        unit_filiere,
+        row_counts,
+        counts,
+        modalities,
+        source_columns=df.columns,
+    )
@@ -1,28 +1,27 @@
+from __future__ import annotations
+
 import logging
 from collections import defaultdict
 from typing import Dict, List
 
 import pandas as pd
 
-from config.settings import YEAR_COL, GENDER_COL, STATUS_COL, STATUS_INITIAL_VAL
+from config.settings import GENDER_COL, STATUS_COL, STATUS_INITIAL_VAL
 from src.utils.sheet_utils import safe_sheet_name
-from src.analysis.remuneration import build_remuneration_sheets
+from src.analysis.cube import STATUS_LABELS, CountCube, build_count_cube
+from src.analysis.remuneration import SalaryCube, remuneration_sheets
 
 
 logger = logging.getLogger(__name__)
 
 
-def _pivot(df: pd.DataFrame, index_col: str) -> pd.DataFrame:
-    return pd.pivot_table(
-        df,
-        index=index_col,
-        columns=[YEAR_COL, GENDER_COL],
-        aggfunc="size",
-        fill_value=0,
-    )
-
-
-def run_global_status_analysis(df: pd.DataFrame, summary_cols: List[str]) -> Dict[str, pd.DataFrame]:
+def run_global_status_analysis(
+    df: pd.DataFrame | None,
+    summary_cols: List[str],
+    cube: CountCube | None = None,
+    salary_stats: bool = False,
+    salaries: SalaryCube | None = None,
+) -> Dict[str, pd.DataFrame]:
     """
     Create pivots for the full dataset, split by Status (Initial vs Autre),
     then by year and gender.
@@ -31,44 +30,38 @@ def run_global_status_analysis(df: pd.DataFrame, summary_cols: List[str]) -> Dic
     per_column_tables: Dict[str, Dict[str, pd.DataFrame]] = defaultdict(dict)
     per_remuneration_tables: Dict[str, Dict[str, pd.DataFrame]] = defaultdict(dict)
 
-    if STATUS_COL not in df.columns:
+    if cube is None:
+        cube = build_count_cube(df, summary_cols)
+
+    if STATUS_COL not in cube.source_columns:
         logger.warning("Status column %s not found; skipping global status analysis", STATUS_COL)
         return sheets
 
-    # Create a mask for initial formation
-    # We treat NaN as 'Autre' or filter them? Usually explicit comparison is safer.
-    mask_initial = df[STATUS_COL] == STATUS_INITIAL_VAL
-    
-    # Define groups
-    groups = {
-        "Initial": df[mask_initial],
-        "Autre": df[~mask_initial]
-    }
+    # Row subsets are only needed when remuneration comes from the rows
+    groups: Dict[str, pd.DataFrame | None] = dict.fromkeys(STATUS_LABELS)
+    if salaries is None:
+        # Create a mask for initial formation
+        # We treat NaN as 'Autre' or filter them? Usually explicit comparison is safer.
+        mask_initial = df[STATUS_COL] == STATUS_INITIAL_VAL
+        groups = {
+            "Initial": df[mask_initial],
+            "Autre": df[~mask_initial]
+        }
 
     for status_label, df_status in groups.items():
         # Even if empty, we might want to show it? But pivot will fail or be empty.
-        if df_status.empty:
+        if not cube.has_rows(status=status_label):
             continue
             
         for col in summary_cols:
-            if col not in df_status.columns:
+            if col not in cube.counts:
                 logger.warning("Skipping missing column in global status analysis: %s", col)
                 continue
-            
-            pivot = _pivot(df_status, col)
-            # Add per-year totals
-            try:
-                years = pivot.columns.get_level_values(0).unique()
-                for y in years:
-                    pivot[(y, "Total")] = pivot.loc[:, y].sum(axis=1)
-                pivot = pivot.sort_index(axis=1, level=[0, 1])
-            except Exception:
-                logger.debug("Could not add per-year totals for status %s, col %s", status_label, col, exc_info=True)
-            
-            per_column_tables[str(col)][status_label] = pivot
+            # Pivot with per-year totals
+            per_column_tables[str(col)][status_label] = cube.table(col, GENDER_COL, status=status_label)
 
         # Remuneration
-        status_rem = build_remuneration_sheets(df_status, pivot_col=GENDER_COL)
+        status_rem = remuneration_sheets(df_status, GENDER_COL, salary_stats, salaries, status=status_label)
         for name, rem_df in status_rem.items():
             per_remuneration_tables[str(name)][status_label] = rem_df
 
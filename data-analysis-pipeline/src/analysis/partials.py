@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from functools import reduce
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import (
+    YEAR_COL,
+    GENDER_COL,
+    BRANCH_COL,
+    FILIER_COL,
+    STATUS_COL,
+    STATUS_INITIAL_VAL,
+    SALARY_AP_COL,
+    SALARY_HP_COL,
+    REGION_FOREIGN_COL,
+    SUMMARY_COLUMNS,
+    YEAR_INTERVAL,
+)
+from src.analysis.crosstab import factorize_column
+from src.analysis.cube import STATUS_LABELS, CountCube
+from src.analysis.remuneration import (
+    REGION_LABELS,
+    SalaryCube,
+    foreign_region_mask,
+    mantissa_parts,
+)
+from src.processing.data_loader import iter_data_chunks
+from src.utils.labels import decode_index, decode_label, encode_index, encode_label
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the saved layout changes; older artifacts are then rejected
+PARTIAL_FORMAT_VERSION: int = 1
+PARTIAL_FORMAT_NAME: str = "auto_report-partial"
+
+# Dimensions with fixed small code sets; every other dimension is a source
+# column whose codes point into PartialAggregate.labels
+STATUS_DIM = "status"
+REGION_DIM = "region"
+EXPONENT_DIM = "exponent"
+FIXED_DIMS = frozenset([STATUS_DIM, REGION_DIM, EXPONENT_DIM])
+CELL_DIMS: Tuple[str, ...] = (BRANCH_COL, FILIER_COL, STATUS_DIM, YEAR_COL, GENDER_COL)
+SALARY_COLUMNS: Tuple[str, ...] = (SALARY_AP_COL, SALARY_HP_COL)
+
+# A table: its dimensions, one row of codes per cell (-1 for a missing label)
+# and the int64 values summed over the rows that fall in each cell
+Table = Tuple[Tuple[str, ...], np.ndarray, np.ndarray]
+
+
+def _group_sum(dims: Tuple[str, ...], keys: np.ndarray, values: np.ndarray) -> Table:
+    """Sum values over equal key rows; keys come back sorted and unique."""
+    keys = keys.reshape(len(keys), len(dims)).astype(np.int64, copy=False)
+    values = values.reshape(len(values), -1).astype(np.int64, copy=False)
+    if not len(keys):
+        return dims, keys, values
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    summed = np.zeros((len(unique), values.shape[1]), dtype=np.int64)
+    np.add.at(summed, inverse.reshape(-1), values)
+    return dims, unique, summed
+
+
+class PartialAggregate:
+    """Additive counts and exact salary sums of a set of rows, unfiltered by year.
+
+    Partials built from any split of the rows (chunks of one file, several
+    files) merge into the partial of all rows: labels are unioned and sorted
+    like pd.factorize(sort=True), and table values are integer sums, so the
+    merge is associative and exact. Tables:
+
+    - "rows": row counts by (branch, filiere, status, year, gender, region)
+    - "count:<col>": row counts by the same cell and the modality of col
+    - "salary:<col>": [high, low, count] mantissa sums of the salary column by
+      cell, region and binary exponent (see remuneration.exact_float)
+
+    The year window is applied by to_cubes, once every row has been merged.
+    """
+
+    def __init__(
+        self,
+        labels: Dict[str, pd.Index],
+        tables: Dict[str, Table],
+        columns: Iterable[str],
+    ) -> None:
+        self.labels = labels
+        self.tables = tables
+        self.columns = list(dict.fromkeys(columns))
+
+    def merge(self, other: PartialAggregate) -> PartialAggregate:
+        """Partial aggregate of the rows of both partials."""
+        labels: Dict[str, pd.Index] = {}
+        remaps: Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]] = ({}, {})
+        for name in dict.fromkeys([*self.labels, *other.labels]):
+            left = self.labels.get(name, pd.Index([], dtype=object))
+            right = other.labels.get(name, pd.Index([], dtype=object))
+            # An absent or empty side must not widen the dtype of the other one
+            if not len(left):
+                labels[name] = right
+                remaps[0][name], remaps[1][name] = np.arange(0), np.arange(len(right))
+                continue
+            if not len(right):
+                labels[name] = left
+                remaps[0][name], remaps[1][name] = np.arange(len(left)), np.arange(0)
+                continue
+            codes, labels[name] = pd.factorize(left.append(right), sort=True)
+            remaps[0][name], remaps[1][name] = codes[: len(left)], codes[len(left):]
+
+        tables: Dict[str, Table] = {}
+        for name in dict.fromkeys([*self.tables, *other.tables]):
+            parts = [
+                _remap_table(partial.tables[name], remap)
+                for partial, remap in zip((self, other), remaps)
+                if name in partial.tables
+            ]
+            dims = parts[0][0]
+            if any(part[0] != dims for part in parts):
+                raise ValueError(f"Cannot merge partial table {name}: dimensions differ")
+            tables[name] = _group_sum(
+                dims,
+                np.concatenate([part[1] for part in parts]),
+                np.concatenate([part[2] for part in parts]),
+            )
+        return PartialAggregate(labels, tables, [*self.columns, *other.columns])
+
+    def to_cubes(self, interval: int = YEAR_INTERVAL) -> Tuple[CountCube, SalaryCube]:
+        """Apply the year window and expand into the cubes the analyses read.
+
+        Gives the same CountCube as build_count_cube on the prepared frame of
+        the merged rows, and a SalaryCube for the remuneration means.
+        """
+        partial = _compact(_filter_years(self, interval))
+        layout = _CellLayout(partial)
+        cube = _count_cube(partial, layout)
+        return cube, _salary_cube(partial, layout, cube)
+
+
+def _remap_table(table: Table, remap: Dict[str, np.ndarray]) -> Table:
+    dims, keys, values = table
+    keys = keys.copy()
+    for j, dim in enumerate(dims):
+        if dim in FIXED_DIMS:
+            continue
+        # Code -1 (missing) picks the appended -1
+        keys[:, j] = np.append(remap[dim], -1)[keys[:, j]]
+    return dims, keys, values
+
+
+def _filter_years(partial: PartialAggregate, interval: int) -> PartialAggregate:
+    """Keep the cells whose year is in the window, as filter_by_year_interval does."""
+    if YEAR_COL not in partial.columns:
+        raise KeyError(f"Missing year column: {YEAR_COL}")
+    years = pd.Series(partial.labels[YEAR_COL])
+    numeric = pd.to_numeric(years, errors="coerce").dropna().astype(int)
+    if numeric.empty:
+        raise ValueError("No valid years found in the dataset")
+    max_year = numeric.max()
+    min_year = max_year - interval
+    logger.info("Filtering years between %s and %s (inclusive)", min_year, max_year)
+    # Trailing False drops cells with a missing year (code -1)
+    keep = np.append(years.between(min_year, max_year).to_numpy(dtype=bool), False)
+
+    tables: Dict[str, Table] = {}
+    for name, (dims, keys, values) in partial.tables.items():
+        mask = keep[keys[:, dims.index(YEAR_COL)]]
+        tables[name] = (dims, keys[mask], values[mask])
+    return PartialAggregate(partial.labels, tables, partial.columns)
+
+
+def _compact(partial: PartialAggregate) -> PartialAggregate:
+    """Drop labels that no remaining cell uses, as factorizing the filtered rows would."""
+    used: Dict[str, List[np.ndarray]] = {name: [] for name in partial.labels}
+    for dims, keys, _ in partial.tables.values():
+        for j, dim in enumerate(dims):
+            if dim not in FIXED_DIMS:
+                used[dim].append(keys[:, j])
+    labels: Dict[str, pd.Index] = {}
+    remap: Dict[str, np.ndarray] = {}
+    for name, index in partial.labels.items():
+        codes = np.concatenate(used[name]) if used[name] else np.array([], dtype=np.int64)
+        keep = np.unique(codes[codes >= 0])
+        labels[name] = index.take(keep)
+        remap[name] = np.full(len(index), -1, dtype=np.int64)
+        remap[name][keep] = np.arange(len(keep))
+    tables = {name: _remap_table(table, remap) for name, table in partial.tables.items()}
+    return PartialAggregate(labels, tables, partial.columns)
+
+
+def _slot(codes: np.ndarray, labels: pd.Index) -> np.ndarray:
+    """Cube axis position: missing labels go to the trailing slot."""
+    return np.where(codes < 0, len(labels), codes)
+
+
+class _CellLayout:
+    """Maps table rows of a filtered, compacted partial onto CountCube axes."""
+
+    def __init__(self, partial: PartialAggregate) -> None:
+        self.labels = partial.labels
+        dims, keys, _ = partial.tables["rows"]
+        self.n_filieres = len(self.labels[FILIER_COL]) + 1
+        # Units are the observed (branch, filiere) pairs, ordered as in build_count_cube
+        self.units = np.unique(self._unit_keys(dims, keys))
+        self.shape = (
+            len(self.units),
+            len(STATUS_LABELS),
+            len(self.labels[YEAR_COL]) + 1,
+            len(self.labels[GENDER_COL]) + 1,
+        )
+
+    def _unit_keys(self, dims: Tuple[str, ...], keys: np.ndarray) -> np.ndarray:
+        branch = _slot(keys[:, dims.index(BRANCH_COL)], self.labels[BRANCH_COL])
+        filiere = _slot(keys[:, dims.index(FILIER_COL)], self.labels[FILIER_COL])
+        return branch * self.n_filieres + filiere
+
+    def index(self, dims: Tuple[str, ...], keys: np.ndarray) -> List[np.ndarray]:
+        """(unit, status, year, gender) positions of table rows."""
+        return [
+            np.searchsorted(self.units, self._unit_keys(dims, keys)),
+            keys[:, dims.index(STATUS_DIM)],
+            _slot(keys[:, dims.index(YEAR_COL)], self.labels[YEAR_COL]),
+            _slot(keys[:, dims.index(GENDER_COL)], self.labels[GENDER_COL]),
+        ]
+
+
+def _count_cube(partial: PartialAggregate, layout: _CellLayout) -> CountCube:
+    dims, keys, values = partial.tables["rows"]
+    row_counts = np.zeros(layout.shape[:2], dtype=np.int64)
+    np.add.at(row_counts, tuple(layout.index(dims, keys)[:2]), values[:, 0])
+
+    counts: Dict[str, np.ndarray] = {}
+    modalities: Dict[str, pd.Index] = {}
+    for name, (dims, keys, values) in partial.tables.items():
+        if not name.startswith("count:"):
+            continue
+        col = dims[-1]
+        modalities[col] = partial.labels[col]
+        counts[col] = np.zeros(layout.shape + (len(modalities[col]) + 1,), dtype=np.int64)
+        index = layout.index(dims, keys) + [_slot(keys[:, -1], modalities[col])]
+        np.add.at(counts[col], tuple(index), values[:, 0])
+
+    logger.debug("Built count cube from partial: %d units, %d columns", len(layout.units), len(counts))
+    return CountCube(
+        partial.labels[BRANCH_COL],
+        partial.labels[FILIER_COL],
+        partial.labels[YEAR_COL],
+        partial.labels[GENDER_COL],
+        layout.units // layout.n_filieres,
+        layout.units % layout.n_filieres,
+        row_counts,
+        counts,
+        modalities,
+        source_columns=partial.columns,
+    )
+
+
+def _salary_cube(partial: PartialAggregate, layout: _CellLayout, cube: CountCube) -> SalaryCube:
+    shape = layout.shape + (len(REGION_LABELS),)
+
+    dims, keys, values = partial.tables["rows"]
+    rows = np.zeros(shape, dtype=np.int64)
+    np.add.at(rows, tuple(layout.index(dims, keys) + [keys[:, dims.index(REGION_DIM)]]), values[:, 0])
+
+    salary_tables = {
+        name.split(":", 1)[1]: table
+        for name, table in partial.tables.items()
+        if name.startswith("salary:")
+    }
+    exponents = np.unique(np.concatenate(
+        [np.zeros(0, dtype=np.int64)]
+        + [keys[:, dims.index(EXPONENT_DIM)] for dims, keys, _ in salary_tables.values()]
+    ))
+
+    counts: Dict[str, np.ndarray] = {}
+    sums: Dict[str, np.ndarray] = {}
+    for col, (dims, keys, values) in salary_tables.items():
+        index = layout.index(dims, keys) + [keys[:, dims.index(REGION_DIM)]]
+        counts[col] = np.zeros(shape, dtype=np.int64)
+        np.add.at(counts[col], tuple(index), values[:, 2])
+        sums[col] = np.zeros(shape + (len(exponents), 2), dtype=np.int64)
+        bucket = np.searchsorted(exponents, keys[:, dims.index(EXPONENT_DIM)])
+        np.add.at(sums[col], tuple(index + [bucket]), values[:, :2])
+
+    return SalaryCube(
+        cube,
+        rows,
+        counts,
+        sums,
+        exponents,
+        salary_columns=[col for col in SALARY_COLUMNS if col in partial.columns],
+        has_region=REGION_FOREIGN_COL in partial.columns,
+    )
+
+
+def build_partial(df: pd.DataFrame, summary_cols: Iterable[str] = SUMMARY_COLUMNS) -> PartialAggregate:
+    """Partial aggregate of the cleaned (not year-filtered) rows of df."""
+    summary_cols = [col for col in summary_cols if col in df.columns]
+    codes: Dict[str, np.ndarray] = {}
+    labels: Dict[str, pd.Index] = {}
+    for col in dict.fromkeys([BRANCH_COL, FILIER_COL, YEAR_COL, GENDER_COL, *summary_cols]):
+        if col in df.columns:
+            codes[col], labels[col] = factorize_column(df[col])
+        else:
+            codes[col], labels[col] = np.full(len(df), -1, dtype=np.int64), pd.Index([], dtype=object)
+
+    if STATUS_COL in df.columns:
+        status = np.where((df[STATUS_COL] == STATUS_INITIAL_VAL).to_numpy(dtype=bool), 0, 1)
+    else:
+        status = np.ones(len(df), dtype=np.int64)
+    if REGION_FOREIGN_COL in df.columns:
+        region = foreign_region_mask(df).astype(np.int64)
+    else:
+        region = np.zeros(len(df), dtype=np.int64)
+
+    cell = np.column_stack([codes[BRANCH_COL], codes[FILIER_COL], status, codes[YEAR_COL], codes[GENDER_COL]])
+    ones = np.ones(len(df), dtype=np.int64)
+    tables: Dict[str, Table] = {
+        "rows": _group_sum(CELL_DIMS + (REGION_DIM,), np.column_stack([cell, region]), ones),
+    }
+    for col in summary_cols:
+        tables[f"count:{col}"] = _group_sum(CELL_DIMS + (col,), np.column_stack([cell, codes[col]]), ones)
+
+    for col in SALARY_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        valid = np.isfinite(values)
+        exponents, parts = mantissa_parts(values[valid])
+        # [high, low, 1]: the last column counts the salaries of each cell
+        tables[f"salary:{col}"] = _group_sum(
+            CELL_DIMS + (REGION_DIM, EXPONENT_DIM),
+            np.column_stack([cell[valid], region[valid], exponents]),
+            np.column_stack([parts, np.ones(len(parts), dtype=np.int64)]),
+        )
+    return PartialAggregate(labels, tables, df.columns)
+
+
+def merge_partials(partials: Iterable[PartialAggregate]) -> PartialAggregate:
+    """Merge any number of partial aggregates; the order does not change the result."""
+    partials = list(partials)
+    if not partials:
+        raise ValueError("No partial aggregates to merge")
+    return reduce(PartialAggregate.merge, partials)
+
+
+def partial_from_file(
+    file_path: Path,
+    chunk_rows: int,
+    columns: Iterable[str] | None = None,
+    summary_cols: Iterable[str] = SUMMARY_COLUMNS,
+) -> PartialAggregate:
+    """Aggregate a workbook chunk by chunk, holding one chunk of rows at a time."""
+    summary_cols = list(summary_cols)
+    partial: PartialAggregate | None = None
+    n_rows = 0
+    for chunk in iter_data_chunks(file_path, chunk_rows, columns):
+        n_rows += len(chunk)
+        part = build_partial(chunk, summary_cols)
+        partial = part if partial is None else partial.merge(part)
+    if partial is None:
+        raise ValueError(f"No rows found in {file_path}")
+    logger.info("Aggregated %d rows of %s", n_rows, file_path)
+    return partial
+
+
+def save_partial(partial: PartialAggregate, path: Path) -> Path:
+    """Write a partial aggregate as .npz: int64 tables plus JSON labels, no pickles."""
+    arrays: Dict[str, np.ndarray] = {}
+    tables_meta = []
+    for i, (name, (dims, keys, values)) in enumerate(partial.tables.items()):
+        arrays[f"t{i}_keys"] = keys
+        arrays[f"t{i}_values"] = values
+        tables_meta.append({"name": name, "dims": list(dims)})
+    meta = {
+        "format": PARTIAL_FORMAT_NAME,
+        "version": PARTIAL_FORMAT_VERSION,
+        "columns": [encode_label(col) for col in partial.columns],
+        "labels": {
+            name: encode_index(index) for name, index in partial.labels.items()
+        },
+        "tables": tables_meta,
+    }
+    arrays["meta"] = np.array(json.dumps(meta))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "wb") as handle:
+        np.savez_compressed(handle, **arrays)
+    os.replace(tmp_path, path)
+    logger.info("Saved partial aggregate: %s", path)
+    return path
+
+
+def load_partial(path: Path) -> PartialAggregate:
+    """Read a partial aggregate written by save_partial."""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("format") != PARTIAL_FORMAT_NAME or meta.get("version") != PARTIAL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported partial aggregate: {path}")
+        tables = {
+            table["name"]: (tuple(table["dims"]), data[f"t{i}_keys"], data[f"t{i}_values"])
+            for i, table in enumerate(meta["tables"])
+        }
+    labels = {name: decode_index(spec) for name, spec in meta["labels"].items()}
+    return PartialAggregate(labels, tables, [decode_label(col) for col in meta["columns"]])
@@ -0,0 +1,29 @@
+import logging
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+def build_partitions(df: pd.DataFrame, col: str) -> Dict[str, pd.DataFrame]:
+    """Split df into one row slice per label of col, keyed by the label as str.
+
+    Rows with a missing label are dropped, as in the branch loops. The frame is
+    stably sorted by label once and every group is a contiguous iloc slice of
+    that sorted frame, so groups keep their original row order and index and
+    no per-group boolean mask or copy is needed. Keys are in sorted order.
+    """
+    positions = np.flatnonzero(df[col].notna().to_numpy())
+    keys = df[col].iloc[positions].astype(str).to_numpy(dtype=object)
+    codes, labels = pd.factorize(keys, sort=True)
+    order = np.argsort(codes, kind="stable")
+    ordered = df.take(positions[order])
+    bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+    logger.debug("Partitioned %d rows by %s into %d groups", len(ordered), col, len(labels))
+    return {
+        str(label): ordered.iloc[bounds[i]:bounds[i + 1]]
+        for i, label in enumerate(labels)
+    }
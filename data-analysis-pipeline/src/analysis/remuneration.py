@@ -1,96 +1,381 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict
+import math
+from typing import Dict, Iterable, Tuple
 
+import numpy as np
 import pandas as pd
+from pandas.core.groupby import DataFrameGroupBy
 
 from config.settings import (
     YEAR_COL,
     GENDER_COL,
+    FILIER_COL,
     SALARY_AP_COL,
     SALARY_HP_COL,
     REGION_FOREIGN_COL,
     REMUNERATION_SHEET_NAME,
     REMUNERATION_FR_SHEET_NAME,
+    REMUNERATION_STATS_SHEET_NAME,
+    REMUNERATION_STATS_FR_SHEET_NAME,
 )
+from src.analysis.cube import STATUS_LABELS, CountCube
 
 
 logger = logging.getLogger(__name__)
 
 
-def _remuneration_pivot(frame: pd.DataFrame, pivot_col: str = GENDER_COL) -> pd.DataFrame:
-    col_ap = SALARY_AP_COL
-    col_hp = SALARY_HP_COL
+# Row labels of the salary tables
+SALARY_LABELS: Dict[str, str] = {"AP": SALARY_AP_COL, "HP": SALARY_HP_COL}
+# Statistics of the extended salary sheet, in row order
+STAT_NAMES: Tuple[str, ...] = ("count", "mean", "median", "p25", "p75", "std")
+# Salaries are summed exactly as int64 mantissas split into high and low bits
+MANTISSA_LOW_BITS: int = 26
+# Region axis of salary aggregates: rows in France, rows abroad
+REGION_LABELS: Tuple[str, str] = ("France", "Etranger")
 
+
+def mantissa_parts(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Split finite floats into int64 exponents and [high, low] mantissa parts.
+
+    value = (high * 2 ** MANTISSA_LOW_BITS + low) * 2 ** exponent, with a 53-bit
+    integer mantissa, so sums of the parts are exact in int64.
+    """
+    fraction, exponent = np.frexp(values)
+    mantissa = np.ldexp(fraction, 53).astype(np.int64)
+    parts = np.column_stack([
+        mantissa >> MANTISSA_LOW_BITS,
+        mantissa & ((1 << MANTISSA_LOW_BITS) - 1),
+    ])
+    return exponent.astype(np.int64) - 53, parts
+
+
+def _exact_means(grouped: DataFrameGroupBy, values: pd.DataFrame) -> pd.DataFrame:
+    """Group means of values from exact sums, as SalaryCube computes them.
+
+    Unlike grouped.mean(), the result does not depend on the row order, so
+    tables built from rows and from merged partial aggregates are identical.
+    """
+    index = grouped.size().index
+    ids = grouped.ngroup().to_numpy(dtype=float)
+    means: Dict[str, np.ndarray] = {}
+    for col in values.columns:
+        column = values[col].to_numpy(dtype=float)
+        valid = np.isfinite(column) & ~np.isnan(ids)
+        group_ids = ids[valid].astype(np.intp)
+        exponents, parts = mantissa_parts(column[valid])
+        buckets, bucket_ids = np.unique(exponents, return_inverse=True)
+        sums = np.zeros((len(index), len(buckets), 2), dtype=np.int64)
+        np.add.at(sums, (group_ids, bucket_ids.reshape(-1)), parts)
+        counts = np.bincount(group_ids, minlength=len(index))
+        means[col] = np.array([
+            exact_float(sums[g], buckets) / counts[g] if counts[g] else np.nan
+            for g in range(len(index))
+        ], dtype=float)
+    return pd.DataFrame(means, index=index, columns=values.columns)
+
+
+def _salary_stats(grouped: DataFrameGroupBy, values: pd.DataFrame, extended: bool) -> Dict[str, pd.DataFrame]:
+    means = _exact_means(grouped, values)
+    if not extended:
+        return {"mean": means}
+    return {
+        "count": grouped.count(),
+        "mean": means,
+        "median": grouped.median(),
+        "p25": grouped.quantile(0.25),
+        "p75": grouped.quantile(0.75),
+        "std": grouped.std(),
+    }
+
+
+def _salary_columns(years: list, sub_cols: list, pivot_col: str) -> pd.MultiIndex:
+    """(year, sub-column) columns of a salary table, each year followed by its Total."""
+    return pd.MultiIndex.from_tuples(
+        [(y, sc) for y in years for sc in [*sub_cols, "Total"]],
+        names=[YEAR_COL, pivot_col],
+    )
+
+
+def _salary_frame(rows: Dict[str, np.ndarray], columns: pd.MultiIndex) -> pd.DataFrame:
+    table = pd.DataFrame.from_dict(rows, orient="index", columns=columns)
+    return table.sort_index(axis=1, level=[0, 1])
+
+
+def _remuneration_pivot(
+    frame: pd.DataFrame,
+    pivot_col: str = GENDER_COL,
+    extended: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame | None] | None:
+    """Salary table of frame by (year, pivot_col) plus per-year totals.
+
+    Returns the mean AP/HP table and, with extended, the count / mean / median /
+    p25 / p75 / std table with one row per (salary, statistic). Every statistic
+    comes from the same two groupbys (cells and years) and is scattered into a
+    (year, sub-column) grid by group position, so no per-cell lookups are made.
+    Returns None when frame has no (year, pivot_col) group.
+    """
     data = frame[[YEAR_COL, pivot_col]].copy()
-    if col_ap in frame.columns:
-        data[col_ap] = pd.to_numeric(frame[col_ap], errors="coerce")
-    else:
-        data[col_ap] = float("nan")
-
-    if col_hp in frame.columns:
-        data[col_hp] = pd.to_numeric(frame[col_hp], errors="coerce")
-    else:
-        data[col_hp] = float("nan")
-
-    grouped = data.groupby([YEAR_COL, pivot_col])[[col_ap, col_hp]].mean()
-    per_year = data.groupby([YEAR_COL])[[col_ap, col_hp]].mean()
-
-    years = sorted(grouped.index.get_level_values(0).unique())
-    sub_cols = sorted(grouped.index.get_level_values(1).unique())
-
-    columns = []
-    values_ap = []
-    values_hp = []
-    for y in years:
-        for sc in sub_cols:
-            columns.append((y, sc))
-            if (y, sc) in grouped.index:
-                row = grouped.loc[(y, sc)]
-                values_ap.append(row.get(col_ap))
-                values_hp.append(row.get(col_hp))
-            else:
-                values_ap.append(float("nan"))
-                values_hp.append(float("nan"))
-        columns.append((y, "Total"))
-        if y in per_year.index:
-            row_y = per_year.loc[y]
-            values_ap.append(row_y.get(col_ap))
-            values_hp.append(row_y.get(col_hp))
+    for col in SALARY_LABELS.values():
+        if col in frame.columns:
+            data[col] = pd.to_numeric(frame[col], errors="coerce")
         else:
-            values_ap.append(float("nan"))
-            values_hp.append(float("nan"))
+            data[col] = float("nan")
+
+    salary_cols = list(SALARY_LABELS.values())
+    grouped = data.groupby([YEAR_COL, pivot_col], observed=True)[salary_cols]
+    per_year = data.groupby([YEAR_COL], observed=True)[salary_cols]
+    cells = _salary_stats(grouped, data[salary_cols], extended)
+    totals = _salary_stats(per_year, data[salary_cols], extended)
+    if cells["mean"].empty:
+        return None
+
+    index = cells["mean"].index
+    years = sorted(index.get_level_values(0).unique())
+    sub_cols = sorted(index.get_level_values(1).unique())
+    columns = _salary_columns(years, sub_cols, pivot_col)
+    # Position of every group in the (years, sub-columns + Total) grid
+    year_pos = pd.Index(years).get_indexer(index.get_level_values(0))
+    sub_pos = pd.Index(sub_cols, dtype=object).get_indexer(index.get_level_values(1).astype(object))
+    total_pos = pd.Index(years).get_indexer(totals["mean"].index)
+    keep_totals = total_pos >= 0
 
-    matrix = {
-        ("AP"): values_ap,
-        ("HP"): values_hp,
+    def _rows(stat: str) -> Dict[str, np.ndarray]:
+        rows = {}
+        for label, col in SALARY_LABELS.items():
+            grid = np.full((len(years), len(sub_cols) + 1), np.nan)
+            grid[year_pos, sub_pos] = cells[stat][col].to_numpy(dtype=float)
+            grid[total_pos[keep_totals], -1] = totals[stat][col].to_numpy(dtype=float)[keep_totals]
+            rows[label] = grid.ravel()
+        return rows
+
+    means = _salary_frame(_rows("mean"), columns)
+    if not extended:
+        return means, None
+
+    by_stat = {stat: _rows(stat) for stat in STAT_NAMES}
+    # Rows grouped by salary column: AP count, AP mean, ..., HP count, ...
+    stats_rows = {
+        f"{label} {stat}": by_stat[stat][label]
+        for label in SALARY_LABELS
+        for stat in STAT_NAMES
     }
-    result = pd.DataFrame(matrix, index=pd.MultiIndex.from_tuples(columns, names=[YEAR_COL, pivot_col])).T
-    result = result.sort_index(axis=1, level=[0, 1])
-    return result
+    return means, _salary_frame(stats_rows, columns)
+
 
+def build_remuneration_sheets(
+    df: pd.DataFrame,
+    pivot_col: str = GENDER_COL,
+    salary_stats: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """Mean salary sheets (overall and France only) of df by year and pivot_col.
 
-def build_remuneration_sheets(df: pd.DataFrame, pivot_col: str = GENDER_COL) -> Dict[str, pd.DataFrame]:
+    With salary_stats, the extended count / median / quartiles / std sheets are
+    added next to them.
+    """
     sheets: Dict[str, pd.DataFrame] = {}
     if (SALARY_AP_COL not in df.columns) and (SALARY_HP_COL not in df.columns):
         return sheets
 
-    try:
-        sheets[REMUNERATION_SHEET_NAME] = _remuneration_pivot(df, pivot_col)
-    except Exception:
-        logger.warning("Failed to build remuneration pivot", exc_info=True)
-
-    if REGION_FOREIGN_COL in df.columns:
-        region_series = df[REGION_FOREIGN_COL].astype(str)
-        lower = region_series.str.lower()
-        france_mask = (lower != "etranger") & (lower != "étranger")
-        df_france = df.loc[france_mask]
+    def _add(frame: pd.DataFrame, name: str, stats_name: str) -> None:
         try:
-            sheets[REMUNERATION_FR_SHEET_NAME] = _remuneration_pivot(df_france, pivot_col)
+            tables = _remuneration_pivot(frame, pivot_col, extended=salary_stats)
         except Exception:
-            logger.warning("Failed to build remuneration (France) pivot", exc_info=True)
+            logger.warning("Failed to build %s pivot", name, exc_info=True)
+            return
+        if tables is None:
+            logger.debug("No salary groups for %s", name)
+            return
+        means, stats = tables
+        sheets[name] = means
+        if stats is not None:
+            sheets[stats_name] = stats
+
+    _add(df, REMUNERATION_SHEET_NAME, REMUNERATION_STATS_SHEET_NAME)
+
+    if REGION_FOREIGN_COL in df.columns:
+        df_france = df.loc[~foreign_region_mask(df)]
+        _add(df_france, REMUNERATION_FR_SHEET_NAME, REMUNERATION_STATS_FR_SHEET_NAME)
 
     return sheets
 
 
+def foreign_region_mask(df: pd.DataFrame) -> np.ndarray:
+    """Rows whose REGION_FOREIGN_COL marks a job abroad (missing values count as France)."""
+    lower = df[REGION_FOREIGN_COL].astype(str).str.lower()
+    return ((lower == "etranger") | (lower == "étranger")).to_numpy(dtype=bool)
+
+
+def exact_float(parts: np.ndarray, exponents: np.ndarray) -> float:
+    """Round an exact sum held as (exponent bucket, [high, low]) int64 parts to a float.
+
+    Bucket k holds sum(mantissa) * 2 ** exponents[k], each mantissa split as
+    high * 2 ** MANTISSA_LOW_BITS + low. The buckets are combined as one Python
+    int, so the result is the correctly rounded sum whatever the summation order.
+    """
+    if not len(exponents):
+        return 0.0
+    base = int(exponents.min())
+    total = 0
+    for (high, low), exponent in zip(parts.tolist(), exponents.tolist()):
+        total += ((high << MANTISSA_LOW_BITS) + low) << (exponent - base)
+    return math.ldexp(float(total), base)
+
+
+class SalaryCube:
+    """Salary sums and counts aligned with a CountCube, for remuneration sheets without rows.
+
+    Arrays share the cube's (unit, status, year + 1, gender + 1) axes followed by
+    a region axis (France, abroad). rows counts every row, counts the non-missing
+    salaries and sums holds exact salary sums as (exponent bucket, [high, low])
+    int64 parts, so means over any slice are correctly rounded and do not depend
+    on how the rows were split into chunks. Only means can be rebuilt this way:
+    medians, quartiles and standard deviations need the rows.
+    """
+
+    def __init__(
+        self,
+        cube: CountCube,
+        rows: np.ndarray,
+        counts: Dict[str, np.ndarray],
+        sums: Dict[str, np.ndarray],
+        exponents: np.ndarray,
+        salary_columns: Iterable[str],
+        has_region: bool,
+    ) -> None:
+        self.cube = cube
+        self.rows = rows
+        self.counts = counts
+        self.sums = sums
+        self.exponents = exponents
+        self.salary_columns = frozenset(salary_columns)
+        self.has_region = has_region
+
+    def _reduce(
+        self,
+        values: np.ndarray,
+        pivot_col: str,
+        branch: str | None,
+        status: str | None,
+        france: bool,
+    ) -> np.ndarray:
+        """Slice values to one branch / status / region and roll it up to (year + 1, sub + 1, ...)."""
+        values = values[self.cube._units(branch)]
+        values = values[:, STATUS_LABELS.index(status)] if status is not None else values.sum(axis=1)
+        # (units, years + 1, genders + 1, regions, ...)
+        values = values[:, :, :, 0] if france else values.sum(axis=3)
+        if pivot_col == GENDER_COL:
+            return values.sum(axis=0)
+        if pivot_col == FILIER_COL:
+            # Missing genders still count in the filiere view
+            per_unit = values.sum(axis=2)
+            return np.tensordot(self.cube.filiere_onehot(branch).T, per_unit, axes=1).swapaxes(0, 1)
+        raise ValueError(f"Unsupported salary sub-column: {pivot_col}")
+
+    def pivot(
+        self,
+        pivot_col: str = GENDER_COL,
+        branch: str | None = None,
+        status: str | None = None,
+        france: bool = False,
+    ) -> pd.DataFrame | None:
+        """Mean salary table of one slice, laid out like _remuneration_pivot.
+
+        Returns None when the slice has no (year, pivot_col) group.
+        """
+        rows = self._reduce(self.rows, pivot_col, branch, status, france)
+        present = rows[:-1, :-1] > 0
+        if not present.any():
+            return None
+        year_idx = np.flatnonzero(present.any(axis=1))
+        sub_idx = np.flatnonzero(present.any(axis=0))
+        sub_labels = self.cube.gender_labels if pivot_col == GENDER_COL else self.cube.filiere_labels
+        years = list(self.cube.year_labels.take(year_idx))
+        sub_cols = list(sub_labels.take(sub_idx))
+
+        means = {}
+        for label, col in SALARY_LABELS.items():
+            grid = np.full((len(years), len(sub_cols) + 1), np.nan)
+            if col in self.counts:
+                counts = self._reduce(self.counts[col], pivot_col, branch, status, france)
+                sums = self._reduce(self.sums[col], pivot_col, branch, status, france)
+                # Per-year totals include rows whose sub-column is missing
+                counts = np.column_stack([counts[year_idx][:, sub_idx], counts[year_idx].sum(axis=1)])
+                sums = np.concatenate(
+                    [sums[year_idx][:, sub_idx], sums[year_idx].sum(axis=1, keepdims=True)], axis=1
+                )
+                for i, j in zip(*np.nonzero(counts)):
+                    grid[i, j] = exact_float(sums[i, j], self.exponents) / counts[i, j]
+            means[label] = grid.ravel()
+        return _salary_frame(means, _salary_columns(years, sub_cols, pivot_col))
+
+    def means(
+        self,
+        selection: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+        france: bool = False,
+    ) -> pd.Series:
+        """Mean salary of every SALARY_LABELS row over a CountCube.selection() of self.cube.
+
+        NaN where the selection holds no salary.
+        """
+        index = np.ix_(*map(np.flatnonzero, selection))
+        means = {}
+        for label, col in SALARY_LABELS.items():
+            means[label] = np.nan
+            if col not in self.counts:
+                continue
+            # (units, status, years, genders, regions, ...)
+            counts, sums = self.counts[col][index], self.sums[col][index]
+            if france:
+                counts, sums = counts[..., 0], sums[:, :, :, :, 0]
+            count = counts.sum()
+            if count:
+                parts = sums.reshape(-1, len(self.exponents), 2).sum(axis=0)
+                means[label] = exact_float(parts, self.exponents) / count
+        return pd.Series(means, dtype=float)
+
+    def sheets(
+        self,
+        pivot_col: str = GENDER_COL,
+        branch: str | None = None,
+        status: str | None = None,
+        salary_stats: bool = False,
+    ) -> Dict[str, pd.DataFrame]:
+        """Mean salary sheets of one slice, as build_remuneration_sheets on its rows."""
+        sheets: Dict[str, pd.DataFrame] = {}
+        if not self.salary_columns:
+            return sheets
+        if salary_stats:
+            logger.debug("Salary statistics need row-level data; only means are built from aggregates")
+
+        targets = [(REMUNERATION_SHEET_NAME, False)]
+        if self.has_region:
+            targets.append((REMUNERATION_FR_SHEET_NAME, True))
+        for name, france in targets:
+            try:
+                table = self.pivot(pivot_col, branch=branch, status=status, france=france)
+            except Exception:
+                logger.warning("Failed to build %s pivot", name, exc_info=True)
+                continue
+            if table is not None:
+                sheets[name] = table
+        return sheets
+
+
+def remuneration_sheets(
+    df: pd.DataFrame | None,
+    pivot_col: str = GENDER_COL,
+    salary_stats: bool = False,
+    salaries: SalaryCube | None = None,
+    branch: str | None = None,
+    status: str | None = None,
+) -> Dict[str, pd.DataFrame]:
+    """Remuneration sheets of one branch / status slice.
+
+    df holds the rows of the slice; when salaries is given the sheets are
+    rebuilt from its aggregates instead and df may be None.
+    """
+    if salaries is not None:
+        return salaries.sheets(pivot_col, branch=branch, status=status, salary_stats=salary_stats)
+    return build_remuneration_sheets(df, pivot_col=pivot_col, salary_stats=salary_stats)
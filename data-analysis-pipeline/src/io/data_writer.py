@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import logging
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Hashable, List
 
+import numpy as np
 import pandas as pd
-from openpyxl.utils import get_column_letter
 
+from config.settings import AUTOFIT_SAMPLE_ROWS, EXCEL_BACKEND
+from src.io.excel_backends import ExcelTarget, open_excel_book
 from src.utils.sheet_utils import safe_sheet_name
 
 
@@ -19,47 +22,150 @@ def save_to_pickle(sheets_dict: Dict[str, pd.DataFrame], output_path: Path) -> N
     pd.to_pickle(sheets_dict, output_path)
 
 
-def _autofit_openpyxl_sheet(writer: pd.ExcelWriter, sheet_name: str, df: pd.DataFrame) -> None:
-    """Auto-fit columns using openpyxl like in the notebook."""
+# Widest auto-fitted column, in characters
+MAX_COLUMN_WIDTH: int = 60
+# Float columns taller than this are measured on their distinct values
+DISTINCT_MIN_ROWS: int = 1024
+
+
+@lru_cache(maxsize=4096)
+def _label_length(label: Hashable) -> int:
+    # Column labels repeat across tables (years, genders, ...): measure each once
+    return len(str(label))
+
+
+def _sample(n_rows: int, sample_rows: int) -> np.ndarray | slice:
+    if sample_rows and n_rows > sample_rows:
+        return np.linspace(0, n_rows - 1, sample_rows).astype(np.intp)
+    return slice(None)
+
+
+def _max_text_length(values: pd.Index, sample_rows: int = 0) -> int:
+    """Longest str(value) in values, as values.astype(str) would print them."""
+    if not len(values):
+        return 0
+    return max(map(len, values[_sample(len(values), sample_rows)].astype(str)))
+
+
+def _column_lengths(df: pd.DataFrame, sample_rows: int = 0) -> np.ndarray:
+    """Longest str(value) of every column of df, as df.astype(str) would print them.
+
+    Columns are measured a dtype block at a time on NumPy string-length arrays:
+    integers exactly from their extremes, floats and booleans from their text
+    (on at most sample_rows evenly spaced rows when sample_rows is set). Other
+    dtypes go through pandas' own string conversion.
+    """
+    lengths = np.zeros(df.shape[1], dtype=np.int64)
+    if not len(df):
+        return lengths
+    rows = _sample(len(df), sample_rows)
+    dtypes = list(df.dtypes)
+    blocks: Dict[str, List[int]] = {}
+    for position, dtype in enumerate(dtypes):
+        blocks.setdefault(str(dtype), []).append(position)
+    for positions in blocks.values():
+        dtype = dtypes[positions[0]]
+        kind = dtype.kind if isinstance(dtype, np.dtype) else "O"
+        if kind not in "iufb":
+            for position in positions:
+                lengths[position] = _max_text_length(pd.Index(df.iloc[rows, position]))
+            continue
+        # Tables are usually a single int or float block: no column selection then
+        block = df.to_numpy() if len(blocks) == 1 else df.iloc[:, positions].to_numpy()
+        if kind in "iu":
+            extremes = np.concatenate([block.min(axis=0), block.max(axis=0)]).astype(str)
+            lengths[positions] = np.char.str_len(extremes).reshape(2, -1).max(axis=0)
+        elif len(df) > DISTINCT_MIN_ROWS:
+            # Tall columns repeat values (0.0, rounded percentages): print each once
+            for position, column in zip(positions, block[rows].T):
+                lengths[position] = np.char.str_len(np.unique(column).astype(str)).max()
+        else:
+            lengths[positions] = np.char.str_len(block[rows].astype(str)).max(axis=0)
+    return lengths
+
+
+def _index_level_length(index: pd.Index, level: int, sample_rows: int) -> int:
+    if not isinstance(index, pd.MultiIndex):
+        return _max_text_length(index, sample_rows)
+    # Measure the labels used by the level once each instead of once per row
+    codes = np.asarray(index.codes[level])
+    used = np.unique(codes)
+    longest = _max_text_length(index.levels[level].take(used[used >= 0]))
+    if len(used) and used[0] < 0:
+        longest = max(longest, len("nan"))
+    return longest
+
+
+def column_widths(df: pd.DataFrame, sample_rows: int | None = None) -> List[float]:
+    """Column widths fitting the labels and values of df, like in the notebook.
+
+    Computed from the frame rather than the written sheet, so streaming
+    backends that cannot read cells back get the same widths. Named index
+    levels get their own columns, as in df.reset_index(). sample_rows bounds
+    the rows measured per column (defaults to AUTOFIT_SAMPLE_ROWS, 0 = all).
+    """
+    if sample_rows is None:
+        sample_rows = AUTOFIT_SAMPLE_ROWS
+    lengths = []
+    if df.index.names != [None]:
+        # Labels reset_index would give the index columns, without copying the rows
+        index_labels = df.iloc[:0, :0].reset_index().columns
+        for level, label in enumerate(index_labels):
+            lengths.append(max(_label_length(label), _index_level_length(df.index, level, sample_rows)))
+    value_lengths = _column_lengths(df, sample_rows)
+    for label, length in zip(df.columns, value_lengths.tolist()):
+        lengths.append(max(_label_length(label), length))
+    return [min(length + 2, MAX_COLUMN_WIDTH) for length in lengths]
+
+
+def _prepare_target(output_path: ExcelTarget) -> str:
+    """Create the parent directory of a path target; return a name for the logs."""
+    if isinstance(output_path, (str, Path)):
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        return str(output_path)
+    # Streams (e.g. an entry of a ZIP being written) need no directory
+    return getattr(output_path, "name", "<stream>")
+
+
+def _autofit(book, sheet_name: str, df: pd.DataFrame) -> None:
     try:
-        ws = writer.book[sheet_name]
-        df_reset = df.reset_index() if df.index.names != [None] else df
-        for idx, column in enumerate(df_reset.columns, start=1):
-            col_letter = get_column_letter(idx)
-            values = df_reset[column].astype(str).tolist()
-            max_len = max([len(str(column))] + [len(v) for v in values]) if values else len(str(column))
-            ws.column_dimensions[col_letter].width = min(max_len + 2, 60)
+        book.set_column_widths(sheet_name, column_widths(df))
     except Exception:
         logger.debug("Autofit failed for sheet %s", sheet_name, exc_info=True)
 
 
-def save_to_excel_multisheet(sheets_dict: Dict[str, pd.DataFrame], output_path: Path) -> None:
-    logger.info("Saving Excel (multi-sheet): %s", output_path)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+def save_to_excel_multisheet(
+    sheets_dict: Dict[str, pd.DataFrame],
+    output_path: ExcelTarget,
+    backend: str | None = None,
+) -> None:
+    logger.info("Saving Excel (multi-sheet): %s", _prepare_target(output_path))
+    with open_excel_book(output_path, backend or EXCEL_BACKEND) as book:
         for raw_name, df in sheets_dict.items():
             name = safe_sheet_name(raw_name)
-            df.to_excel(writer, sheet_name=name)
-            _autofit_openpyxl_sheet(writer, name, df)
+            book.write_frame(name, df)
+            _autofit(book, name, df)
 
 
 def save_to_excel_singlesheet(
     sheets_dict: Dict[str, pd.DataFrame],
-    output_path: Path,
+    output_path: ExcelTarget,
     sheet_name: str = "Combined",
+    backend: str | None = None,
 ) -> None:
     """Write all DataFrames from sheets_dict into a single worksheet.
 
     All DataFrames are concatenated vertically with an added top-level index that
     keeps track of their original sheet names. Columns are aligned automatically
     (missing values filled with zero) to ensure consistent structure.
+    backend: "openpyxl" or "xlsxwriter" (streaming); defaults to EXCEL_BACKEND.
+    output_path may be a path or a writable binary stream.
     """
-    logger.info("Saving Excel (single-sheet combined): %s", output_path)
     if not sheets_dict:
         logger.warning("No sheets to write for single-sheet export: %s", output_path)
         return
+    logger.info("Saving Excel (single-sheet combined): %s", _prepare_target(output_path))
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
     sanitized_sheet = safe_sheet_name(sheet_name)
     sanitized_keys = []
     frames = []
@@ -77,35 +183,40 @@ def save_to_excel_singlesheet(
         .fillna(0)
     )
 
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-        combined.to_excel(writer, sheet_name=sanitized_sheet)
-        _autofit_openpyxl_sheet(writer, sanitized_sheet, combined)
+    with open_excel_book(output_path, backend or EXCEL_BACKEND) as book:
+        book.write_frame(sanitized_sheet, combined)
+        _autofit(book, sanitized_sheet, combined)
 
 
 def save_to_excel_single_report(
-    sheets_dict: Dict[str, pd.DataFrame], output_path: Path, sheet_name: str = "Global"
+    sheets_dict: Dict[str, pd.DataFrame],
+    output_path: ExcelTarget,
+    sheet_name: str = "Global",
+    backend: str | None = None,
 ) -> None:
-    """Write all DataFrames into one sheet using openpyxl engine.
+    """Write all DataFrames into one sheet, blocks one below the other.
     
     Uses simple title rows and the same column auto-fit logic as the notebook.
     """
-    logger.info("Saving Excel (single-sheet): %s", output_path)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+    logger.info("Saving Excel (single-sheet): %s", _prepare_target(output_path))
+    with open_excel_book(output_path, backend or EXCEL_BACKEND) as book:
         ws_name = safe_sheet_name(sheet_name)
-        # Create sheet and register
-        ws = writer.book.create_sheet(ws_name)
-        writer.sheets[ws_name] = ws
-        row_cursor = 1  # openpyxl is 1-based for cell addressing, pandas uses 0-based startrow
+        row_cursor = 0
+        widths: List[float] = []
         for title, df in sheets_dict.items():
             # Write title (plain text to match minimal notebook style)
-            ws.cell(row=row_cursor, column=1, value=str(title))
+            book.write_title(ws_name, row_cursor, str(title))
             row_cursor += 1
-            # Write the DataFrame starting at row_cursor-1 for pandas startrow
-            df_to_write = df.copy()
-            df_to_write.to_excel(writer, sheet_name=ws_name, startrow=row_cursor - 1, index=True)
-            # Auto-fit columns for current written block
-            _autofit_openpyxl_sheet(writer, ws_name, df_to_write)
-            row_cursor += len(df_to_write.index) + 4  # space between tables
+            end = book.write_frame(ws_name, df, startrow=row_cursor)
+            # Later blocks set the width of the columns they span, as if each
+            # block were auto-fitted in turn; the sheet is sized once at the end
+            try:
+                block_widths = column_widths(df)
+                widths[:len(block_widths)] = block_widths
+            except Exception:
+                logger.debug("Autofit failed for a block of sheet %s", ws_name, exc_info=True)
+            # Space between tables; deep column headers must not run into the next title
+            row_cursor = max(row_cursor + len(df.index) + 4, end + 1)
+        book.set_column_widths(ws_name, widths)
 
 
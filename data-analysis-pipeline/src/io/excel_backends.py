@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+
+logger = logging.getLogger(__name__)
+
+# Where a workbook is written: a path, or a writable binary stream (e.g. a ZIP entry)
+ExcelTarget = Union[Path, str, BinaryIO]
+
+# Rows converted to Python values at a time by the streaming writer
+STREAM_BLOCK_ROWS: int = 1024
+
+# Same defaults as pandas.ExcelWriter
+DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+DATE_FORMAT = "YYYY-MM-DD"
+
+
+def frame_height(df: pd.DataFrame) -> int:
+    """Rows DataFrame.to_excel uses for df: header rows (plus index names under MultiIndex columns) and data."""
+    header_rows = df.columns.nlevels + 1 if isinstance(df.columns, pd.MultiIndex) else 1
+    return header_rows + len(df)
+
+
+class OpenpyxlBook:
+    """pandas' openpyxl writer: the whole workbook is built in memory, then saved."""
+
+    def __init__(self, output_path: ExcelTarget) -> None:
+        self._writer = pd.ExcelWriter(output_path, engine="openpyxl")
+
+    def _sheet(self, sheet_name: str):
+        book = self._writer.book
+        return book[sheet_name] if sheet_name in book.sheetnames else book.create_sheet(sheet_name)
+
+    def write_title(self, sheet_name: str, row: int, text: str) -> None:
+        self._sheet(sheet_name).cell(row=row + 1, column=1, value=text)
+
+    def write_frame(self, sheet_name: str, df: pd.DataFrame, startrow: int = 0) -> int:
+        """Write df from startrow like DataFrame.to_excel; returns the next free row."""
+        df.to_excel(self._writer, sheet_name=sheet_name, startrow=startrow)
+        return startrow + frame_height(df)
+
+    def set_column_widths(self, sheet_name: str, widths: Sequence[float]) -> None:
+        ws = self._sheet(sheet_name)
+        for idx, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(idx)].width = width
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self) -> OpenpyxlBook:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _cell_value(value):
+    """A Python value xlsxwriter can write, with pandas' conventions for NaN and inf."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (not isinstance(value, str) and pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and np.isinf(value):
+        return "inf" if value > 0 else "-inf"
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, (str, bool, int, float, dt.date, dt.time)):
+        return value
+    return str(value)
+
+
+def _column_values(series: pd.Series) -> list:
+    if series.dtype.kind in "iub":
+        return series.tolist()
+    if series.dtype.kind == "f":
+        values = series.to_numpy()
+        if np.isfinite(values).all():
+            return values.tolist()
+    return [_cell_value(v) for v in series.tolist()]
+
+
+def _spans(index: pd.Index) -> List[np.ndarray]:
+    """Per level, the length of the merged label block starting at each position (0 inside one).
+
+    Mirrors pandas' merge_cells layout: a block continues while the labels of
+    this level and every outer level repeat; the innermost level is never merged.
+    """
+    n = len(index)
+    if not isinstance(index, pd.MultiIndex):
+        return [np.ones(n, dtype=np.int64)]
+    spans = []
+    starts = np.zeros(n, dtype=bool)
+    starts[:1] = True
+    for level, codes in enumerate(index.codes):
+        codes = np.asarray(codes)
+        starts[1:] |= codes[1:] != codes[:-1]
+        level_starts = starts if level < index.nlevels - 1 else np.ones(n, dtype=bool)
+        positions = np.flatnonzero(level_starts)
+        lengths = np.zeros(n, dtype=np.int64)
+        lengths[positions] = np.diff(np.append(positions, n))
+        spans.append(lengths)
+    return spans
+
+
+class XlsxwriterStreamingBook:
+    """xlsxwriter in constant_memory mode: every row is flushed to disk once written.
+
+    Cells are laid out like DataFrame.to_excel (header rows, merged index and
+    column labels, header style), but produced row by row, since a flushed row
+    cannot be revisited. Sheets must therefore be written top to bottom, one
+    at a time, and column widths cannot be measured from the written cells.
+    """
+
+    def __init__(self, output_path: ExcelTarget) -> None:
+        import xlsxwriter
+
+        target = str(output_path) if isinstance(output_path, Path) else output_path
+        self._book = xlsxwriter.Workbook(target, {"constant_memory": True})
+        self._sheets: Dict[str, object] = {}
+        self._formats: Dict[Tuple[bool, str | None], object] = {}
+
+    def _sheet(self, sheet_name: str):
+        if sheet_name not in self._sheets:
+            self._sheets[sheet_name] = self._book.add_worksheet(sheet_name)
+        return self._sheets[sheet_name]
+
+    def _format(self, value, header: bool):
+        if isinstance(value, dt.datetime):
+            num_format = DATETIME_FORMAT
+        elif isinstance(value, dt.date):
+            num_format = DATE_FORMAT
+        else:
+            num_format = None
+        if not header and num_format is None:
+            return None
+        key = (header, num_format)
+        if key not in self._formats:
+            properties = {"bold": True, "border": 1, "align": "center", "valign": "top"} if header else {}
+            if num_format is not None:
+                properties["num_format"] = num_format
+            self._formats[key] = self._book.add_format(properties)
+        return self._formats[key]
+
+    def _write(self, ws, row: int, col: int, value, header: bool = False) -> None:
+        value = _cell_value(value)
+        ws.write(row, col, "" if header and value is None else value, self._format(value, header))
+
+    def write_title(self, sheet_name: str, row: int, text: str) -> None:
+        self._sheet(sheet_name).write_string(row, 0, str(text))
+
+    def write_frame(self, sheet_name: str, df: pd.DataFrame, startrow: int = 0) -> int:
+        """Write df from startrow like DataFrame.to_excel; returns the next free row."""
+        ws = self._sheet(sheet_name)
+        columns, index = df.columns, df.index
+        n_index = index.nlevels
+        row = startrow
+
+        # Header: one row per column level, spans of repeated labels merged
+        if isinstance(columns, pd.MultiIndex):
+            col_offset = n_index - 1
+            for level, lengths in enumerate(_spans(columns)):
+                self._write(ws, row, col_offset, columns.names[level], header=True)
+                labels = columns.get_level_values(level)
+                for i in np.flatnonzero(lengths):
+                    col = col_offset + i + 1
+                    if lengths[i] > 1:
+                        value = _cell_value(labels[i])
+                        ws.merge_range(row, col, row, col + lengths[i] - 1, value, self._format(value, True))
+                    else:
+                        self._write(ws, row, col, labels[i], header=True)
+                row += 1
+            # MultiIndex columns get an extra row holding the index names
+        else:
+            for j, label in enumerate(columns):
+                self._write(ws, row, n_index + j, label, header=True)
+
+        if isinstance(index, pd.MultiIndex):
+            if any(name is not None for name in index.names):
+                for level, name in enumerate(index.names):
+                    self._write(ws, row, level, name, header=True)
+        elif index.names[0]:
+            self._write(ws, row, 0, index.names[0], header=True)
+        row += 1
+
+        # Body: index labels (merged down the rows) then the values, row by row
+        spans = _spans(index)
+        labels = [index.get_level_values(level) for level in range(n_index)]
+        header_format = self._format(None, True)
+        for start in range(0, len(df), STREAM_BLOCK_ROWS):
+            block = df.iloc[start:start + STREAM_BLOCK_ROWS]
+            values = [_column_values(block.iloc[:, j]) for j in range(block.shape[1])]
+            for i, row_values in enumerate(zip(*values) if values else [()] * len(block)):
+                position = start + i
+                for level in range(n_index):
+                    span = spans[level][position]
+                    if span == 0:
+                        # Covered by the merged label above; keep the header style
+                        ws.write_blank(row, level, None, header_format)
+                        continue
+                    if span > 1:
+                        ws.merge_range(row, level, row + span - 1, level, None)
+                    self._write(ws, row, level, labels[level][position], header=True)
+                for j, value in enumerate(row_values):
+                    self._write(ws, row, n_index + j, value)
+                row += 1
+        return row
+
+    def set_column_widths(self, sheet_name: str, widths: Sequence[float]) -> None:
+        ws = self._sheet(sheet_name)
+        for idx, width in enumerate(widths):
+            ws.set_column(idx, idx, width)
+
+    def close(self) -> None:
+        self._book.close()
+
+    def __enter__(self) -> XlsxwriterStreamingBook:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_excel_book(output_path: ExcelTarget, backend: str = "openpyxl"):
+    """Open a workbook writer for output_path with the given backend (see src.utils.choices.EXCEL_BACKENDS).
+
+    output_path may also be a writable binary stream; it need not be seekable.
+    """
+    if backend == "xlsxwriter":
+        try:
+            return XlsxwriterStreamingBook(output_path)
+        except ImportError:
+            logger.warning("xlsxwriter is not installed; writing %s with openpyxl", output_path)
+            return OpenpyxlBook(output_path)
+    if backend == "openpyxl":
+        return OpenpyxlBook(output_path)
+    raise ValueError(f"Unknown Excel backend: {backend}")
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from src.utils.choices import REPORT_FORMATS
+from src.utils.labels import decode_index, decode_label, encode_index, encode_label
+
+
+logger = logging.getLogger(__name__)
+
+# A report store is a directory: manifest.json plus one Arrow IPC file per sheet
+REPORT_STORE_SUFFIX: str = ".report"
+MANIFEST_NAME: str = "manifest.json"
+# Bump when the layout changes; older stores are then rejected
+STORE_FORMAT_VERSION: int = 1
+STORE_FORMAT_NAME: str = "auto_report-store"
+
+
+def _encode_axis(axis: pd.Index) -> Dict[str, Any]:
+    """Labels of a (Multi)Index as levels + codes, so any level dtype survives."""
+    if isinstance(axis, pd.MultiIndex):
+        levels, codes = list(axis.levels), [np.asarray(c) for c in axis.codes]
+    else:
+        # Keep NaN labels in the level so a flat index decodes with its own dtype
+        level_codes, level = pd.factorize(axis, use_na_sentinel=False)
+        levels, codes = [level], [level_codes]
+    return {
+        "names": [encode_label(name) for name in axis.names],
+        "multi": isinstance(axis, pd.MultiIndex),
+        "levels": [encode_index(pd.Index(level)) for level in levels],
+        "codes": codes,
+    }
+
+
+def _decode_axis(spec: Dict[str, Any], codes: List[np.ndarray]) -> pd.Index:
+    levels = [decode_index(level) for level in spec["levels"]]
+    names = [decode_label(name) for name in spec["names"]]
+    if not spec["multi"]:
+        return levels[0].take(np.asarray(codes[0], dtype=np.intp)).rename(names[0])
+    return pd.MultiIndex(levels=levels, codes=codes, names=names, verify_integrity=False)
+
+
+def _sheet_table(df: pd.DataFrame):
+    import pyarrow as pa
+
+    arrays, names = [], []
+    for level, codes in enumerate(_encode_axis(df.index)["codes"]):
+        arrays.append(pa.array(np.asarray(codes, dtype=np.int32)))
+        names.append(f"i{level}")
+    for j in range(df.shape[1]):
+        # NaN stays a float NaN (not an Arrow null) so values round-trip bit for bit
+        arrays.append(pa.array(df.iloc[:, j].to_numpy()))
+        names.append(f"c{j}")
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def save_report_store(sheets_dict: Dict[str, pd.DataFrame], path: Path) -> Path:
+    """Write sheets_dict as a report store directory at path.
+
+    Every sheet is one uncompressed Arrow IPC file that readers can memory-map;
+    the manifest keeps sheet order and the index / column labels with their
+    types, so MultiIndex rows and columns come back exactly. Nothing is pickled.
+    """
+    import pyarrow as pa
+
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    sheets = []
+    for i, (name, df) in enumerate(sheets_dict.items()):
+        file_name = f"{i:04d}.arrow"
+        table = _sheet_table(df)
+        with pa.OSFile(str(tmp_path / file_name), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        index = _encode_axis(df.index)
+        columns = _encode_axis(df.columns)
+        columns["codes"] = [codes.tolist() for codes in columns["codes"]]
+        sheets.append({
+            "name": name,
+            "file": file_name,
+            "rows": len(df),
+            "index": {key: value for key, value in index.items() if key != "codes"},
+            "columns": columns,
+        })
+    manifest = {"format": STORE_FORMAT_NAME, "version": STORE_FORMAT_VERSION, "sheets": sheets}
+    with open(tmp_path / MANIFEST_NAME, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, ensure_ascii=False)
+
+    # Swap the finished directory in; readers never see a half-written store
+    if path.exists():
+        old_path = path.with_name(f"{path.name}.old")
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(tmp_path, path)
+    return path
+
+
+class ReportStore(Mapping):
+    """Read-only, lazy view of a report store: sheets are opened on access.
+
+    Behaves like the Dict[str, pd.DataFrame] it was written from, but only the
+    manifest is read up front and each sheet file is memory-mapped when asked for.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with open(self.path / MANIFEST_NAME, encoding="utf-8") as handle:
+            manifest = json.load(handle)
+        if manifest.get("format") != STORE_FORMAT_NAME or manifest.get("version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported report store: {self.path}")
+        self._sheets = {sheet["name"]: sheet for sheet in manifest["sheets"]}
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        import pyarrow as pa
+
+        spec = self._sheets[name]
+        with pa.memory_map(str(self.path / spec["file"])) as source:
+            table = pa.ipc.open_file(source).read_all()
+        n_index = len(spec["index"]["levels"])
+        index_codes = [table.column(f"i{level}").to_numpy() for level in range(n_index)]
+        values = {j: table.column(f"c{j}").to_numpy() for j in range(table.num_columns - n_index)}
+        df = pd.DataFrame(values, index=_decode_axis(spec["index"], index_codes))
+        df.columns = _decode_axis(spec["columns"], spec["columns"]["codes"])
+        return df
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sheets)
+
+    def __len__(self) -> int:
+        return len(self._sheets)
+
+
+def report_path(output_xlsx: Path, report_format: str = "arrow") -> Path:
+    """Where the machine-readable copy of output_xlsx goes for report_format (see REPORT_FORMATS)."""
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format: {report_format}")
+    if report_format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("pyarrow is not installed; saving %s as a pickle", output_xlsx.stem)
+        else:
+            return output_xlsx.with_suffix(REPORT_STORE_SUFFIX)
+    return output_xlsx.with_suffix(".pkl")
+
+
+def is_report_store(path: Path) -> bool:
+    return (Path(path) / MANIFEST_NAME).is_file()
+
+
+def open_report(path: Path) -> Mapping:
+    """Sheets of a saved report: a lazy ReportStore, or the dict of a legacy pickle."""
+    path = Path(path)
+    if is_report_store(path):
+        return ReportStore(path)
+    return pd.read_pickle(path)
+
+
+def save_report(sheets_dict: Dict[str, pd.DataFrame], path: Path) -> Path:
+    """Save sheets_dict as a report store, or as a pickle when path ends with .pkl."""
+    path = Path(path)
+    logger.info("Saving report: %s", path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".pkl":
+        pd.to_pickle(dict(sheets_dict), path)
+        return path
+    return save_report_store(dict(sheets_dict), path)
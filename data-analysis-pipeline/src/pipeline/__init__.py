@@ -0,0 +1,3 @@
+"""Pipeline orchestration subpackage."""
+
+
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Tuple
+
+import pandas as pd
+
+from src.processing.post_processing import aggregate_categories, convert_all_to_percentages
+from src.utils.instrumentation import stage
+
+
+logger = logging.getLogger(__name__)
+
+Sheets = Dict[str, pd.DataFrame]
+
+# Derived artifacts of one analysis kind: name -> (source artifact, step)
+ARTIFACT_STEPS: Dict[str, Tuple[str, Callable[[Sheets], Sheets]]] = {
+    "aggregated": ("counts", aggregate_categories),
+    "percent": ("counts", convert_all_to_percentages),
+    "aggregated_percent": ("aggregated", convert_all_to_percentages),
+}
+
+
+class ArtifactGraph:
+    """The counts -> aggregated -> percent chain of one analysis kind.
+
+    Artifacts are built on first access from their source and memoized, so an
+    artifact needed by several outputs is computed once. The post-processing
+    steps return new dicts, so the counts (and every artifact) stay as built.
+    """
+
+    def __init__(self, counts: Sheets) -> None:
+        self._artifacts: Dict[str, Sheets] = {"counts": counts}
+
+    def __getitem__(self, name: str) -> Sheets:
+        if name not in self._artifacts:
+            source, step = ARTIFACT_STEPS[name]
+            sheets = self[source]
+            with stage(f"post:{name}", sheets=len(sheets)):
+                self._artifacts[name] = step(sheets)
+        return self._artifacts[name]
+
+
+def output_artifacts(aggregate: bool, percent: bool) -> Dict[str, str]:
+    """Output suffix -> artifact written under it, for the --aggregate / --percent flags."""
+    outputs = {"counts": "counts"}
+    if aggregate:
+        outputs["aggregated"] = "aggregated"
+    if percent:
+        outputs["percent"] = "aggregated_percent" if aggregate else "percent"
+    return outputs
+
+
+def iter_output_sheets(counts: Sheets, aggregate: bool, percent: bool) -> Iterator[Tuple[str, Sheets]]:
+    """(output suffix, sheets) of every output the flags ask for, each artifact built once."""
+    graph = ArtifactGraph(counts)
+    for suffix, artifact in output_artifacts(aggregate, percent).items():
+        yield suffix, graph[artifact]
+
+
+def final_artifact(aggregate: bool, percent: bool) -> str:
+    """Artifact of the consolidated output: the last step the flags ask for."""
+    return list(output_artifacts(aggregate, percent).values())[-1]
+
+
+def _link_or_copy_file(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def unlink_alias(path: Path) -> None:
+    """Remove path if it is a hard link left by a previous run, so rewriting it cannot change its alias."""
+    if path.is_file() and path.stat().st_nlink > 1:
+        path.unlink()
+
+
+def link_or_copy(source: Path, target: Path) -> Path:
+    """Make target an alias of the already written source: hard links, or copies.
+
+    Directories (report stores) are recreated with their files linked.
+    """
+    if target.is_dir():
+        shutil.rmtree(target)
+    elif target.exists():
+        target.unlink()
+    if source.is_dir():
+        shutil.copytree(source, target, copy_function=_link_or_copy_file)
+    else:
+        _link_or_copy_file(source, target)
+    logger.info("Linked %s -> %s", target, source)
+    return target
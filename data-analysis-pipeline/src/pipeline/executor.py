@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+from config.settings import SUMMARY_COLUMNS
+from src.analysis.cube import CountCube, build_count_cube
+from src.analysis.remuneration import SalaryCube
+from src.pipeline.steps import branch_partitions_for, run_analysis, save_all_steps
+from src.utils.instrumentation import RunRecorder, current_recorder, recording, stage
+
+
+logger = logging.getLogger(__name__)
+
+# Prepared frame, branch partitions, count cube, salary aggregates and
+# precomputed count sheets of the current run. Set in the parent before the pool
+# starts so forked workers inherit them copy-on-write; spawned workers receive
+# the frame, any given cubes and counts once through the pool initializer instead.
+_SHARED: Dict[str, Any] = {}
+
+
+def _share(
+    df: pd.DataFrame | None,
+    kinds: List[str],
+    cube: CountCube | None = None,
+    salaries: SalaryCube | None = None,
+    counts: Dict[str, Dict[str, pd.DataFrame]] | None = None,
+) -> None:
+    counts = counts or {}
+    # Kinds whose count sheets still have to be computed
+    pending = [kind for kind in kinds if kind not in counts]
+    _SHARED["df"] = df
+    _SHARED["counts"] = counts
+    with stage("partitions"):
+        _SHARED["partitions"] = branch_partitions_for(pending, df) if salaries is None else None
+    if cube is None and pending:
+        with stage("count_cube", rows=len(df)):
+            cube = build_count_cube(df, SUMMARY_COLUMNS)
+    _SHARED["cube"] = cube
+    _SHARED["salaries"] = salaries
+
+
+def _init_worker(shared: tuple | None, kinds: List[str]) -> None:
+    """Pool initializer: with fork the data is already there, otherwise build it once."""
+    if shared is not None:
+        df, cube, salaries, counts = shared
+        _share(df, kinds, cube, salaries, counts)
+
+
+def _run_kind(
+    kind: str,
+    base: Path,
+    analysis: str,
+    aggregate: bool,
+    percent: bool,
+    write_pickle: bool,
+    salary_stats: bool,
+    excel_backend: str | None,
+    report_format: str | None,
+) -> List[Path]:
+    with stage(f"kind:{kind}"):
+        if kind in _SHARED["counts"]:
+            sheets_counts = _SHARED["counts"][kind]
+        else:
+            logger.info("Running %s analysis", kind)
+            with stage(f"analysis:{kind}") as record:
+                sheets_counts = run_analysis(
+                    kind,
+                    _SHARED["df"],
+                    _SHARED["partitions"],
+                    _SHARED["cube"],
+                    salary_stats,
+                    _SHARED["salaries"],
+                )
+                record["sheets"] = len(sheets_counts)
+        return save_all_steps(
+            kind,
+            base,
+            sheets_counts,
+            analysis,
+            aggregate=aggregate,
+            percent=percent,
+            write_pickle=write_pickle,
+            excel_backend=excel_backend,
+            report_format=report_format,
+        )
+
+
+def _run_kind_recorded(recorder_options: Dict[str, Any], *args: Any) -> Tuple[List[Path], List[Dict[str, Any]]]:
+    """_run_kind in a pool worker, returning its stages for the parent's run manifest."""
+    recorder = RunRecorder(**recorder_options)
+    with recording(recorder):
+        written = _run_kind(*args)
+    return written, recorder.stages
+
+
+def run_kinds(
+    kinds: List[str],
+    df: pd.DataFrame | None,
+    base: Path,
+    analysis: str,
+    workers: int = 1,
+    aggregate: bool = False,
+    percent: bool = False,
+    write_pickle: bool = True,
+    salary_stats: bool = False,
+    cube: CountCube | None = None,
+    salaries: SalaryCube | None = None,
+    excel_backend: str | None = None,
+    report_format: str | None = None,
+    counts: Dict[str, Dict[str, pd.DataFrame]] | None = None,
+) -> Dict[str, List[Path]]:
+    """Run each analysis kind and write its workbooks, on up to workers processes.
+
+    Every task computes one kind and writes its counts / aggregated / percent
+    outputs, so both the analyses and the Excel writes run concurrently. The
+    prepared frame is not pickled per task: on platforms with fork it is
+    inherited by the workers, elsewhere it is sent once per worker. With
+    workers <= 1 or a single kind everything runs in this process.
+
+    cube and salaries replace the cube built from df; with both (e.g. from
+    merged partial aggregates) no rows are needed and df may be None.
+    excel_backend selects the workbook writer (defaults to EXCEL_BACKEND) and
+    report_format the machine-readable copies (defaults to REPORT_FORMAT).
+    counts holds count sheets already computed per kind (e.g. cached by the
+    app): those kinds are only written, and with every kind given df is unused.
+    """
+    workers = max(1, min(workers, len(kinds)))
+    written: Dict[str, List[Path]] = {}
+    if workers == 1:
+        _share(df, kinds, cube, salaries, counts)
+        try:
+            for kind in kinds:
+                written[kind] = _run_kind(
+                    kind, base, analysis, aggregate, percent, write_pickle, salary_stats, excel_backend, report_format
+                )
+        finally:
+            _SHARED.clear()
+        return written
+
+    use_fork = "fork" in mp.get_all_start_methods()
+    context = mp.get_context("fork" if use_fork else None)
+    if use_fork:
+        _share(df, kinds, cube, salaries, counts)
+    logger.info("Running %d analyses on %d worker processes", len(kinds), workers)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(None if use_fork else (df, cube, salaries, counts), kinds),
+        ) as pool:
+            # Workers record their own stages when this run is instrumented
+            recorder = current_recorder()
+            task = (_run_kind_recorded, recorder.options()) if recorder is not None else (_run_kind,)
+            futures = {
+                kind: pool.submit(
+                    *task,
+                    kind,
+                    base,
+                    analysis,
+                    aggregate,
+                    percent,
+                    write_pickle,
+                    salary_stats,
+                    excel_backend,
+                    report_format,
+                )
+                for kind in kinds
+            }
+            for kind in kinds:
+                if recorder is not None:
+                    written[kind], records = futures[kind].result()
+                    recorder.extend(records)
+                else:
+                    written[kind] = futures[kind].result()
+    finally:
+        _SHARED.clear()
+    return written
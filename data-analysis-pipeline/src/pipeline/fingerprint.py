@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from config import settings
+from src.utils.digest import file_digest
+
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate every recorded fingerprint
+FINGERPRINT_VERSION: int = 1
+FINGERPRINT_SUFFIX: str = ".fingerprint.json"
+# Settings that change how a run executes, not what it writes (or that only the app reads)
+IGNORED_SETTINGS = frozenset(
+    {
+        "ANALYSIS_WORKERS",
+        "APP_CACHE_ENTRIES",
+        "APP_JOB_WORKERS",
+        "APP_JOB_TTL_SECONDS",
+        "BATCH_WORKERS",
+        "CACHE_MAX_ENTRIES",
+        "WATCH_POLL_SECONDS",
+        "WATCH_SETTLE_SECONDS",
+        "USE_DATA_CACHE",
+        "CACHE_DIR",
+        "RUN_MANIFEST",
+    }
+)
+SOURCE_ROOT = Path(__file__).resolve().parents[2]
+
+
+def settings_snapshot() -> Dict[str, Any]:
+    """The upper-case values of config.settings, as JSON-safe data."""
+    return {
+        name: json.loads(json.dumps(value, default=str))
+        for name, value in sorted(vars(settings).items())
+        if name.isupper() and name not in IGNORED_SETTINGS
+    }
+
+
+def code_digest() -> str:
+    """SHA-256 over the pipeline's Python sources, so code changes rerun the reports."""
+    digest = hashlib.sha256()
+    for path in sorted([SOURCE_ROOT / "main.py", *(SOURCE_ROOT / "src").rglob("*.py")]):
+        digest.update(str(path.relative_to(SOURCE_ROOT)).encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def run_fingerprint(inputs: Iterable[Path], options: Dict[str, Any]) -> str:
+    """Fingerprint of a report run: input contents, settings, options and code."""
+    payload = {
+        "version": FINGERPRINT_VERSION,
+        "inputs": [file_digest(path) for path in inputs],
+        "settings": settings_snapshot(),
+        "options": options,
+        "code": code_digest(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def fingerprint_path(base: Path) -> Path:
+    return base.with_name(f"{base.name}{FINGERPRINT_SUFFIX}")
+
+
+def is_up_to_date(base: Path, fingerprint: str) -> bool:
+    """Whether the outputs at base were written by a run with this fingerprint and still exist."""
+    try:
+        with open(fingerprint_path(base), encoding="utf-8") as handle:
+            record = json.load(handle)
+    except (OSError, ValueError):
+        return False
+    if record.get("fingerprint") != fingerprint:
+        return False
+    return all((base.parent / name).exists() for name in record.get("outputs", []))
+
+
+def clear_fingerprint(base: Path) -> None:
+    """Forget the recorded fingerprint before the outputs at base are rewritten.
+
+    Otherwise a run that fails partway would leave the previous run's
+    fingerprint over half-rewritten outputs, and a later run with the previous
+    options would be skipped as up to date.
+    """
+    fingerprint_path(base).unlink(missing_ok=True)
+
+
+def record_fingerprint(base: Path, fingerprint: str, outputs: List[Path]) -> Path:
+    """Write the fingerprint and the outputs it covers next to them."""
+    path = fingerprint_path(base)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = {
+        "fingerprint": fingerprint,
+        "outputs": [os.path.relpath(output, base.parent) for output in outputs],
+    }
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(record, handle, indent=2)
+    os.replace(tmp_path, path)
+    return path
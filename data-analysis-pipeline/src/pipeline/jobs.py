@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("pending", "running", "done", "failed", "cancelled")
+# Finished jobs (and their results) a runner keeps per worker thread, newest first
+FINISHED_JOBS_PER_WORKER: int = 8
+
+
+class JobCancelled(Exception):
+    """Raised inside a job at its next stage once cancel() was called."""
+
+
+class Job:
+    """State of one background job, shared between its worker thread and the UI.
+
+    The job function calls step() as each stage begins; that is also where a
+    requested cancellation takes effect, so a stage in progress always
+    completes. Readers poll status, fraction and stage. Status changes go
+    through one lock, so a cancellation cannot race the job being started.
+    """
+
+    def __init__(self, total_stages: int) -> None:
+        self.id = uuid.uuid4().hex
+        self.total_stages = max(1, total_stages)
+        self.done_stages = 0
+        self.stage = ""
+        self.status = "pending"
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.finished_at: float | None = None
+        self._started = False
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def fraction(self) -> float:
+        return min(1.0, self.done_stages / self.total_stages)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def step(self, stage: str) -> None:
+        """Begin the next stage, counting the previous one as done.
+
+        Raises JobCancelled once cancel() was called.
+        """
+        with self._lock:
+            if self._cancel.is_set():
+                raise JobCancelled()
+            if self._started:
+                self.done_stages += 1
+            self._started = True
+            self.stage = stage
+
+    def _transition(self, expected: str, status: str) -> bool:
+        """Move from expected to status; False (and no change) if the job is elsewhere."""
+        with self._lock:
+            if self.status != expected:
+                return False
+            self.status = status
+            if self.finished:
+                self.finished_at = time.monotonic()
+            return True
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        self._transition("pending", "cancelled")
+
+
+class JobRunner:
+    """Local job queue on a thread pool: jobs of several users run side by side.
+
+    The analyses spend most of their time in NumPy / pandas, which release the
+    GIL, and the workbook writes interleave; a thread pool also lets the UI
+    read progress and request cancellation without any inter-process plumbing.
+
+    Finished jobs hold their results until discarded, or until they are older
+    than ttl_seconds or beyond the max_finished newest ones (by default
+    FINISHED_JOBS_PER_WORKER per worker): sessions that are closed never
+    discard theirs.
+    """
+
+    def __init__(self, max_workers: int = 2, ttl_seconds: float = 3600, max_finished: int | None = None) -> None:
+        max_workers = max(1, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.ttl_seconds = ttl_seconds
+        self.max_finished = max_finished if max_finished is not None else max_workers * FINISHED_JOBS_PER_WORKER
+
+    def _evict(self) -> None:
+        """Drop expired finished jobs, then the oldest beyond max_finished; call with the lock held."""
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished and job.finished_at is not None),
+            key=lambda job: job.finished_at,
+            reverse=True,
+        )
+        now = time.monotonic()
+        for rank, job in enumerate(finished):
+            if rank >= self.max_finished or now - job.finished_at > self.ttl_seconds:
+                del self._jobs[job.id]
+
+    def submit(self, func: Callable[..., Any], *args: Any, total_stages: int = 1, **kwargs: Any) -> Job:
+        """Queue func(job, *args, **kwargs); its return value becomes job.result."""
+        job = Job(total_stages)
+        with self._lock:
+            self._evict()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job: Job, func: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        # A job cancelled while queued is never started
+        if not job._transition("pending", "running"):
+            return
+        try:
+            result = func(job, *args, **kwargs)
+        except JobCancelled:
+            job._transition("running", "cancelled")
+            logger.info("Job %s cancelled during: %s", job.id, job.stage)
+            return
+        except Exception as exc:
+            job.error = exc
+            job._transition("running", "failed")
+            logger.exception("Job %s failed during: %s", job.id, job.stage)
+            return
+        job.result = result
+        job.done_stages = job.total_stages
+        job._transition("running", "done")
+
+    def get(self, job_id: str | None) -> Job | None:
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id) if job_id else None
+
+    def discard(self, job_id: str | None) -> None:
+        """Cancel the job if it still runs and drop it (and its result)."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None) if job_id else None
+        if job is not None and not job.finished:
+            job.cancel()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import logging
+import zipfile
+from pathlib import Path
+from typing import Callable, List
+
+import pandas as pd
+
+from config.settings import BRANCH_COL, REPORT_FORMAT, SUMMARY_COLUMNS
+from src.analysis.global_analysis import run_global_analysis
+from src.analysis.global_status_analysis import run_global_status_analysis
+from src.analysis.branch_analysis import run_branch_analysis
+from src.analysis.branch_status_analysis import run_branch_status_analysis
+from src.analysis.filiere_analysis import run_filiere_analysis
+from src.analysis.cube import CountCube
+from src.analysis.partitions import build_partitions
+from src.analysis.remuneration import SalaryCube
+from src.processing.post_processing import aggregate_categories, convert_all_to_percentages
+from src.io.data_writer import save_to_excel_singlesheet
+from src.io.report_store import report_path, save_report
+from src.utils.instrumentation import stage
+from src.pipeline.artifacts import (
+    ArtifactGraph,
+    final_artifact,
+    iter_output_sheets,
+    link_or_copy,
+    output_artifacts,
+    unlink_alias,
+)
+
+
+logger = logging.getLogger(__name__)
+
+BRANCH_KINDS = ("branch", "branch_status", "filiere")
+
+
+def maybe_post_process(sheets: dict[str, pd.DataFrame], do_agg: bool, to_percent: bool) -> dict[str, pd.DataFrame]:
+    if do_agg:
+        sheets = aggregate_categories(sheets)
+    if to_percent:
+        sheets = convert_all_to_percentages(sheets)
+    return sheets
+
+
+def run_analysis(
+    kind: str,
+    df: pd.DataFrame | None,
+    partitions: dict[str, pd.DataFrame] | None = None,
+    cube: CountCube | None = None,
+    salary_stats: bool = False,
+    salaries: SalaryCube | None = None,
+) -> dict[str, pd.DataFrame]:
+    """Run one analysis kind; with cube and salaries (e.g. from partials) df may be None."""
+    if kind == "global":
+        return run_global_analysis(df, SUMMARY_COLUMNS, cube=cube, salary_stats=salary_stats, salaries=salaries)
+    if kind == "global_status":
+        return run_global_status_analysis(df, SUMMARY_COLUMNS, cube=cube, salary_stats=salary_stats, salaries=salaries)
+    if kind == "branch":
+        return run_branch_analysis(df, SUMMARY_COLUMNS, partitions=partitions, cube=cube, salary_stats=salary_stats, salaries=salaries)
+    if kind == "branch_status":
+        return run_branch_status_analysis(df, SUMMARY_COLUMNS, partitions=partitions, cube=cube, salary_stats=salary_stats, salaries=salaries)
+    if kind == "filiere":
+        return run_filiere_analysis(df, SUMMARY_COLUMNS, partitions=partitions, cube=cube, salary_stats=salary_stats, salaries=salaries)
+    raise ValueError(f"Unknown analysis kind: {kind}")
+
+
+def branch_partitions_for(kinds: list[str], df: pd.DataFrame | None) -> dict[str, pd.DataFrame] | None:
+    """Build the branch partition once when several branch-level analyses share it."""
+    if df is None or BRANCH_COL not in df.columns or not any(kind in BRANCH_KINDS for kind in kinds):
+        return None
+    return build_partitions(df, BRANCH_COL)
+
+
+def save_all_steps(
+    kind: str,
+    base: Path,
+    sheets_counts: dict[str, pd.DataFrame],
+    analysis: str,
+    aggregate: bool = False,
+    percent: bool = False,
+    write_pickle: bool = True,
+    excel_backend: str | None = None,
+    report_format: str | None = None,
+) -> List[Path]:
+    """Write the counts / aggregated / percent outputs of one analysis kind.
+
+    analysis is the --analysis choice: with "all", outputs get a per-kind suffix
+    and the consolidated file at base is not written. excel_backend selects the
+    workbook writer (defaults to EXCEL_BACKEND). With write_pickle, every
+    workbook also gets a machine-readable copy in report_format (defaults to
+    REPORT_FORMAT): a .report store directory, or a .pkl file. Returns the
+    written paths.
+
+    Each artifact is computed once (see ArtifactGraph) and written once; the
+    consolidated output repeats an artifact already written under a suffix, so
+    its files are hard links (or copies) of those.
+    """
+    written: List[Path] = []
+    report_format = report_format or REPORT_FORMAT
+    graph = ArtifactGraph(sheets_counts)
+    # Artifact -> files it was written to
+    saved: dict[str, List[Path]] = {}
+
+    def _save(artifact: str, out_xlsx: Path) -> None:
+        targets = [out_xlsx]
+        if write_pickle:
+            targets.append(report_path(out_xlsx, report_format))
+        if artifact in saved:
+            with stage(f"link:{out_xlsx.name}"):
+                for source, target in zip(saved[artifact], targets):
+                    link_or_copy(source, target)
+        else:
+            sheets = graph[artifact]
+            # Both the workbook and a .pkl copy are rewritten in place (report
+            # stores are not: they are renamed into place)
+            for target in targets:
+                unlink_alias(target)
+            with stage(f"write:{out_xlsx.name}", sheets=len(sheets)):
+                save_to_excel_singlesheet(sheets, out_xlsx, backend=excel_backend)
+            if write_pickle:
+                with stage(f"write:{targets[1].name}", sheets=len(sheets)):
+                    save_report(sheets, targets[1])
+            saved[artifact] = targets
+        written.extend(targets)
+
+    # Base name per kind
+    base_for_kind = base if analysis != "all" else base.with_name(f"{base.name}_{kind}")
+
+    # Counts (TCD only numbers), then the optional aggregated and percent steps
+    for suffix, artifact in output_artifacts(aggregate, percent).items():
+        _save(artifact, base_for_kind.with_name(f"{base_for_kind.name}_{suffix}").with_suffix(".xlsx"))
+
+    # Final consolidated (keep existing behavior for the main output path without suffix)
+    # Only produce if not running 'all' to avoid duplication
+    if analysis != "all":
+        _save(final_artifact(aggregate, percent), base.with_suffix(".xlsx"))
+
+    return written
+
+
+def save_all_steps_to_zip(
+    zip_file: zipfile.ZipFile,
+    kind: str,
+    sheets_counts: dict[str, pd.DataFrame],
+    aggregate: bool = False,
+    percent: bool = False,
+    excel_backend: str | None = None,
+    prefix: str = "report",
+    on_entry: Callable[[str], None] | None = None,
+) -> List[str]:
+    """Stream the counts / aggregated / percent workbooks of one kind into zip_file.
+
+    Entries are named <prefix>_<kind>_<step>.xlsx, as save_all_steps names them
+    with "all". Each workbook is written straight into its ZIP entry: no file
+    touches the disk and no workbook is buffered on its own. on_entry is called
+    with each entry name before it is written (e.g. to report progress).
+    Returns the entry names.
+    """
+    names: List[str] = []
+    for suffix, sheets in iter_output_sheets(sheets_counts, aggregate, percent):
+        name = f"{prefix}_{kind}_{suffix}.xlsx"
+        if on_entry is not None:
+            on_entry(name)
+        # Entry sizes are unknown until written; allow them to exceed 2 GiB
+        with stage(f"write:{name}", sheets=len(sheets)), zip_file.open(name, "w", force_zip64=True) as entry:
+            save_to_excel_singlesheet(sheets, entry, backend=excel_backend)
+        names.append(name)
+    return names
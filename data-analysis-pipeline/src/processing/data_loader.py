@@ -1,40 +1,239 @@
+import hashlib
 import logging
+import os
 import re
+import time
+import uuid
 from pathlib import Path
-from typing import Iterable
+from typing import BinaryIO, Iterable, Iterator, Union
 
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
 
 from config.settings import (
+    CACHE_DIR,
+    CACHE_MAX_ENTRIES,
+    CATEGORICAL_COLUMNS,
     DATA_DIR,
     INPUT_FILE_NAME,
+    USE_DATA_CACHE,
     YEAR_COL,
     YEAR_INTERVAL,
 )
+from src.utils.digest import file_digest
+from src.utils.instrumentation import stage
 
 
 logger = logging.getLogger(__name__)
 
+# Leading numbering like '1) ', '12 - ' in raw survey headers
+COLUMN_PREFIX_PATTERN: str = r"^\s*\d+\s*[\).:-]?\s*"
+# Bump when the cached frame layout changes so stale entries are ignored
+CACHE_VERSION: int = 1
+CACHE_SUFFIXES = (".parquet", ".pkl")
+# Temp files of interrupted cache writes older than this are removed when pruning
+STALE_TMP_SECONDS: int = 3600
 
-def load_data(file_path: Path) -> pd.DataFrame:
+# An input workbook: a path, or a seekable binary stream such as an in-memory upload
+DataSource = Union[Path, BinaryIO]
+
+
+def _rewind(source: DataSource) -> DataSource:
+    """Streams are read several times (digest, header, rows): start each read at 0."""
+    if not isinstance(source, (str, Path)):
+        source.seek(0)
+    return source
+
+
+def load_data(file_path: DataSource, usecols: list[int] | None = None) -> pd.DataFrame:
     logger.info("Loading Excel: %s", file_path)
-    return pd.read_excel(file_path)
+    return pd.read_excel(_rewind(file_path), usecols=usecols)
+
+
+def clean_column_name(name: str) -> str:
+    """Strip a numeric prefix and surrounding whitespace from one column name."""
+    if not isinstance(name, str):
+        return name
+    # Remove leading digits and spaces like '1) ', '12 - '
+    name = re.sub(COLUMN_PREFIX_PATTERN, "", name)
+    return name.strip()
 
 
 def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
     """Strip numeric prefixes and surrounding whitespace from column names."""
-    def _clean(name: str) -> str:
-        if not isinstance(name, str):
-            return name
-        # Remove leading digits and spaces like '1) ', '12 - '
-        name = re.sub(r"^\s*\d+\s*[\).:-]?\s*", "", name)
-        return name.strip()
-
     df = df.copy()
-    df.columns = [_clean(col) for col in df.columns]
+    df.columns = [clean_column_name(col) for col in df.columns]
+    return df
+
+
+def read_header(file_path: DataSource) -> list:
+    """Return the raw column names of the first sheet without reading its rows."""
+    return pd.read_excel(_rewind(file_path), nrows=0).columns.tolist()
+
+
+def resolve_usecols(raw_columns: list, required: Iterable[str]) -> list[int]:
+    """Positions of the raw columns whose cleaned name is one of required."""
+    wanted = set(required)
+    positions = [i for i, raw in enumerate(raw_columns) if clean_column_name(raw) in wanted]
+    found = {clean_column_name(raw_columns[i]) for i in positions}
+    missing = [col for col in wanted if col not in found]
+    if missing:
+        logger.debug("Projected columns not found in input: %s", sorted(missing))
+    return positions
+
+
+def _convert_value(value):
+    """Mirror pandas' openpyxl cell conversion for read-only worksheet values."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        as_int = int(value)
+        return as_int if as_int == value else value
+    if isinstance(value, str) and value in ERROR_CODES:
+        return np.nan
+    return value
+
+
+def _numeric_year(value) -> float | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _iter_sheet_rows(workbook) -> Iterator[tuple]:
+    sheet = workbook.worksheets[0]
+    sheet.reset_dimensions()
+    return sheet.iter_rows(values_only=True)
+
+
+def _read_sheet_header(
+    rows: Iterator[tuple], columns: Iterable[str] | None = None
+) -> tuple[list | None, list[int]]:
+    """Consume the header row; return it converted and the positions to read."""
+    header = next(rows, None)
+    if header is None:
+        return None, []
+    header = [_convert_value(value) for value in header]
+    while header and header[-1] == "":
+        header.pop()
+    if columns is not None:
+        return header, resolve_usecols(header, columns)
+    return header, list(range(len(header)))
+
+
+def load_data_streaming(
+    file_path: DataSource,
+    year_col: str,
+    interval: int,
+    columns: Iterable[str] | None = None,
+) -> pd.DataFrame:
+    """Read the first sheet row by row, keeping only rows in the year interval.
+
+    The interval is anchored on the running maximum year, so rows that fall
+    out of the window are dropped as soon as a more recent year is seen and
+    the buffer never grows beyond the rows of the final window. Values are
+    converted like read_excel and typed by the same parser, so the result
+    matches filter_by_year_interval(clean_column_names(load_data(...))) up to
+    the index labels, except that dtypes of other columns are inferred from
+    the kept rows only. Column names are returned raw (uncleaned).
+    """
+    logger.info("Streaming Excel: %s", file_path)
+    workbook = load_workbook(_rewind(file_path), read_only=True, data_only=True, keep_links=False)
+    try:
+        rows = _iter_sheet_rows(workbook)
+        header, positions = _read_sheet_header(rows, columns)
+        if header is None:
+            raise ValueError("No valid years found in the dataset")
+        cleaned = [clean_column_name(header[i]) for i in positions]
+        if year_col not in cleaned:
+            raise KeyError(f"Missing year column: {year_col}")
+        year_pos = positions[cleaned.index(year_col)]
+        last_pos = max(positions)
+
+        kept_rows: list[list] = [[header[i] for i in positions]]
+        kept_years: list[float] = [float("nan")]
+        max_year: float | None = None
+        missing_year = False
+        for values in rows:
+            year = _numeric_year(values[year_pos]) if len(values) > year_pos else None
+            if year is None:
+                missing_year = missing_year or any(value is not None for value in values)
+                continue
+            if max_year is None or year > max_year:
+                max_year = year
+                # A newer year moves the window: drop buffered rows that fell out of it
+                low = max_year - interval
+                keep = [i for i, y in enumerate(kept_years) if i == 0 or y >= low]
+                if len(keep) != len(kept_rows):
+                    kept_rows = [kept_rows[i] for i in keep]
+                    kept_years = [kept_years[i] for i in keep]
+            elif year < max_year - interval:
+                continue
+            if len(values) <= last_pos:
+                values = tuple(values) + (None,) * (last_pos + 1 - len(values))
+            kept_rows.append([_convert_value(values[i]) for i in positions])
+            kept_years.append(year)
+    finally:
+        workbook.close()
+
+    if max_year is None:
+        raise ValueError("No valid years found in the dataset")
+    logger.info("Streamed %d rows in the year window", len(kept_rows) - 1)
+    parser = TextParser(kept_rows, header=0, skip_blank_lines=False)
+    df = parser.read()
+    year_label = df.columns[positions.index(year_pos)]
+    if missing_year and pd.api.types.is_integer_dtype(df[year_label]):
+        # read_excel would have typed the year column as float because of the blanks
+        df[year_label] = df[year_label].astype(float)
     return df
 
 
+def iter_data_chunks(
+    file_path: DataSource,
+    chunk_rows: int,
+    columns: Iterable[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Read the first sheet as frames of at most chunk_rows rows, column names cleaned.
+
+    Only one chunk is held in memory at a time. Values are converted like
+    read_excel, but dtypes are inferred per chunk, so a column can be int in
+    one chunk and float in another. Fully blank rows are skipped.
+    """
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be positive, got {chunk_rows}")
+    logger.info("Reading Excel in chunks of %d rows: %s", chunk_rows, file_path)
+    workbook = load_workbook(_rewind(file_path), read_only=True, data_only=True, keep_links=False)
+    try:
+        rows = _iter_sheet_rows(workbook)
+        header, positions = _read_sheet_header(rows, columns)
+        if not positions:
+            return
+        names = [header[i] for i in positions]
+        last_pos = max(positions)
+        buffer: list[list] = []
+        for values in rows:
+            if all(value is None for value in values):
+                continue
+            if len(values) <= last_pos:
+                values = tuple(values) + (None,) * (last_pos + 1 - len(values))
+            buffer.append([_convert_value(values[i]) for i in positions])
+            if len(buffer) >= chunk_rows:
+                yield clean_column_names(TextParser([names, *buffer], header=0, skip_blank_lines=False).read())
+                buffer = []
+        if buffer:
+            yield clean_column_names(TextParser([names, *buffer], header=0, skip_blank_lines=False).read())
+    finally:
+        workbook.close()
+
+
 def filter_by_year_interval(df: pd.DataFrame, year_col: str, interval: int) -> pd.DataFrame:
     if year_col not in df.columns:
         raise KeyError(f"Missing year column: {year_col}")
@@ -48,24 +247,215 @@ def filter_by_year_interval(df: pd.DataFrame, year_col: str, interval: int) -> p
     return df.loc[mask].copy()
 
 
+def encode_categoricals(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Dictionary-encode columns as categoricals with sorted, stable categories.
+
+    Categories follow the order pandas uses when sorting the raw labels, so pivots
+    on the encoded columns list their rows and columns in the same order.
+    """
+    df = df.copy(deep=False)
+    for col in columns:
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        codes, categories = pd.factorize(df[col], sort=True)
+        df[col] = pd.Categorical.from_codes(codes, categories=categories)
+    return df
+
+
+def _cache_key(file_path: DataSource, columns: list[str] | None = None, streaming: bool = False) -> str:
+    """Key a cached frame by input content, the column cleaning rules and projection."""
+    projection = "\x1f".join(sorted(columns)) if columns is not None else "*"
+    # Streamed frames are already restricted to the year window
+    variant = f"stream:{YEAR_COL}:{YEAR_INTERVAL}" if streaming else "full"
+    key = hashlib.sha256()
+    for part in (file_digest(file_path), COLUMN_PREFIX_PATTERN, projection, variant, str(CACHE_VERSION)):
+        key.update(part.encode("utf-8"))
+        key.update(b"\0")
+    return key.hexdigest()[:32]
+
+
+def _read_cached_frame(cache_dir: Path, key: str) -> pd.DataFrame | None:
+    parquet_path = cache_dir / f"{key}.parquet"
+    pickle_path = cache_dir / f"{key}.pkl"
+    try:
+        if parquet_path.exists():
+            # A hit makes the entry the most recently used one (see prune_cache)
+            os.utime(parquet_path)
+            df = pd.read_parquet(parquet_path)
+            # Parquet returns None for missing strings; restore NaN like read_excel
+            object_cols = df.columns[df.dtypes == object]
+            if len(object_cols):
+                df[object_cols] = df[object_cols].where(df[object_cols].notna(), np.nan)
+            return df
+        if pickle_path.exists():
+            os.utime(pickle_path)
+            return pd.read_pickle(pickle_path)
+    except Exception:
+        logger.warning("Ignoring unreadable cache entry %s", key, exc_info=True)
+    return None
+
+
+def _write_cached_frame(df: pd.DataFrame, cache_dir: Path, key: str) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Writers of the same key (e.g. concurrent app jobs) each use their own temp file
+    tmp_tag = uuid.uuid4().hex
+    parquet_path = cache_dir / f"{key}.parquet"
+    tmp_path = parquet_path.with_name(f"{parquet_path.name}.{tmp_tag}.tmp")
+    try:
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, parquet_path)
+        return
+    except Exception as exc:
+        # Missing pyarrow or mixed-type survey columns: keep the exact frame via pickle
+        logger.debug("Parquet cache unavailable for %s (%s); using pickle", key, exc)
+        tmp_path.unlink(missing_ok=True)
+    pickle_path = cache_dir / f"{key}.pkl"
+    tmp_path = pickle_path.with_name(f"{pickle_path.name}.{tmp_tag}.tmp")
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, pickle_path)
+
+
+def _cache_entries(cache_dir: Path) -> list[Path]:
+    if not cache_dir.is_dir():
+        return []
+    return [path for path in cache_dir.iterdir() if path.suffix in CACHE_SUFFIXES and path.is_file()]
+
+
+def prune_cache(cache_dir: Path | None = None, max_entries: int | None = None) -> int:
+    """Delete the least recently used cached frames beyond max_entries; returns how many.
+
+    Entries are ordered by modification time, which a cache hit refreshes.
+    max_entries defaults to CACHE_MAX_ENTRIES; 0 keeps everything. Temp files
+    left by interrupted writes are removed too.
+    """
+    directory = cache_dir or CACHE_DIR
+    max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    removed = 0
+    if max_entries > 0:
+        entries = sorted(_cache_entries(directory), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in entries[max_entries:]:
+            path.unlink(missing_ok=True)
+            removed += 1
+    if directory.is_dir():
+        stale_before = time.time() - STALE_TMP_SECONDS
+        for path in directory.glob("*.tmp"):
+            if path.stat().st_mtime < stale_before:
+                path.unlink(missing_ok=True)
+    if removed:
+        logger.info("Pruned %d cached frames from %s", removed, directory)
+    return removed
+
+
+def clear_cache(cache_dir: Path | None = None) -> int:
+    """Delete every cached frame; returns how many."""
+    directory = cache_dir or CACHE_DIR
+    entries = _cache_entries(directory)
+    for path in entries:
+        path.unlink(missing_ok=True)
+    logger.info("Removed %d cached frames from %s", len(entries), directory)
+    return len(entries)
+
+
+def _read_clean_data(
+    file_path: DataSource, columns: list[str] | None = None, streaming: bool = False
+) -> pd.DataFrame:
+    with stage("read", streaming=streaming) as record:
+        if streaming:
+            df = load_data_streaming(file_path, YEAR_COL, YEAR_INTERVAL, columns)
+        else:
+            usecols = None
+            if columns is not None:
+                usecols = resolve_usecols(read_header(file_path), columns)
+                logger.info("Projecting %d input columns", len(usecols))
+            df = load_data(file_path, usecols=usecols)
+        record["rows"] = len(df)
+    with stage("clean"):
+        return clean_column_names(df)
+
+
+def load_clean_data(
+    file_path: DataSource,
+    use_cache: bool = True,
+    cache_dir: Path | None = None,
+    columns: Iterable[str] | None = None,
+    streaming: bool = False,
+) -> pd.DataFrame:
+    """Load the workbook and clean its column names, going through the on-disk cache.
+
+    columns: cleaned column names to read; other columns are skipped at parse time.
+    streaming: use load_data_streaming, which already applies the year interval.
+    """
+    columns = list(columns) if columns is not None else None
+    if not use_cache:
+        return _read_clean_data(file_path, columns, streaming)
+
+    directory = cache_dir or CACHE_DIR
+    key = _cache_key(file_path, columns, streaming)
+    with stage("cache_read") as record:
+        cached = _read_cached_frame(directory, key)
+        record["hit"] = cached is not None
+    if cached is not None:
+        logger.info("Loaded cleaned data from cache: %s (%s)", file_path, key)
+        return cached
+
+    df = _read_clean_data(file_path, columns, streaming)
+    with stage("cache_write"):
+        try:
+            _write_cached_frame(df, directory, key)
+            prune_cache(directory)
+        except OSError:
+            logger.warning("Could not write data cache in %s", directory, exc_info=True)
+    return df
+
+
 def get_prepared_data(
     input_dir: Path | None = None,
     input_file_name: str | None = None,
     extra_cleaners: Iterable | None = None,
+    use_cache: bool | None = None,
+    cache_dir: Path | None = None,
+    columns: Iterable[str] | None = None,
+    streaming: bool = False,
+    categorical: bool = False,
+    source: DataSource | None = None,
 ) -> pd.DataFrame:
     """Load, clean column names, and filter by year interval.
 
     extra_cleaners: optional iterables of callables(df)->df applied after basic clean.
+    use_cache: reuse the cleaned frame stored in cache_dir (defaults to USE_DATA_CACHE
+    and CACHE_DIR) when the input file content is unchanged.
+    columns: only load these cleaned columns (e.g. REQUIRED_COLUMNS); None loads all.
+    streaming: read rows one by one and drop those outside the year interval while
+    reading, so peak memory follows the filtered size. The interval is then applied
+    before extra_cleaners run.
+    categorical: encode CATEGORICAL_COLUMNS as categoricals after filtering, which
+    shrinks the frame and lets the analyses group on integer codes.
+    source: a path or a seekable binary stream (e.g. an in-memory upload) read
+    instead of input_dir / input_file_name; streams are parsed in place.
     """
-    directory = input_dir or DATA_DIR
-    file_name = input_file_name or INPUT_FILE_NAME
-    file_path = directory / file_name
-    df = load_data(file_path)
-    df = clean_column_names(df)
+    if source is not None:
+        file_path = source
+    else:
+        file_path = (input_dir or DATA_DIR) / (input_file_name or INPUT_FILE_NAME)
+    if use_cache is None:
+        use_cache = USE_DATA_CACHE
+    with stage("load") as record:
+        df = load_clean_data(
+            file_path,
+            use_cache=use_cache,
+            cache_dir=cache_dir,
+            columns=columns,
+            streaming=streaming,
+        )
+        record["rows"] = len(df)
     if extra_cleaners:
-        for func in extra_cleaners:
-            df = func(df)
-    df = filter_by_year_interval(df, YEAR_COL, YEAR_INTERVAL)
+        with stage("extra_cleaners"):
+            for func in extra_cleaners:
+                df = func(df)
+    with stage("filter") as record:
+        df = filter_by_year_interval(df, YEAR_COL, YEAR_INTERVAL)
+        record["rows"] = len(df)
+    if categorical:
+        with stage("categorical"):
+            df = encode_categoricals(df, CATEGORICAL_COLUMNS)
     return df
-
-
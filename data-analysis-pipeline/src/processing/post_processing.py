@@ -6,7 +6,12 @@ from typing import Dict
 import pandas as pd
 
 
-from config.settings import REMUNERATION_SHEET_NAME, REMUNERATION_FR_SHEET_NAME
+from config.settings import (
+    REMUNERATION_SHEET_NAME,
+    REMUNERATION_FR_SHEET_NAME,
+    REMUNERATION_STATS_SHEET_NAME,
+    REMUNERATION_STATS_FR_SHEET_NAME,
+)
 from src.utils.sheet_utils import safe_sheet_name
 
 logger = logging.getLogger(__name__)
@@ -19,8 +24,10 @@ def _select_keys_like(sheets: Dict[str, pd.DataFrame], needle: str) -> list[str]
 def aggregate_employment_regions(sheets_dict: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
     """Aggregate regions into ['Île-de-France', 'Étranger', 'Province'] for matching sheets.
 
-    Works when the DataFrame index contains region labels.
+    Works when the DataFrame index contains region labels. Returns a new dict;
+    sheets_dict and its DataFrames are left untouched.
     """
+    result = dict(sheets_dict)
     target_keys = _select_keys_like(sheets_dict, "EmploiLieuRegionEtranger")
     for key in target_keys:
         df = sheets_dict[key]
@@ -39,12 +46,13 @@ def aggregate_employment_regions(sheets_dict: Dict[str, pd.DataFrame]) -> Dict[s
         province = df.loc[others_mask].sum() if others_mask.any() else df.iloc[0:0].sum()
         new_df = pd.DataFrame([idf, foreign, province], index=["Île-de-France", "Étranger", "Province"]).fillna(0)
         new_df.columns = df.columns
-        sheets_dict[key] = new_df
-    return sheets_dict
+        result[key] = new_df
+    return result
 
 
 def aggregate_company_size(sheets_dict: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
-    """Aggregate size categories: '0' and 'De 1 à 9' -> 'Moins de 10'."""
+    """Aggregate size categories: '0' and 'De 1 à 9' -> 'Moins de 10'. Returns a new dict."""
+    result = dict(sheets_dict)
     target_keys = _select_keys_like(sheets_dict, "EmploiEntrepriseTaille")
     for key in target_keys:
         df = sheets_dict[key]
@@ -57,8 +65,13 @@ def aggregate_company_size(sheets_dict: Dict[str, pd.DataFrame]) -> Dict[str, pd
         keep_df = df.loc[~lt10_mask]
         agg_df = pd.concat([pd.DataFrame([lt10], index=["Moins de 10"]).fillna(0), keep_df])
         # Keep a stable order
-        sheets_dict[key] = agg_df
-    return sheets_dict
+        result[key] = agg_df
+    return result
+
+
+def aggregate_categories(sheets_dict: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """The --aggregate post-processing: regions, then company sizes."""
+    return aggregate_company_size(aggregate_employment_regions(sheets_dict))
 
 
 def convert_all_to_percentages(sheets_dict: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
@@ -71,11 +84,15 @@ def convert_all_to_percentages(sheets_dict: Dict[str, pd.DataFrame]) -> Dict[str
         safe_sheet_name(REMUNERATION_SHEET_NAME),
         REMUNERATION_FR_SHEET_NAME,
         safe_sheet_name(REMUNERATION_FR_SHEET_NAME),
+        REMUNERATION_STATS_SHEET_NAME,
+        safe_sheet_name(REMUNERATION_STATS_SHEET_NAME),
+        REMUNERATION_STATS_FR_SHEET_NAME,
+        safe_sheet_name(REMUNERATION_STATS_FR_SHEET_NAME),
     }
 
     for key, df in sheets_dict.items():
         if key in skip_keys:
-            # Just copy the average salary table without modification
+            # Just copy the salary tables without modification
             result[key] = df.copy()
             continue
 
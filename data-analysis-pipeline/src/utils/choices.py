@@ -0,0 +1,18 @@
+"""Values offered by the command line and the app.
+
+Only the standard library is imported here, so that parsing the command line
+(and skipping an up-to-date run) does not load pandas, numpy or openpyxl.
+"""
+from __future__ import annotations
+
+from typing import List, Tuple
+
+
+ANALYSIS_KINDS: List[str] = ["global", "global_status", "branch", "branch_status", "filiere"]
+EXCEL_BACKENDS: Tuple[str, ...] = ("openpyxl", "xlsxwriter")
+REPORT_FORMATS: Tuple[str, ...] = ("arrow", "pickle")
+
+
+def kinds_for(analysis: str) -> List[str]:
+    """Expand the --analysis choice into the list of analysis kinds to run."""
+    return [analysis] if analysis != "all" else list(ANALYSIS_KINDS)
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+import hashlib
+from contextlib import nullcontext
+from pathlib import Path
+from typing import BinaryIO, Union
+
+
+def file_digest(file_path: Union[Path, str, BinaryIO], chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's (or a stream's, from its start) content."""
+    digest = hashlib.sha256()
+    is_path = isinstance(file_path, (str, Path))
+    if not is_path:
+        file_path.seek(0)
+    with open(file_path, "rb") if is_path else nullcontext(file_path) as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import fnmatch
+import json
+import logging
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION: int = 1
+MANIFEST_SUFFIX: str = ".manifest.json"
+
+# Recorder of the running pipeline; each thread (e.g. each app job) has its own
+_RECORDER: contextvars.ContextVar[RunRecorder | None] = contextvars.ContextVar("run_recorder", default=None)
+
+
+def max_rss_mb() -> float | None:
+    """Peak resident memory of this process so far (None where unavailable)."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+class RunRecorder:
+    """Wall time, CPU time and memory of every stage of one run.
+
+    Stages nest (a write inside an analysis kind); each record keeps its
+    parent. Memory is the process peak RSS when the stage ends and how much the
+    stage raised it; with trace_memory the tracemalloc peak of the stage is
+    added (slower). With profile_dir, the outermost stages whose name matches
+    profile_stages are run under cProfile and dumped there as .prof files.
+    """
+
+    def __init__(
+        self,
+        trace_memory: bool = False,
+        profile_dir: Path | str | None = None,
+        profile_stages: str = "*",
+    ) -> None:
+        self.trace_memory = trace_memory
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.profile_stages = profile_stages
+        self.stages: List[Dict[str, Any]] = []
+        self.started = time.time()
+        self._start_cpu = time.process_time()
+        self._stack: List[Dict[str, Any]] = []
+        # Running tracemalloc peak of each open stage, outermost first
+        self._peaks: List[int] = []
+        self._profiling = False
+
+    def options(self) -> Dict[str, Any]:
+        """Constructor arguments, for the recorders of worker processes."""
+        return {
+            "trace_memory": self.trace_memory,
+            "profile_dir": str(self.profile_dir) if self.profile_dir else None,
+            "profile_stages": self.profile_stages,
+        }
+
+    def _profile_path(self, name: str) -> Path:
+        safe = re.sub(r"[^\w.-]+", "_", name).strip("_")
+        return self.profile_dir / f"{len(self.stages):03d}_{os.getpid()}_{safe}.prof"
+
+    @contextmanager
+    def stage(self, name: str, **info: Any) -> Iterator[Dict[str, Any]]:
+        """Record the enclosed block; the yielded record takes rows / sheets counts."""
+        record: Dict[str, Any] = {
+            "name": name,
+            "parent": self._stack[-1]["name"] if self._stack else None,
+            "depth": len(self._stack),
+            "pid": os.getpid(),
+            **info,
+        }
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        profiler = None
+        if self.profile_dir is not None and not self._profiling and fnmatch.fnmatch(name, self.profile_stages):
+            profiler = cProfile.Profile()
+            self._profiling = True
+
+        self._stack.append(record)
+        rss_before = max_rss_mb()
+        record["started"] = time.time()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        except BaseException as exc:
+            record["error"] = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record["wall_s"] = time.perf_counter() - start_wall
+            record["cpu_s"] = time.process_time() - start_cpu
+            record["max_rss_mb"] = max_rss_mb()
+            if rss_before is not None:
+                record["rss_growth_mb"] = record["max_rss_mb"] - rss_before
+            if tracing:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["traced_peak_mb"] = peak / 2**20
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            if profiler is not None:
+                self._profiling = False
+                path = self._profile_path(name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(path)
+                record["profile"] = str(path)
+            self._stack.pop()
+            self.stages.append(record)
+            logger.debug("Stage %s: %.3fs wall, %.3fs CPU", name, record["wall_s"], record["cpu_s"])
+
+    def extend(self, records: List[Dict[str, Any]]) -> None:
+        """Add stages recorded elsewhere (e.g. in a worker process) under the current stage."""
+        parent = self._stack[-1]["name"] if self._stack else None
+        for record in records:
+            if record["parent"] is None:
+                record = {**record, "parent": parent}
+            self.stages.append({**record, "depth": record["depth"] + len(self._stack)})
+
+    def manifest(self, **meta: Any) -> Dict[str, Any]:
+        """The run manifest: totals, meta (command, options, outputs...) and the stages in start order."""
+        stages = sorted(self.stages, key=lambda record: record["started"])
+        return {
+            "version": MANIFEST_VERSION,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_s": time.time() - self.started,
+            "cpu_s": time.process_time() - self._start_cpu,
+            "max_rss_mb": max_rss_mb(),
+            "python": platform.python_version(),
+            **meta,
+            "stages": [
+                {**{k: v for k, v in record.items() if k != "started"}, "start_s": record["started"] - self.started}
+                for record in stages
+            ],
+        }
+
+    def write(self, path: Path, **meta: Any) -> Path:
+        """Write the manifest as JSON at path (atomically)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(self.manifest(**meta), handle, indent=2, default=str)
+        os.replace(tmp_path, path)
+        logger.info("Run manifest: %s", path)
+        return path
+
+
+def manifest_path(base: Path) -> Path:
+    return base.with_name(f"{base.name}{MANIFEST_SUFFIX}")
+
+
+def current_recorder() -> RunRecorder | None:
+    return _RECORDER.get()
+
+
+@contextmanager
+def recording(recorder: RunRecorder) -> Iterator[RunRecorder]:
+    """Make recorder the target of stage() in this thread for the enclosed block."""
+    token = _RECORDER.set(recorder)
+    started_tracing = recorder.trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        yield recorder
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _RECORDER.reset(token)
+
+
+@contextmanager
+def stage(name: str, **info: Any) -> Iterator[Dict[str, Any]]:
+    """Record a stage of the current run; without an active recorder this costs nothing."""
+    recorder = _RECORDER.get()
+    if recorder is None:
+        yield {}
+        return
+    with recorder.stage(name, **info) as record:
+        yield record
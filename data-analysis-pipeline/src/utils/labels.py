@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+
+def encode_label(value):
+    """JSON-safe form of an axis label; dates and times keep their type."""
+    if isinstance(value, (np.generic,)):
+        value = value.item()
+    if isinstance(value, (dt.datetime, dt.date, dt.time)):
+        return {"__isoformat__": type(value).__name__, "value": value.isoformat()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot store label {value!r} of type {type(value).__name__} as JSON")
+
+
+def decode_label(value):
+    if isinstance(value, dict):
+        kind = value["__isoformat__"]
+        if kind in ("datetime", "Timestamp"):
+            return pd.Timestamp(value["value"])
+        if kind == "date":
+            return dt.date.fromisoformat(value["value"])
+        return dt.time.fromisoformat(value["value"])
+    return value
+
+
+def encode_index(index: pd.Index) -> Dict[str, Any]:
+    return {"dtype": str(index.dtype), "values": [encode_label(v) for v in index]}
+
+
+def decode_index(spec: Dict[str, Any]) -> pd.Index:
+    return pd.Index([decode_label(v) for v in spec["values"]], dtype=spec["dtype"])
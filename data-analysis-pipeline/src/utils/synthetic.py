@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from config.settings import (
+    YEAR_COL,
+    GENDER_COL,
+    BRANCH_COL,
+    FILIER_COL,
+    STATUS_COL,
+    STATUS_INITIAL_VAL,
+    SUMMARY_COLUMNS,
+    SALARY_AP_COL,
+    SALARY_HP_COL,
+    REGION_FOREIGN_COL,
+)
+
+
+logger = logging.getLogger(__name__)
+
+GENDER_VALUES: List[str] = ["Femme", "Homme"]
+STATUS_VALUES: List[str] = [STATUS_INITIAL_VAL, "Alternance", "Formation continue"]
+# Leading modalities of the columns the post-processing steps aggregate, so
+# --aggregate has the same work to do as on a real export
+KNOWN_MODALITIES: Dict[str, list] = {
+    REGION_FOREIGN_COL: ["Île-de-France", "Étranger", "Auvergne-Rhône-Alpes", "Bretagne", "Occitanie", "Grand Est"],
+    "EmploiEntrepriseTaille": [0, "De 1 à 9", "De 10 à 49", "De 50 à 249", "De 250 à 4999", "Plus de 5000"],
+}
+
+
+def synthetic_modalities(col: str, cardinality: int) -> list:
+    """cardinality labels for a summary column: its known modalities first, then numbered ones."""
+    known = KNOWN_MODALITIES.get(col, [])
+    return known[:cardinality] + [f"{col} {i + 1}" for i in range(len(known), cardinality)]
+
+
+def synthetic_survey(
+    rows: int,
+    seed: int = 0,
+    branches: int = 5,
+    filieres: int = 3,
+    years: int = 4,
+    last_year: int = 2024,
+    modalities: int | Dict[str, int] = 6,
+    missing_rate: float = 0.05,
+    extra_columns: int = 0,
+) -> pd.DataFrame:
+    """A seeded survey export with the columns of config/settings.py.
+
+    branches: branch codes; filieres: filieres per branch (nested, as in the
+    real exports); years: diploma years ending at last_year; modalities: the
+    cardinality of every summary column, or per column (others keep 6).
+    missing_rate: share of missing values in each categorical column; salaries
+    are only filled for rows in employment. extra_columns adds free-text
+    columns the analyses do not read, as real exports have many.
+    The same arguments always give the same frame.
+    """
+    rng = np.random.default_rng(seed)
+    if isinstance(modalities, int):
+        modalities = dict.fromkeys(SUMMARY_COLUMNS, modalities)
+
+    def pick(values: list, missing: float = missing_rate) -> np.ndarray:
+        picked = np.asarray(values, dtype=object)[rng.integers(0, len(values), rows)]
+        picked[rng.random(rows) < missing] = None
+        return picked
+
+    branch_codes = rng.integers(0, branches, rows)
+    filiere_codes = rng.integers(0, filieres, rows)
+    branch_values = np.array([f"BR{b + 1}" for b in range(branches)], dtype=object)
+    filiere_values = np.array(
+        [f"BR{b + 1}-F{f + 1}" for b in range(branches) for f in range(filieres)], dtype=object
+    )
+    data: Dict[str, np.ndarray] = {
+        YEAR_COL: pick(list(range(last_year - years + 1, last_year + 1)), missing_rate / 5),
+        GENDER_COL: pick(GENDER_VALUES),
+        BRANCH_COL: branch_values[branch_codes],
+        FILIER_COL: filiere_values[branch_codes * filieres + filiere_codes],
+        STATUS_COL: pick(STATUS_VALUES),
+    }
+    for col in (BRANCH_COL, FILIER_COL):
+        data[col][rng.random(rows) < missing_rate] = None
+    for col in SUMMARY_COLUMNS:
+        data[col] = pick(synthetic_modalities(col, modalities.get(col, 6)))
+
+    # Only about two thirds of the graduates report a salary
+    employed = rng.random(rows) < 0.65
+    data[SALARY_AP_COL] = np.where(employed, rng.normal(42000, 7000, rows).round(2), np.nan)
+    data[SALARY_HP_COL] = np.where(employed & (rng.random(rows) < 0.5), rng.integers(0, 9000, rows), np.nan)
+    for i in range(extra_columns):
+        data[f"Commentaire {i + 1}"] = pick(["RAS", "Voir entretien", "Réponse partielle"], 0.7)
+    return pd.DataFrame(data)
+
+
+def numbered_headers(columns: list) -> List[str]:
+    """Headers as the survey exports number them ("14) 1erEmploi..."); clean_column_names strips the numbers."""
+    return [f"{i}) {col}" for i, col in enumerate(columns, start=1)]
+
+
+def write_synthetic_workbook(df: pd.DataFrame, output_path: Path) -> Path:
+    """Write a synthetic frame as an input workbook with numbered headers.
+
+    Uses xlsxwriter when installed, which is much faster than openpyxl.
+    """
+    try:
+        import xlsxwriter  # noqa: F401
+        engine = "xlsxwriter"
+    except ImportError:
+        engine = "openpyxl"
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info("Writing synthetic workbook (%d rows): %s", len(df), output_path)
+    df.set_axis(numbered_headers(list(df.columns)), axis=1).to_excel(output_path, index=False, engine=engine)
+    return output_path
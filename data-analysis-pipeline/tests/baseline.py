@@ -0,0 +1,163 @@
+"""The original pandas analyses (pivot_table per column and slice), as reference tables for the tests.
+
+Condensed from the analysis modules before the count cube replaced them;
+the tables must stay identical to what these functions build. Mean salaries
+are correctly rounded (math.fsum), as the exact sums of the pipeline give them.
+"""
+from __future__ import annotations
+
+import math
+from typing import Dict, List
+
+import pandas as pd
+
+from config.settings import (
+    BRANCH_COL,
+    FILIER_COL,
+    GENDER_COL,
+    REGION_FOREIGN_COL,
+    REMUNERATION_FR_SHEET_NAME,
+    REMUNERATION_SHEET_NAME,
+    SALARY_AP_COL,
+    SALARY_HP_COL,
+    STATUS_COL,
+    STATUS_INITIAL_VAL,
+    YEAR_COL,
+)
+from src.utils.sheet_utils import safe_sheet_name
+
+
+def assert_same_sheets(expected: Dict[str, pd.DataFrame], actual: Dict[str, pd.DataFrame]) -> None:
+    """Same sheet names and tables, floats compared exactly."""
+    assert sorted(actual) == sorted(expected)
+    for name, table in expected.items():
+        pd.testing.assert_frame_equal(actual[name], table, obj=name, check_exact=True)
+
+
+def pivot_counts(df: pd.DataFrame, index_col: str, sub_col: str = GENDER_COL, totals: bool = True) -> pd.DataFrame:
+    pivot = pd.pivot_table(df, index=index_col, columns=[YEAR_COL, sub_col], aggfunc="size", fill_value=0)
+    if totals:
+        for y in pivot.columns.get_level_values(0).unique():
+            pivot[(y, "Total")] = pivot.loc[:, y].sum(axis=1)
+        pivot = pivot.sort_index(axis=1, level=[0, 1])
+    return pivot
+
+
+def _exact_mean(values: pd.Series) -> float:
+    values = values.dropna()
+    return math.fsum(values) / len(values) if len(values) else float("nan")
+
+
+def _remuneration_pivot(frame: pd.DataFrame, pivot_col: str) -> pd.DataFrame:
+    data = frame[[YEAR_COL, pivot_col]].copy()
+    for col in (SALARY_AP_COL, SALARY_HP_COL):
+        data[col] = pd.to_numeric(frame[col], errors="coerce") if col in frame.columns else float("nan")
+    grouped = data.groupby([YEAR_COL, pivot_col])[[SALARY_AP_COL, SALARY_HP_COL]].agg(_exact_mean)
+    per_year = data.groupby([YEAR_COL])[[SALARY_AP_COL, SALARY_HP_COL]].agg(_exact_mean)
+
+    columns, values_ap, values_hp = [], [], []
+    for y in sorted(grouped.index.get_level_values(0).unique()):
+        for sc in sorted(grouped.index.get_level_values(1).unique()):
+            columns.append((y, sc))
+            row = grouped.loc[(y, sc)] if (y, sc) in grouped.index else {}
+            values_ap.append(row.get(SALARY_AP_COL, float("nan")))
+            values_hp.append(row.get(SALARY_HP_COL, float("nan")))
+        columns.append((y, "Total"))
+        row_y = per_year.loc[y] if y in per_year.index else {}
+        values_ap.append(row_y.get(SALARY_AP_COL, float("nan")))
+        values_hp.append(row_y.get(SALARY_HP_COL, float("nan")))
+
+    matrix = {"AP": values_ap, "HP": values_hp}
+    result = pd.DataFrame(matrix, index=pd.MultiIndex.from_tuples(columns, names=[YEAR_COL, pivot_col])).T
+    return result.sort_index(axis=1, level=[0, 1])
+
+
+def remuneration_sheets(df: pd.DataFrame, pivot_col: str = GENDER_COL) -> Dict[str, pd.DataFrame]:
+    sheets = {REMUNERATION_SHEET_NAME: _remuneration_pivot(df, pivot_col)}
+    if REGION_FOREIGN_COL in df.columns:
+        lower = df[REGION_FOREIGN_COL].astype(str).str.lower()
+        df_france = df.loc[(lower != "etranger") & (lower != "étranger")]
+        sheets[REMUNERATION_FR_SHEET_NAME] = _remuneration_pivot(df_france, pivot_col)
+    return sheets
+
+
+def _with_level(table: pd.DataFrame, level: str, label: str) -> pd.DataFrame:
+    table = table.copy()
+    table.columns = pd.MultiIndex.from_tuples(
+        [(label,) + tuple(col) for col in table.columns], names=[level] + list(table.columns.names)
+    )
+    return table
+
+
+def _combine(tables: Dict[str, Dict[str, pd.DataFrame]], level: str) -> Dict[str, pd.DataFrame]:
+    """One sheet per table name: its per-label tables side by side under a new top column level."""
+    return {
+        safe_sheet_name(name): pd.concat(
+            [_with_level(table, level, label) for label, table in by_label.items()], axis=1, sort=False
+        ).fillna(0)
+        for name, by_label in tables.items()
+    }
+
+
+def _status_groups(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    mask_initial = df[STATUS_COL] == STATUS_INITIAL_VAL
+    groups = {"Initial": df[mask_initial], "Autre": df[~mask_initial]}
+    return {label: frame for label, frame in groups.items() if not frame.empty}
+
+
+def _branches(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    return {
+        branch: df[df[BRANCH_COL].astype(str) == branch]
+        for branch in sorted(pd.Series(df[BRANCH_COL].dropna().unique()).astype(str))
+    }
+
+
+def _slice_tables(df: pd.DataFrame, summary_cols: List[str], pivot_col: str) -> Dict[str, pd.DataFrame]:
+    # The filiere view has no per-year totals in its count tables
+    totals = pivot_col == GENDER_COL
+    tables = {str(col): pivot_counts(df, col, pivot_col, totals) for col in summary_cols if col in df.columns}
+    tables.update(remuneration_sheets(df, pivot_col))
+    return tables
+
+
+def _by_label(slices: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, Dict[str, pd.DataFrame]]:
+    """{label: {name: table}} -> {name: {label: table}}, labels kept in order."""
+    tables: Dict[str, Dict[str, pd.DataFrame]] = {}
+    for label, named in slices.items():
+        for name, table in named.items():
+            tables.setdefault(name, {})[label] = table
+    return tables
+
+
+def run_baseline(kind: str, df: pd.DataFrame, summary_cols: List[str]) -> Dict[str, pd.DataFrame]:
+    """Sheets of analysis kind on df, as the original run_<kind>_analysis built them."""
+    if kind == "global":
+        sheets = {str(col): pivot_counts(df, col) for col in summary_cols if col in df.columns}
+        sheets.update(remuneration_sheets(df))
+        return sheets
+    if kind == "global_status":
+        slices = {label: _slice_tables(frame, summary_cols, GENDER_COL) for label, frame in _status_groups(df).items()}
+        return _combine(_by_label(slices), "Status")
+    if kind == "branch":
+        slices = {branch: _slice_tables(frame, summary_cols, GENDER_COL) for branch, frame in _branches(df).items()}
+        return _combine(_by_label(slices), "Branch")
+    if kind == "filiere":
+        slices = {branch: _slice_tables(frame, summary_cols, FILIER_COL) for branch, frame in _branches(df).items()}
+        return _combine(_by_label(slices), "Branch")
+    if kind == "branch_status":
+        slices = {}
+        for branch, frame in _branches(df).items():
+            by_status = {
+                label: _slice_tables(status_frame, summary_cols, GENDER_COL)
+                for label, status_frame in _status_groups(frame).items()
+            }
+            slices[branch] = {
+                name: pd.concat(
+                    [_with_level(table, "Status", label) for label, table in by_status_label.items()],
+                    axis=1,
+                    sort=False,
+                ).fillna(0)
+                for name, by_status_label in _by_label(by_status).items()
+            }
+        return _combine(_by_label(slices), "Branch")
+    raise ValueError(f"Unknown analysis kind: {kind}")
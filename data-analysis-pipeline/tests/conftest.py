@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from config.settings import YEAR_COL, YEAR_INTERVAL  # noqa: E402
+from src.processing.data_loader import filter_by_year_interval, get_prepared_data  # noqa: E402
+from src.utils.synthetic import synthetic_survey, write_synthetic_workbook  # noqa: E402
+
+SURVEY_ROWS = 3000
+
+
+@pytest.fixture(autouse=True)
+def data_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Runs that use the cleaned-data cache write to a temporary one, not to CACHE_DIR."""
+    cache_dir = tmp_path / ".cache"
+    monkeypatch.setattr("src.processing.data_loader.CACHE_DIR", cache_dir)
+    return cache_dir
+
+
+@pytest.fixture(scope="session")
+def raw_survey() -> pd.DataFrame:
+    """A seeded synthetic export, before the year filter."""
+    return synthetic_survey(SURVEY_ROWS, seed=7, branches=4)
+
+
+@pytest.fixture(scope="session")
+def survey(raw_survey: pd.DataFrame) -> pd.DataFrame:
+    """The synthetic export with the year window applied, in memory (years are Python ints or None)."""
+    return filter_by_year_interval(raw_survey, YEAR_COL, YEAR_INTERVAL)
+
+
+@pytest.fixture(scope="session")
+def loaded_survey(raw_survey: pd.DataFrame, tmp_path_factory: pytest.TempPathFactory) -> pd.DataFrame:
+    """The synthetic export written to a workbook and read back by get_prepared_data, as the CLI does."""
+    path = write_synthetic_workbook(raw_survey, tmp_path_factory.mktemp("survey") / "survey.xlsx")
+    return get_prepared_data(source=path, use_cache=False)
+
+
+@pytest.fixture
+def workbook(tmp_path: Path):
+    """Writes a seeded synthetic survey to tmp_path/<name> and returns its path."""
+
+    def _write(name: str, rows: int = 600, seed: int = 0) -> Path:
+        return write_synthetic_workbook(synthetic_survey(rows, seed=seed, branches=3), tmp_path / name)
+
+    return _write
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import pytest
+
+from baseline import assert_same_sheets, pivot_counts, run_baseline
+from config.settings import CATEGORICAL_COLUMNS, GENDER_COL, SUMMARY_COLUMNS, YEAR_COL
+from src.analysis.cube import build_count_cube
+from src.analysis.crosstab import crosstab_counts
+from src.pipeline.steps import run_analysis
+from src.processing.data_loader import encode_categoricals
+from src.utils.choices import ANALYSIS_KINDS
+
+
+@pytest.mark.parametrize("add_totals", [True, False])
+def test_crosstab_matches_pivot_table(survey, add_totals):
+    tables = crosstab_counts(survey, SUMMARY_COLUMNS, (YEAR_COL, GENDER_COL), add_totals=add_totals)
+    expected = {col: pivot_counts(survey, col, totals=add_totals) for col in SUMMARY_COLUMNS if col in survey.columns}
+    assert_same_sheets(expected, tables)
+
+
+@pytest.mark.parametrize("frame", ["survey", "loaded_survey"])
+@pytest.mark.parametrize("kind", ANALYSIS_KINDS)
+def test_cube_matches_pivot_tables(request, frame, kind):
+    df = request.getfixturevalue(frame)
+    assert_same_sheets(run_baseline(kind, df, SUMMARY_COLUMNS), run_analysis(kind, df))
+
+
+@pytest.mark.parametrize("kind", ANALYSIS_KINDS)
+def test_categorical_frame_gives_same_sheets(survey, kind):
+    encoded = encode_categoricals(survey, CATEGORICAL_COLUMNS)
+    assert_same_sheets(run_analysis(kind, survey), run_analysis(kind, encoded))
+
+
+def test_shared_cube_gives_same_sheets(survey):
+    cube = build_count_cube(survey, SUMMARY_COLUMNS)
+    for kind in ANALYSIS_KINDS:
+        assert_same_sheets(run_analysis(kind, survey), run_analysis(kind, survey, cube=cube))
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from config.settings import REQUIRED_COLUMNS, YEAR_COL, YEAR_INTERVAL
+from src.processing.data_loader import clean_column_names, filter_by_year_interval, get_prepared_data
+from src.utils.synthetic import synthetic_survey, write_synthetic_workbook
+
+
+@pytest.fixture(scope="module")
+def export(tmp_path_factory):
+    """A workbook with years outside the window and blank years, and the frame read_excel gives for it."""
+    survey = synthetic_survey(1500, seed=3, branches=3, years=YEAR_INTERVAL + 4, missing_rate=0.25, extra_columns=2)
+    path = write_synthetic_workbook(survey, tmp_path_factory.mktemp("export") / "export.xlsx")
+    expected = filter_by_year_interval(clean_column_names(pd.read_excel(path)), YEAR_COL, YEAR_INTERVAL)
+    assert expected[YEAR_COL].isna().sum() == 0 and len(expected) < len(survey)
+    return path, expected.reset_index(drop=True)
+
+
+@pytest.mark.parametrize("columns", [None, REQUIRED_COLUMNS], ids=["all", "projected"])
+def test_streaming_matches_read_excel(export, columns):
+    path, expected = export
+    if columns is not None:
+        expected = expected[[col for col in expected.columns if col in columns]]
+    actual = get_prepared_data(source=path, use_cache=False, columns=columns, streaming=True)
+    # Blank years make read_excel type the year column as float
+    assert actual[YEAR_COL].dtype == "float64"
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_exact=True)
+
+
+def test_cached_streaming_matches_read_excel(export, data_cache):
+    path, expected = export
+    first = get_prepared_data(source=path, use_cache=True, streaming=True)
+    assert len(list(data_cache.iterdir())) == 1
+    cached = get_prepared_data(source=path, use_cache=True, streaming=True)
+    for frame in (first, cached):
+        pd.testing.assert_frame_equal(frame.reset_index(drop=True), expected, check_exact=True)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from src.io.data_writer import save_to_excel_multisheet, save_to_excel_single_report, save_to_excel_singlesheet
+from src.pipeline.steps import run_analysis
+
+pytest.importorskip("xlsxwriter")
+
+SAVERS = [save_to_excel_multisheet, save_to_excel_singlesheet, save_to_excel_single_report]
+
+
+@pytest.fixture(scope="module", params=["global", "branch_status"])
+def sheets(request, survey):
+    """Analysis sheets (merged multi-level headers and index labels) plus a table of awkward cell values."""
+    values = pd.DataFrame(
+        {"value": [1.5, np.nan, np.inf, -np.inf], "label": ["a", None, "", "d"], "date": pd.date_range("2024-01-31", periods=4)},
+        index=pd.Index([2022, 2022, 2023, 2024], name="Year"),
+    )
+    return {**run_analysis(request.param, survey), "Values": values}
+
+
+def read_cells(path):
+    """Per sheet, its cell values row by row and its merged ranges, as openpyxl reads them back."""
+    book = load_workbook(path)
+    return {
+        ws.title: (list(ws.iter_rows(values_only=True)), sorted(str(cells) for cells in ws.merged_cells.ranges))
+        for ws in book.worksheets
+    }
+
+
+@pytest.mark.parametrize("save", SAVERS, ids=lambda save: save.__name__)
+def test_backends_write_same_cells(sheets, save, tmp_path):
+    save(sheets, tmp_path / "openpyxl.xlsx", backend="openpyxl")
+    save(sheets, tmp_path / "xlsxwriter.xlsx", backend="xlsxwriter")
+    expected = read_cells(tmp_path / "openpyxl.xlsx")
+    actual = read_cells(tmp_path / "xlsxwriter.xlsx")
+    assert list(actual) == list(expected)
+    for name, (rows, merged) in expected.items():
+        assert actual[name][1] == merged, name
+        assert actual[name][0] == rows, name
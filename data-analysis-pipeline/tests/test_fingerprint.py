@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import pytest
+
+import main
+from config import settings
+from src.pipeline.fingerprint import fingerprint_path, run_fingerprint
+
+
+@pytest.fixture
+def run(workbook, tmp_path):
+    """Runs main.py on a synthetic workbook with extra options; returns whether the analyses ran."""
+    path = workbook("survey.xlsx")
+    output = tmp_path / "out" / "report"
+
+    def _run(*options: str) -> bool:
+        argv = ["--analysis", "global", "--input-file", str(path), "--output", str(output), "--no-manifest", *options]
+        return main.run_input(main.parse_args(argv))
+
+    _run.input = path
+    _run.output = output
+    return _run
+
+
+def test_unchanged_run_is_skipped(run):
+    assert run()
+    outputs = sorted(run.output.parent.glob("report_*"))
+    mtimes = [path.stat().st_mtime_ns for path in outputs]
+    assert not run()
+    assert [path.stat().st_mtime_ns for path in outputs] == mtimes
+    # Options that only change how the run executes keep it up to date
+    assert not run("--no-cache", "--workers", "2")
+
+
+def test_changes_rerun(run, workbook):
+    assert run()
+    assert run("--percent")
+    assert not run("--percent")
+    assert run("--percent", "--force")
+
+    workbook(run.input.name, seed=1)
+    assert run("--percent")
+
+    (run.output.parent / "report_percent.xlsx").unlink()
+    assert run("--percent")
+
+
+def test_failed_run_is_not_skipped(run, monkeypatch):
+    assert run()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(main, "run_loaded", fail)
+        with pytest.raises(RuntimeError):
+            run("--force")
+    assert not fingerprint_path(run.output).exists()
+    assert run()
+
+
+def test_settings_in_fingerprint(run, monkeypatch):
+    before = run_fingerprint([run.input], {})
+    monkeypatch.setattr(settings, "BATCH_WORKERS", settings.BATCH_WORKERS + 1)
+    assert run_fingerprint([run.input], {}) == before
+    monkeypatch.setattr(settings, "YEAR_INTERVAL", settings.YEAR_INTERVAL + 1)
+    assert run_fingerprint([run.input], {}) != before
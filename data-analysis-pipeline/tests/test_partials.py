@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import pytest
+
+from baseline import assert_same_sheets
+from src.analysis.partials import build_partial, load_partial, merge_partials, partial_from_file, save_partial
+from src.pipeline.steps import run_analysis
+from src.processing.data_loader import load_clean_data
+from src.utils.choices import ANALYSIS_KINDS
+
+
+def cube_sheets(partial) -> dict:
+    cube, salaries = partial.to_cubes()
+    return {kind: run_analysis(kind, None, cube=cube, salaries=salaries) for kind in ANALYSIS_KINDS}
+
+
+@pytest.fixture(scope="module")
+def full_sheets(raw_survey) -> dict:
+    return cube_sheets(build_partial(raw_survey))
+
+
+@pytest.mark.parametrize("kind", ANALYSIS_KINDS)
+def test_partial_matches_rows(survey, full_sheets, kind):
+    assert_same_sheets(run_analysis(kind, survey), full_sheets[kind])
+
+
+def test_merged_chunks_match_full_partial(raw_survey, full_sheets):
+    # Uneven chunks, merged out of order: the result must not depend on the split
+    chunks = [raw_survey.iloc[:250], raw_survey.iloc[250:1700], raw_survey.iloc[1700:]]
+    merged = merge_partials(build_partial(chunk) for chunk in reversed(chunks))
+    sheets = cube_sheets(merged)
+    for kind in ANALYSIS_KINDS:
+        assert_same_sheets(full_sheets[kind], sheets[kind])
+
+
+def test_saved_partial_round_trip(raw_survey, full_sheets, tmp_path):
+    path = save_partial(build_partial(raw_survey), tmp_path / "survey.npz")
+    sheets = cube_sheets(load_partial(path))
+    for kind in ANALYSIS_KINDS:
+        assert_same_sheets(full_sheets[kind], sheets[kind])
+
+
+def test_chunked_file_matches_loaded_file(workbook):
+    path = workbook("school.xlsx")
+    expected = cube_sheets(build_partial(load_clean_data(path, use_cache=False)))
+    chunked = cube_sheets(partial_from_file(path, chunk_rows=128))
+    for kind in ANALYSIS_KINDS:
+        assert_same_sheets(expected[kind], chunked[kind])
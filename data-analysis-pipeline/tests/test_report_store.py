@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from baseline import assert_same_sheets
+from src.io.report_store import REPORT_STORE_SUFFIX, ReportStore, open_report, save_report
+from src.pipeline.artifacts import iter_output_sheets
+from src.pipeline.steps import run_analysis
+from src.utils.choices import ANALYSIS_KINDS
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture(scope="module")
+def report_sheets(survey) -> dict:
+    """Every sheet the pipeline writes for the synthetic survey: each kind and step, salary statistics included."""
+    sheets = {}
+    for kind in ANALYSIS_KINDS:
+        counts = run_analysis(kind, survey, salary_stats=True)
+        for step, step_sheets in iter_output_sheets(counts, aggregate=True, percent=True):
+            sheets.update({f"{kind} {step} {name}": table for name, table in step_sheets.items()})
+    return sheets
+
+
+def test_store_round_trip(report_sheets, tmp_path):
+    path = save_report(report_sheets, tmp_path / f"survey{REPORT_STORE_SUFFIX}")
+    store = open_report(path)
+    assert isinstance(store, ReportStore)
+    assert list(store) == list(report_sheets)
+    assert_same_sheets(report_sheets, dict(store))
+
+
+def test_store_keeps_label_types(tmp_path):
+    sheets = {
+        "dates": pd.DataFrame(
+            [[1.5, np.nan], [0.0, -2.0]],
+            index=pd.Index(["a", None], name="row"),
+            columns=pd.Index([pd.Timestamp("2024-06-30"), dt.date(2023, 1, 2)], name="when"),
+        ),
+        "empty": pd.DataFrame(index=pd.Index([], dtype=object, name="col"), columns=pd.Index([], dtype=object)),
+        "mixed": pd.DataFrame(
+            {(2024.0, "Total"): [3, 4]},
+            index=pd.Index([0, "De 1 à 9"], name="EmploiEntrepriseTaille"),
+        ),
+    }
+    assert_same_sheets(sheets, dict(open_report(save_report(sheets, tmp_path / "labels.report"))))
+
+
+def test_store_rewrite_replaces_old_sheets(report_sheets, tmp_path):
+    path = tmp_path / "survey.report"
+    save_report(report_sheets, path)
+    first = next(iter(report_sheets))
+    save_report({first: report_sheets[first]}, path)
+    assert list(open_report(path)) == [first]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["survey.report"]
+
+
+def test_pickle_report_round_trip(report_sheets, tmp_path):
+    report = open_report(save_report(report_sheets, tmp_path / "survey.pkl"))
+    assert isinstance(report, dict)
+    assert_same_sheets(report_sheets, report)
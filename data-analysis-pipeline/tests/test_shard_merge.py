@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+import main
+from baseline import assert_same_sheets
+from src.io.report_store import open_report, report_path
+from src.utils.choices import ANALYSIS_KINDS
+from src.utils.synthetic import synthetic_survey, write_synthetic_workbook
+
+STEPS = ("counts", "aggregated", "percent")
+OUTPUT_OPTIONS = ["--analysis", "all", "--aggregate", "--percent", "--report-format", "pickle", "--no-manifest"]
+
+
+def read_reports(base) -> dict:
+    return {
+        (kind, step): dict(open_report(report_path(base.with_name(f"{base.name}_{kind}_{step}.xlsx"), "pickle")))
+        for kind in ANALYSIS_KINDS
+        for step in STEPS
+    }
+
+
+@pytest.fixture
+def schools(tmp_path):
+    """Two school exports and the workbook of both concatenated."""
+    frames = [synthetic_survey(500, seed=seed, branches=3) for seed in (1, 2)]
+    paths = [write_synthetic_workbook(frame, tmp_path / f"school_{i}.xlsx") for i, frame in enumerate(frames)]
+    combined = write_synthetic_workbook(pd.concat(frames, ignore_index=True), tmp_path / "network.xlsx")
+    return paths, combined
+
+
+def test_merged_shards_match_single_run(schools, tmp_path):
+    paths, combined = schools
+    shards = tmp_path / "shards"
+    main.shard([*map(str, paths), "--out-dir", str(shards), "--no-cache"])
+    assert sorted(path.name for path in shards.iterdir()) == ["school_0.npz", "school_1.npz"]
+
+    merged = tmp_path / "out" / "merged"
+    main.merge([str(shards), "--output", str(merged), *OUTPUT_OPTIONS])
+    single = tmp_path / "out" / "single"
+    main.run_input(main.parse_args(["--input-file", str(combined), "--output", str(single), "--no-cache", *OUTPUT_OPTIONS]))
+
+    expected, actual = read_reports(single), read_reports(merged)
+    for key, sheets in expected.items():
+        assert_same_sheets(sheets, actual[key])
+
+
+def test_chunked_run_matches_loaded_run(schools, tmp_path):
+    _, combined = schools
+    loaded = tmp_path / "loaded"
+    chunked = tmp_path / "chunked"
+    main.run_input(main.parse_args(["--input-file", str(combined), "--output", str(loaded), "--no-cache", *OUTPUT_OPTIONS]))
+    main.run_input(main.parse_args(["--input-file", str(combined), "--output", str(chunked), "--chunk-rows", "150", *OUTPUT_OPTIONS]))
+
+    expected, actual = read_reports(loaded), read_reports(chunked)
+    for key, sheets in expected.items():
+        assert_same_sheets(sheets, actual[key])
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import pytest
+
+from benchmarks.import_budget import DEFAULT_BUDGET_MS, probe, up_to_date_args
+
+
+@pytest.fixture(params=["--help", "up-to-date run"])
+def command(request, tmp_path):
+    return ["--help"] if request.param == "--help" else up_to_date_args(tmp_path)
+
+
+def test_startup_skips_heavy_imports(command):
+    # Fresh interpreters, best of three runs, as benchmarks/import_budget.py measures them
+    result = probe(command, repeat=3)
+    assert result["heavy"] == []
+    assert result["wall_ms"] < DEFAULT_BUDGET_MS
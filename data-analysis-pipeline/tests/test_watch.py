@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import logging
+import shutil
+import threading
+
+import pytest
+
+import main
+
+WATCH_TIMEOUT_SECONDS = 120
+
+
+@pytest.fixture
+def inbox(tmp_path):
+    directory = tmp_path / "inbox"
+    directory.mkdir()
+    return directory
+
+
+def watch_once(directory, out_dir) -> None:
+    """main.py watch --once on directory, failing instead of hanging if it never exits."""
+    argv = [
+        str(directory), "--once", "--interval", "0", "--settle", "0", "--jobs", "1",
+        "--out-dir", str(out_dir), "--analysis", "global", "--no-cache", "--no-manifest",
+    ]
+    errors = []
+
+    def target() -> None:
+        try:
+            main.watch(argv)
+        except BaseException as exc:  # reported in the test thread
+            errors.append(exc)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(WATCH_TIMEOUT_SECONDS)
+    assert not thread.is_alive(), "watch --once did not exit"
+    if errors:
+        raise errors[0]
+
+
+def test_watch_once_processes_each_workbook(workbook, inbox, tmp_path):
+    for i, name in enumerate(["school_a.xlsx", "school_b.xlsx"]):
+        shutil.move(workbook(name, seed=i), inbox / name)
+    # Excel lock files are ignored
+    (inbox / "~$school_a.xlsx").write_bytes(b"lock")
+    out_dir = tmp_path / "reports"
+
+    watch_once(inbox, out_dir)
+    reports = [out_dir / stem / f"{stem}_counts.xlsx" for stem in ("school_a", "school_b")]
+    assert all(path.exists() for path in reports)
+    assert sorted(path.name for path in out_dir.iterdir()) == ["school_a", "school_b"]
+
+    # Unchanged workbooks are skipped by their fingerprint
+    mtimes = [path.stat().st_mtime_ns for path in reports]
+    watch_once(inbox, out_dir)
+    assert [path.stat().st_mtime_ns for path in reports] == mtimes
+
+
+def test_watch_once_reports_clashes_and_failures_once(workbook, inbox, tmp_path, caplog):
+    shutil.move(workbook("school.xlsx"), inbox / "school.xlsx")
+    shutil.copy(inbox / "school.xlsx", inbox / "school.xls")
+    shutil.move(workbook("other.xlsx", seed=1), inbox / "other.xlsx")
+    (inbox / "broken.xlsx").write_bytes(b"not a workbook")
+    out_dir = tmp_path / "reports"
+
+    with caplog.at_level(logging.ERROR):
+        watch_once(inbox, out_dir)
+    assert (out_dir / "other" / "other_counts.xlsx").exists()
+    assert not (out_dir / "school").exists()
+    clashes = [record for record in caplog.records if "shares its output directory" in record.getMessage()]
+    assert sorted(record.args[0].name for record in clashes) == ["school.xls", "school.xlsx"]
+    assert any("broken.xlsx" in record.getMessage() for record in caplog.records if record.levelno >= logging.ERROR)
@@ -1,29 +1,33 @@
 import pandas as pd
-import pickle
 import logging
+import sys
+from pathlib import Path
+
+# Report store helpers live in the pipeline package
+sys.path.append(str(Path(__file__).resolve().parents[1] / "data-analysis-pipeline"))
+from src.io.report_store import open_report, save_report
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def aggregate_data(pickle_path):
+def aggregate_data(report_path):
     """
     Aggregate specific categories in the data before converting to percentages.
     
     Args:
-        pickle_path (str): Path to the original pickle file
+        report_path (str): Path to the original report (.report store or legacy .pkl)
         
     Returns:
         dict: Aggregated data dictionary
     """
     
-    # Load the original data
-    logger.info(f"Loading data from {pickle_path}")
-    with open(pickle_path, "rb") as f:
-        sheets_dict = pickle.load(f)
+    # Load the original data (sheets of a report store are read on access)
+    logger.info(f"Loading data from {report_path}")
+    sheets_dict = open_report(report_path)
     
     # Create a copy for aggregation
-    aggregated_sheets = sheets_dict.copy()
+    aggregated_sheets = dict(sheets_dict)
     
     # 1. Aggregate EmploiLieuRegionEtranger
     if 'EmploiLieuRegionEtranger' in aggregated_sheets:
@@ -95,15 +99,14 @@ def aggregate_data(pickle_path):
 
 def save_aggregated_data(aggregated_sheets, output_path):
     """
-    Save the aggregated data to a new pickle file.
+    Save the aggregated data to a new report.
     
     Args:
         aggregated_sheets (dict): Aggregated data dictionary
-        output_path (str): Path for the output pickle file
+        output_path (str): Path for the output report (.report store, or .pkl for a pickle)
     """
     logger.info(f"Saving aggregated data to {output_path}")
-    with open(output_path, "wb") as f:
-        pickle.dump(aggregated_sheets, f)
+    save_report(aggregated_sheets, output_path)
     
     logger.info("Aggregated data saved successfully!")
 
@@ -111,15 +114,15 @@ def main():
     """Main function to run the aggregation process."""
     
     # Input and output paths
-    input_pickle = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020.pkl"
-    output_pickle = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020_aggregated.pkl"
+    input_report = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020.report"
+    output_report = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020_aggregated.report"
     
     try:
         # Perform aggregation
-        aggregated_data = aggregate_data(input_pickle)
+        aggregated_data = aggregate_data(input_report)
         
         # Save aggregated data
-        save_aggregated_data(aggregated_data, output_pickle)
+        save_aggregated_data(aggregated_data, output_report)
         
         # Display summary of changes
         print("\n" + "="*50)
@@ -136,7 +139,7 @@ def main():
             print("\nEmploiEntrepriseTaille:")
             print("Final categories:", list(aggregated_data['EmploiEntrepriseTaille'].index))
         
-        print(f"\nAggregated data saved to: {output_pickle}")
+        print(f"\nAggregated data saved to: {output_report}")
         
     except Exception as e:
         logger.error(f"Error during aggregation: {str(e)}")
@@ -1,6 +1,11 @@
 import pandas as pd
-import pickle
 import logging
+import sys
+from pathlib import Path
+
+# Report store helpers live in the pipeline package
+sys.path.append(str(Path(__file__).resolve().parents[1] / "data-analysis-pipeline"))
+from src.io.report_store import open_report, save_report
 from datetime import datetime
 
 # Configure logging
@@ -89,15 +94,14 @@ def main():
     """Main function to convert aggregated data to percentages."""
     
     # Input and output paths
-    input_pickle = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020_aggregated.pkl"
+    input_report = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020_aggregated.report"
     output_excel = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020_aggregated_percent.xlsx"
-    output_pickle = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020_aggregated_percent.pkl"
+    output_report = r"C:\Users\Massyle\Documents\auto_report\Enq_TCD_20251020_aggregated_percent.report"
     
     try:
         # Load aggregated data
-        logger.info(f"Loading aggregated data from {input_pickle}")
-        with open(input_pickle, "rb") as f:
-            aggregated_sheets = pickle.load(f)
+        logger.info(f"Loading aggregated data from {input_report}")
+        aggregated_sheets = open_report(input_report)
         
         # Convert to percentages
         logger.info("Converting to percentages...")
@@ -106,16 +110,15 @@ def main():
         # Save percentages to Excel
         save_percentages_to_excel(percent_sheets, output_excel)
         
-        # Save percentages to pickle
-        logger.info(f"Saving percentage data to {output_pickle}")
-        with open(output_pickle, "wb") as f:
-            pickle.dump(percent_sheets, f)
+        # Save percentages as a report store
+        logger.info(f"Saving percentage data to {output_report}")
+        save_report(percent_sheets, output_report)
         
         print("\n" + "="*60)
         print("PERCENTAGE CONVERSION SUMMARY")
         print("="*60)
         print(f"Percentage Excel saved to: {output_excel}")
-        print(f"Percentage pickle saved to: {output_pickle}")
+        print(f"Percentage report saved to: {output_report}")
         
         # Show sample of converted data
         print("\nSample of EmploiLieuRegionEtranger percentages:")